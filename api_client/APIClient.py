@@ -1,18 +1,39 @@
 import os
-import asyncio
-import signal
-from typing import Any
-import httpx
-from websockets.client import connect
-from json import JSONDecodeError
-from datetime import datetime
-
-from api_client.APIError import APIError
+import time
+from contextlib import ExitStack, contextmanager, nullcontext
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable
 
-from .schemas.pydanticobjectid import PydanticObjectId
+import httpx
 
+from .APIError import APIError
+from .APIRoutes import APIRoutes
+from .auth import MemoryTokenStore, Token, TokenStore
+from .bulk import collect_batch, map_concurrent
+from .cache import ResponseCache
+from .codec import JSONCodec, get_codec
+from .metrics import Metrics, RequestTimer, body_size
+from .offload import DecodePool
+from .pagination import paginate
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy, body_rewinder
+from .singleflight import SingleFlight
+from .transfer import (
+    DEFAULT_CHUNK_SIZE,
+    DownloadResult,
+    range_headers,
+    resume_offset,
+    upload_kwargs,
+)
+from .transport import TransportProfile
+
+
+class APIClient(APIRoutes):
+    _paginate = staticmethod(paginate)
+    _map_concurrent = staticmethod(map_concurrent)
+    _collect_batch = staticmethod(collect_batch)
 
-class APIClient:
     def __init__(
         self,
         base_url: str = os.environ.get("API_BASE_URL", "https://dev.tempzeit.com"),
@@ -20,35 +41,154 @@ class APIClient:
         password: str | None = None,
         access_token: str | None = None,
         headers: dict | None = None,
+        profile: TransportProfile | None = None,
+        cache: ResponseCache | None = None,
+        coalesce: bool = False,
+        retry: RetryPolicy | None = None,
+        limiter: RateLimiter | None = None,
+        validation: str | None = None,
+        codec: JSONCodec | str | None = None,
+        transport: Any = None,
+        metrics: Metrics | None = None,
+        token_store: TokenStore | None = None,
+        decode_pool: DecodePool | None = None,
     ):
         if headers is None:
             headers = {}
         self.access_token = access_token
         if access_token:
             headers = {"Authorization": f"Bearer {self.access_token}"}
-        self.client = httpx.Client(base_url=base_url, headers=headers)
+        if profile is None:
+            profile = TransportProfile()
+        if transport is not None:
+            profile = replace(profile, transport=transport)
+        self.profile = profile
+        self.cache = cache
+        self.retry = retry
+        self.limiter = limiter
+        self.validation = validation
+        self.codec = get_codec(codec)
+        self.metrics = metrics
+        self.decode_pool = decode_pool
+        self.token_store = (
+            token_store if token_store is not None else MemoryTokenStore()
+        )
+        self._token = Token.parse(access_token) if access_token else None
+        self._single_flight = SingleFlight() if coalesce else None
+        self.client = httpx.Client(
+            base_url=base_url, headers=headers, **profile.httpx_kwargs()
+        )
+        self._credentials = None
         if username and password:
             self.auth(username, password)
 
-    def _parse_response(self, response: httpx.Response, raw: bool = False) -> Any:
-        success = 200 <= response.status_code < 300
-
-        if success and raw:
-            return response.content
+    def close(self):
+        self.client.close()
 
+    def _request(
+        self, method: str, url, model: str | None = None, many: bool = False, **kwargs
+    ):
+        self._ensure_auth()
+        request, send_kwargs = self._build_request(method, url, **kwargs)
+        fresh, entry = self._cache_lookup(request, model, many)
+        if fresh:
+            return entry.value
+        if self._single_flight is not None and request.method == "GET":
+            return self._single_flight.do(
+                ResponseCache.key(request, self._variant(model, many)),
+                lambda: self._send(request, entry, model, many, **send_kwargs),
+            )
+        return self._send(request, entry, model, many, **send_kwargs)
+
+    def _send(
+        self,
+        request: httpx.Request,
+        entry=None,
+        model: str | None = None,
+        many: bool = False,
+        reauth: bool = True,
+        rewind: Callable[[], None] | None = body_rewinder(),
+        **send_kwargs,
+    ):
+        metrics = self.metrics
+        if metrics is not None:
+            route = metrics.route(request.url.path)
+            timer = RequestTimer(metrics, route)
+            request.extensions["trace"] = timer.trace
+            start = time.perf_counter()
         try:
-            response_json = response.json()
+            res = self._send_retrying(request, rewind=rewind, **send_kwargs)
+        except httpx.TransportError:
+            if metrics is not None:
+                metrics.request(
+                    request.method,
+                    route,
+                    0,
+                    time.perf_counter() - start,
+                    body_size(request),
+                    0,
+                )
+            raise
+        if metrics is not None:
+            metrics.request(
+                request.method,
+                route,
+                res.status_code,
+                time.perf_counter() - start,
+                body_size(request),
+                res.num_bytes_downloaded or len(res.content),
+            )
+        if reauth and (stale := self._reauth_token(request, res)) is not None:
+            # a body that cannot be sent again leaves the 401 to the caller
+            if self._login(stale) and rewind is not None:
+                rewind()
+                request.headers["Authorization"] = f"Bearer {self.access_token}"
+                return self._send(
+                    request, entry, model, many, False, rewind, **send_kwargs
+                )
+        decoded = self._offload(res, model, many)
+        return self._handle_response(request, res, entry, model, many, decoded)
 
-            if success:
-                return response_json
+    def _send_retrying(
+        self,
+        request: httpx.Request,
+        limit: bool = True,
+        rewind: Callable[[], None] | None = body_rewinder(),
+        **send_kwargs,
+    ) -> httpx.Response:
+        """Send `request`, within the rate limits unless `limit` is false,
+        retrying as the retry policy says."""
+        metrics = self.metrics
+        attempt = 0
+        while True:
+            try:
+                if self.limiter is None or not limit:
+                    res = self.client.send(request, **send_kwargs)
+                else:
+                    with self.limiter.limit(request.url.path):
+                        res = self.client.send(request, **send_kwargs)
+            except httpx.TransportError as error:
+                if self.retry is None or rewind is None:
+                    raise
+                delay = self.retry.next_delay(request.method, attempt, error=error)
+                if delay is None:
+                    raise
+                if metrics is not None:
+                    route = metrics.route(request.url.path)
+                    metrics.retry(request.method, route, type(error).__name__)
             else:
-                raise APIError(
-                    response.url.__str__(), response.status_code, response_json
-                )
-        except JSONDecodeError:
-            return response.content
-        except Exception as error:
-            raise APIError(response.url.__str__(), response.status_code, repr(error))
+                if self.retry is None or rewind is None:
+                    return res
+                delay = self.retry.next_delay(request.method, attempt, response=res)
+                if delay is None:
+                    return res
+                if metrics is not None:
+                    route = metrics.route(request.url.path)
+                    metrics.retry(request.method, route, str(res.status_code))
+                res.close()
+            time.sleep(delay)
+            rewind()
+            attempt += 1
 
     def get(
         self,
@@ -59,10 +199,9 @@ class APIClient:
         cookies=None,
         **kwargs,
     ):
-        res = self.client.get(
-            url, params=params, headers=headers, cookies=cookies, **kwargs
+        return self._request(
+            "GET", url, params=params, headers=headers, cookies=cookies, **kwargs
         )
-        return self._parse_response(res)
 
     def post(
         self,
@@ -77,7 +216,8 @@ class APIClient:
         cookies=None,
         **kwargs,
     ):
-        res = self.client.post(
+        return self._request(
+            "POST",
             url,
             content=content,
             data=data,
@@ -88,7 +228,6 @@ class APIClient:
             cookies=cookies,
             **kwargs,
         )
-        return self._parse_response(res)
 
     def put(
         self,
@@ -103,7 +242,8 @@ class APIClient:
         cookies=None,
         **kwargs,
     ):
-        res = self.client.put(
+        return self._request(
+            "PUT",
             url,
             content=content,
             data=data,
@@ -114,7 +254,6 @@ class APIClient:
             cookies=cookies,
             **kwargs,
         )
-        return self._parse_response(res)
 
     def patch(
         self,
@@ -129,7 +268,8 @@ class APIClient:
         cookies=None,
         **kwargs,
     ):
-        res = self.client.patch(
+        return self._request(
+            "PATCH",
             url,
             content=content,
             data=data,
@@ -140,7 +280,6 @@ class APIClient:
             cookies=cookies,
             **kwargs,
         )
-        return self._parse_response(res)
 
     def delete(
         self,
@@ -151,167 +290,165 @@ class APIClient:
         cookies=None,
         **kwargs,
     ):
-        res = self.client.delete(
+        return self._request(
+            "DELETE",
             url,
             params=params,
             headers=headers,
             cookies=cookies,
             **kwargs,
         )
-        return self._parse_response(res)
-
-    def login(self, username: str, password: str):
-        return self.auth(username, password)
-
-    def logout(self):
-        return self.post("/auth/logout")
 
-    def auth(self, username: str, password: str):
-        if self.access_token:
-            return True
-        res = self.client.post(
-            "/auth/login",
-            data={
-                "username": username,
-                "password": password,
-            },
-        )
-        if res.status_code == 200:
-            self.access_token = res.json().get("access_token", "")
-            self.client.headers.update({"Authorization": f"Bearer {self.access_token}"})
-            return True
-        else:
-            return False
-
-    def get_me(self):
-        return self.get("/users/me")
-
-    def register_user(self, body):
-        return self.post("/auth/register", json=body)
-
-    def request_verify_token(self, email: str):
-        return self.post("/auth/request-verify-token", json={"email": email})
-
-    def get_user(self, id: PydanticObjectId):
-        return self.get(f"/users/{id}")
-
-    def get_user_loops(self, id: PydanticObjectId):
-        return self.get(f"users/{id}/loops")
-
-    def get_users(
+    @contextmanager
+    def _stream(self, request: httpx.Request):
+        """Send `request` without reading the body, with the retries and the
+        login on 401 of `_send`. The rate limits hold until the body is read.
+        """
+        metrics = self.metrics
+        if metrics is not None:
+            route = metrics.route(request.url.path)
+            request.extensions["trace"] = RequestTimer(metrics, route).trace
+            start = time.perf_counter()
+        limit = self.limiter.limit(request.url.path) if self.limiter else nullcontext()
+        with limit:
+            response = self._send_retrying(request, limit=False, stream=True)
+            if (stale := self._reauth_token(request, response)) is not None:
+                if self._login(stale):
+                    response.close()
+                    request.headers["Authorization"] = f"Bearer {self.access_token}"
+                    response = self._send_retrying(request, limit=False, stream=True)
+            try:
+                yield response
+            finally:
+                response.close()
+                if metrics is not None:
+                    metrics.request(
+                        request.method,
+                        route,
+                        response.status_code,
+                        time.perf_counter() - start,
+                        0,
+                        response.num_bytes_downloaded,
+                    )
+
+    def upload(
         self,
-        email: str | None = None,
-        loop_id: PydanticObjectId | None = None,
-        limit: int = 100,
-        offset: int = 0,
-    ):
-        _params = {
-            "loop_id": loop_id,
-            "limit": limit,
-            "offset": offset,
-            "email": email,
-        }
-        params = {k: v for k, v in _params.items() if v}
-        res = self.get("/users", params=params)
-        return res
-
-    def patch_user(self, id: PydanticObjectId, body: dict[str, Any]):
-        return self.patch(f"/users/{id}", json=body)
-
-    def delete_user(self, id: str):
-        return self.delete(f"/users/{id}")
-
-    def create_loop(self, body: dict[str, Any]):
-        return self.post("/loops", json=body)
-
-    def patch_loop(self, id: PydanticObjectId, body: dict[str, Any]):
-        return self.patch(f"/loops/{id}", json=body)
-
-    def delete_loop(self, id: PydanticObjectId):
-        return self.delete(f"/loops/{id}")
-
-    def get_loop(self, id: PydanticObjectId):
-        return self.get(f"/loops/{id}")
-
-    def get_loops(
-        self,
-        name: str | None = None,
-        status: str | None = None,
-        type_: str | None = None,
-        limit: int = 999,
-        offset: int = 0,
-    ):
-        _params = {
-            "name": name,
-            "limit": limit,
-            "status": status,
-            "type": type_,
-            "offset": offset,
-        }
-        params = {k: v for k, v in _params.items() if v}
-        res = self.get("/loops", params=params)
-        return res
-
-    def get_loops_me(self):
-        return self.get("/loops/me")
-
-    def get_package(self, id: str):
-        return self.get(f"/packages/{id}")
-
-    def get_packages(
-        self,
-        tracking_number: str | None = None,
-        loop_id: PydanticObjectId | None = None,
-        limit: int = 999,
-        offset: int = 0,
+        url,
+        file: Any,
+        *,
+        method: str = "POST",
+        field: str | None = None,
+        filename: str | None = None,
+        content_type: str | None = None,
+        data: dict | None = None,
+        params=None,
+        headers=None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        **kwargs,
     ):
-        _params = {
-            "tracking_number": tracking_number,
-            "loop_id": loop_id,
-            "limit": limit,
-            "offset": offset,
-        }
-        params = {k: v for k, v in _params.items() if v}
-        return self.get("/packages", params=params)
-
-    def create_package(self, body: dict[str, Any]):
-        return self.post("/packages", json=body)
-
-    def delete_package(self, id: PydanticObjectId):
-        return self.delete(f"/packages/{id}")
-
-    def get_sessions(self, loop_id: PydanticObjectId):
-        return self.get(f"/loops/{loop_id}/sessions")
-
-    def set_baseline(self, loop_id: PydanticObjectId, start: datetime, end: datetime):
-        return self.post(f"/ml/baseline/{loop_id}", json={"start": start, "stop": end})
-
-    async def listen_status(self, loop_id: PydanticObjectId, process_fn=print):
-        uri = f"wss://{str(self.client.base_url).lstrip('https://')}/loops/{loop_id}/status?token={self.access_token}"
-        async with connect(uri) as ws:
-            # Close the connection when receiving SIGTERM, SIGINT
-            loop = asyncio.get_running_loop()
-            loop.add_signal_handler(signal.SIGTERM, loop.create_task, ws.close())
-            loop.add_signal_handler(signal.SIGINT, loop.create_task, ws.close())
-
-            # Process messages received on the connection.
-            async for message in ws:
-                process_fn(message)
-
-    async def listen_data(
+        """Stream `file` (a path, a binary file or an iterator of bytes) to
+        `url` in chunks, as the raw body or as the `field` of a multipart form.
+        """
+        with ExitStack() as stack:
+            if isinstance(file, (str, os.PathLike)):
+                file = stack.enter_context(open(file, "rb"))
+            return self._request(
+                method,
+                url,
+                params=params,
+                **upload_kwargs(
+                    file,
+                    field=field,
+                    filename=filename,
+                    content_type=content_type,
+                    data=data,
+                    headers=headers,
+                    chunk_size=chunk_size,
+                ),
+                **kwargs,
+            )
+
+    def download(
         self,
-        loop_id: PydanticObjectId,
+        url,
+        path: str | os.PathLike,
         *,
-        type="eeg",
-        process_fn=print,
-    ):
-        uri = f"wss://{str(self.client.base_url).lstrip('https://')}/loops/{loop_id}/data?type={type}&token={self.access_token}"
-        async with connect(uri) as ws:
-            # Close the connection when receiving SIGTERM, SIGINT
-            loop = asyncio.get_running_loop()
-            loop.add_signal_handler(signal.SIGTERM, loop.create_task, ws.close())
-            loop.add_signal_handler(signal.SIGINT, loop.create_task, ws.close())
+        params=None,
+        headers=None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        resume: bool = True,
+        max_resumes: int = 3,
+    ) -> DownloadResult:
+        """Write the body of `url` to `path` as it arrives.
+
+        With `resume`, an existing partial file is continued with a `Range`
+        request, and a download interrupted by a connection error is resumed
+        up to `max_resumes` times. Servers that ignore ranges are handled by
+        starting over. Each request is retried by the client's retry policy
+        and sent again after logging in on 401, like any other call.
+        """
+        self._ensure_auth()
+        path = Path(path)
+        offset = path.stat().st_size if resume and path.exists() else 0
+        result = DownloadResult(path, offset, resumed_from=offset)
+        while True:
+            request = self.client.build_request(
+                "GET", url, params=params, headers=range_headers(headers, offset)
+            )
+            try:
+                with self._stream(request) as response:
+                    start = resume_offset(response, offset)
+                    if start is None:
+                        return result
+                    if not response.is_success:
+                        # raised before the partial file is touched, whatever
+                        # the error body is
+                        response.read()
+                        raise APIError(
+                            str(response.url), response.status_code, response.text
+                        )
+                    with open(path, "r+b" if start else "wb") as file:
+                        file.seek(start)
+                        file.truncate()
+                        offset = start
+                        for chunk in response.iter_bytes(chunk_size):
+                            file.write(chunk)
+                            offset += len(chunk)
+                result.size = offset
+                return result
+            except httpx.TransportError:
+                if not resume or result.resumes >= max_resumes:
+                    raise
+                if self.retry is not None:
+                    time.sleep(self.retry.backoff(result.resumes))
+                result.resumes += 1
 
-            # Process messages received on the connection.
-            async for message in ws:
-                process_fn(message)
+    def auth(self, username: str, password: str):
+        """Log in, or reuse a valid token for these credentials from the
+        token store. The credentials are kept to refresh the token."""
+        self._credentials = (username, password)
+        if self.access_token and not self._needs_login():
+            return True
+        return self._login()
+
+    def _ensure_auth(self):
+        if self._needs_login():
+            self._login()
+
+    def _login(self, stale: Token | None = None) -> bool:
+        """Use the stored token for our credentials unless it is `stale`,
+        or log in (once among the clients sharing the store) for a new one."""
+        key = self._token_key()
+        token = self.token_store.fresh(key, stale)
+        if token is None:
+            with self.token_store.lock(key):
+                token = self.token_store.fresh(key, stale)
+                if token is None:
+                    res = self.client.send(self._login_request())
+                    if res.status_code != 200:
+                        self._credentials = None
+                        return False
+                    token = Token.from_login(res.json())
+                    self.token_store.set(key, token)
+        self._use_token(token)
+        return True
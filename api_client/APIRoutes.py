@@ -0,0 +1,561 @@
+from __future__ import annotations
+
+import asyncio
+import signal
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Callable, Iterable
+from datetime import datetime
+
+import httpx
+
+from api_client.APIError import APIError
+from .auth import Token, TokenStore, token_key
+from .bulk import DEFAULT_BULK_SIZE, DEFAULT_CONCURRENCY, BatchResult, chunked
+from .cache import CacheEntry, ResponseCache
+from .codec import JSONCodec
+from .metrics import Metrics
+from .offload import DecodePool
+from .pagination import DEFAULT_PAGE_SIZE
+from .pipeline import StreamPipeline
+from .retry import body_rewinder
+
+if TYPE_CHECKING:
+    from .schemas.pydanticobjectid import PydanticObjectId
+
+
+class APIRoutes:
+    """Route methods shared by `APIClient` and `AsyncAPIClient`.
+
+    Every route only delegates to the `get`/`post`/`put`/`patch`/`delete` verbs
+    of the concrete client, so on the async client the routes return awaitables.
+    """
+
+    client: httpx.Client | httpx.AsyncClient
+    access_token: str | None
+    cache: ResponseCache | None
+    codec: JSONCodec
+    # "full", "construct" or "lazy" to return `schemas.responses` models
+    validation: str | None
+    # receives timings and counters when set, see `metrics`
+    metrics: Metrics | None
+    # decodes large bodies off the calling thread when set, see `offload`
+    decode_pool: DecodePool | None
+    # tokens shared with other clients, see `auth`
+    token_store: TokenStore
+    _token: Token | None
+    _credentials: tuple[str, str] | None
+    # `pagination.paginate` on the sync client, `pagination.apaginate` on async
+    _paginate: Any
+    # `bulk.map_concurrent` on the sync client, `bulk.amap_concurrent` on async
+    _map_concurrent: Any
+    # `bulk.collect_batch` on the sync client, `bulk.acollect_batch` on async
+    _collect_batch: Any
+
+    def _parse_response(
+        self,
+        response: httpx.Response,
+        raw: bool = False,
+        model: str | None = None,
+        many: bool = False,
+        decoded: Future | None = None,
+    ) -> Any:
+        success = 200 <= response.status_code < 300
+
+        if success and raw:
+            return response.content
+
+        try:
+            if decoded is not None:
+                result = decoded.result()
+                if model is not None and self.validation == "lazy":
+                    return self._validate(result, model, many)
+                return result
+
+            if success and model and self.validation == "full" and not many:
+                return self._timed(
+                    response, "decode", self._decode_model, response.content, model
+                )
+
+            response_json = self._timed(
+                response, "decode", self.codec.loads, response.content
+            )
+
+            if success:
+                if model is not None and self.validation is not None:
+                    return self._timed(
+                        response, "validate", self._validate, response_json, model, many
+                    )
+                return response_json
+            else:
+                raise APIError(
+                    response.url.__str__(), response.status_code, response_json
+                )
+        except self.codec.decode_errors:
+            return response.content
+        except Exception as error:
+            raise APIError(response.url.__str__(), response.status_code, repr(error))
+
+    def _offload(
+        self, response: httpx.Response, model: str | None, many: bool
+    ) -> Future | None:
+        """Start decoding a large successful body in the decode pool."""
+        pool = self.decode_pool
+        if (
+            pool is None
+            or not 200 <= response.status_code < 300
+            or len(response.content) < pool.threshold
+        ):
+            return None
+        return pool.submit(response.content, self.codec, model, self.validation, many)
+
+    def _timed(self, response: httpx.Response, phase: str, fn: Callable, *args):
+        if self.metrics is None:
+            return fn(*args)
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            route = self.metrics.route(response.request.url.path)
+            self.metrics.phase(route, phase, time.perf_counter() - start)
+
+    def _validate(self, data: Any, model: str, many: bool) -> Any:
+        # imported on first use so pydantic stays off the plain-dict path
+        from .schemas import responses
+
+        return responses.validate_response(
+            data, getattr(responses, model), self.validation, many
+        )
+
+    def _decode_model(self, content: bytes, model: str) -> Any:
+        from .schemas import responses
+
+        return self.codec.decode(content, getattr(responses, model))
+
+    def _token_key(self) -> str:
+        return token_key(str(self.client.base_url), self._credentials[0])
+
+    def _needs_login(self) -> bool:
+        """Whether there are credentials and no token, or one about to expire."""
+        if self._credentials is None:
+            return False
+        return self._token is None or self._token.expiring(
+            self.token_store.refresh_margin
+        )
+
+    def _use_token(self, token: Token):
+        self._token = token
+        self.access_token = token.access_token
+        self.client.headers["Authorization"] = f"Bearer {token.access_token}"
+
+    def _login_request(self) -> httpx.Request:
+        username, password = self._credentials
+        return self.client.build_request(
+            "POST", "/auth/login", data={"username": username, "password": password}
+        )
+
+    def _reauth_token(self, request: httpx.Request, response: httpx.Response):
+        """The token a request was rejected with (401), if logging in again
+        may help; None otherwise."""
+        if response.status_code != 401 or self._credentials is None:
+            return None
+        authorization = request.headers.get("Authorization", "")
+        return Token.parse(authorization.removeprefix("Bearer "))
+
+    def _build_request(self, method: str, url, **kwargs):
+        """Split verb kwargs into a built request and the kwargs for `send`,
+        plus the `rewind` of its body for retries (see `body_rewinder`)."""
+        send_kwargs = {
+            key: kwargs.pop(key)
+            for key in ("auth", "follow_redirects")
+            if key in kwargs
+        }
+        body = kwargs.pop("json", None)
+        if body is not None and kwargs.get("content") is None:
+            headers = httpx.Headers(kwargs.get("headers"))
+            headers.setdefault("Content-Type", "application/json")
+            kwargs["headers"] = headers
+            kwargs["content"] = self.codec.dumps(body)
+        send_kwargs["rewind"] = body_rewinder(
+            kwargs.get("content"), kwargs.get("data"), kwargs.get("files")
+        )
+        return self.client.build_request(method, url, **kwargs), send_kwargs
+
+    def _variant(self, model: str | None, many: bool) -> tuple:
+        """How a response is parsed, for the cache and single-flight keys."""
+        if model is None or self.validation is None:
+            return ()
+        return (model, many, self.validation)
+
+    def _cache_lookup(
+        self, request: httpx.Request, model: str | None = None, many: bool = False
+    ) -> tuple[bool, CacheEntry | None]:
+        if self.cache is None or request.method != "GET":
+            return False, None
+        return self.cache.lookup(request, self._variant(model, many))
+
+    def _handle_response(
+        self,
+        request: httpx.Request,
+        response: httpx.Response,
+        entry: CacheEntry | None = None,
+        model: str | None = None,
+        many: bool = False,
+        decoded: Future | None = None,
+    ) -> Any:
+        if self.cache is not None:
+            if request.method != "GET":
+                self.cache.invalidate(request.url.path)
+            elif entry is not None and response.status_code == 304:
+                return self.cache.revalidated(
+                    request, entry, self._variant(model, many)
+                )
+        result = self._parse_response(response, model=model, many=many, decoded=decoded)
+        if self.cache is not None and request.method == "GET":
+            self.cache.store(request, response, result, self._variant(model, many))
+        return result
+
+    def _write_many(
+        self,
+        fn: Callable[[Any], Any],
+        items: Iterable[Any],
+        max_concurrency: int,
+        bulk_url: str | None = None,
+        bulk_size: int = DEFAULT_BULK_SIZE,
+        model: str | None = None,
+    ) -> BatchResult:
+        """Apply the single-entity write `fn` to `items`, or POST them as JSON
+        lists of `bulk_size` to a server bulk endpoint at `bulk_url`.
+
+        Calls run `max_concurrency` at a time through the client's rate
+        limiter; failures are collected instead of aborting the batch.
+        """
+        if bulk_url is None:
+            pairs = self._map_concurrent(fn, items, max_concurrency, False)
+            return self._collect_batch(pairs)
+
+        def post_chunk(chunk: list):
+            return self.post(bulk_url, json=chunk, model=model, many=True)
+
+        pairs = self._map_concurrent(
+            post_chunk, chunked(items, bulk_size), max_concurrency, False
+        )
+        return self._collect_batch(pairs, chunks=True)
+
+    def login(self, username: str, password: str):
+        return self.auth(username, password)
+
+    def logout(self):
+        return self.post("/auth/logout")
+
+    def get_me(self):
+        return self.get("/users/me", model="User")
+
+    def register_user(self, body):
+        return self.post("/auth/register", json=body)
+
+    def request_verify_token(self, email: str):
+        return self.post("/auth/request-verify-token", json={"email": email})
+
+    def get_user(self, id: PydanticObjectId):
+        return self.get(f"/users/{id}", model="User")
+
+    def get_users_many(
+        self,
+        ids: Iterable[PydanticObjectId],
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        ordered: bool = True,
+    ):
+        return self._map_concurrent(self.get_user, ids, max_concurrency, ordered)
+
+    def get_user_loops(self, id: PydanticObjectId):
+        return self.get(f"users/{id}/loops", model="Loop", many=True)
+
+    def get_users(
+        self,
+        email: str | None = None,
+        loop_id: PydanticObjectId | None = None,
+        limit: int = 100,
+        offset: int = 0,
+    ):
+        _params = {
+            "loop_id": loop_id,
+            "limit": limit,
+            "offset": offset,
+            "email": email,
+        }
+        params = {k: v for k, v in _params.items() if v}
+        res = self.get("/users", params=params, model="User", many=True)
+        return res
+
+    def iter_users(
+        self,
+        email: str | None = None,
+        loop_id: PydanticObjectId | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        prefetch: bool = True,
+    ):
+        return self._paginate(
+            lambda limit, offset: self.get_users(
+                email=email, loop_id=loop_id, limit=limit, offset=offset
+            ),
+            page_size,
+            prefetch,
+        )
+
+    def patch_user(self, id: PydanticObjectId, body: dict[str, Any]):
+        return self.patch(f"/users/{id}", json=body, model="User")
+
+    def delete_user(self, id: str):
+        return self.delete(f"/users/{id}")
+
+    def patch_users(
+        self,
+        updates: dict | Iterable[tuple[PydanticObjectId, dict[str, Any]]],
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> BatchResult:
+        """Apply `{id: body}` (or `(id, body)` pairs); items are the pairs."""
+        updates = updates.items() if isinstance(updates, dict) else updates
+        return self._write_many(
+            lambda update: self.patch_user(*update), updates, max_concurrency
+        )
+
+    def delete_users(
+        self,
+        ids: Iterable[PydanticObjectId],
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> BatchResult:
+        return self._write_many(self.delete_user, ids, max_concurrency)
+
+    def create_loop(self, body: dict[str, Any]):
+        return self.post("/loops", json=body, model="Loop")
+
+    def patch_loop(self, id: PydanticObjectId, body: dict[str, Any]):
+        return self.patch(f"/loops/{id}", json=body, model="Loop")
+
+    def delete_loop(self, id: PydanticObjectId):
+        return self.delete(f"/loops/{id}")
+
+    def create_loops(
+        self,
+        bodies: Iterable[dict[str, Any]],
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        bulk_url: str | None = None,
+        bulk_size: int = DEFAULT_BULK_SIZE,
+    ) -> BatchResult:
+        return self._write_many(
+            self.create_loop, bodies, max_concurrency, bulk_url, bulk_size, "Loop"
+        )
+
+    def patch_loops(
+        self,
+        updates: dict | Iterable[tuple[PydanticObjectId, dict[str, Any]]],
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> BatchResult:
+        updates = updates.items() if isinstance(updates, dict) else updates
+        return self._write_many(
+            lambda update: self.patch_loop(*update), updates, max_concurrency
+        )
+
+    def delete_loops(
+        self,
+        ids: Iterable[PydanticObjectId],
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> BatchResult:
+        return self._write_many(self.delete_loop, ids, max_concurrency)
+
+    def get_loop(self, id: PydanticObjectId):
+        return self.get(f"/loops/{id}", model="Loop")
+
+    def get_loops_many(
+        self,
+        ids: Iterable[PydanticObjectId],
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        ordered: bool = True,
+    ):
+        return self._map_concurrent(self.get_loop, ids, max_concurrency, ordered)
+
+    def get_loops(
+        self,
+        name: str | None = None,
+        status: str | None = None,
+        type_: str | None = None,
+        limit: int = 999,
+        offset: int = 0,
+    ):
+        _params = {
+            "name": name,
+            "limit": limit,
+            "status": status,
+            "type": type_,
+            "offset": offset,
+        }
+        params = {k: v for k, v in _params.items() if v}
+        res = self.get("/loops", params=params, model="Loop", many=True)
+        return res
+
+    def iter_loops(
+        self,
+        name: str | None = None,
+        status: str | None = None,
+        type_: str | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        prefetch: bool = True,
+    ):
+        return self._paginate(
+            lambda limit, offset: self.get_loops(
+                name=name, status=status, type_=type_, limit=limit, offset=offset
+            ),
+            page_size,
+            prefetch,
+        )
+
+    def get_loops_me(self):
+        return self.get("/loops/me", model="Loop", many=True)
+
+    def get_package(self, id: str):
+        return self.get(f"/packages/{id}", model="Package")
+
+    def get_packages_many(
+        self,
+        ids: Iterable[PydanticObjectId],
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        ordered: bool = True,
+    ):
+        return self._map_concurrent(self.get_package, ids, max_concurrency, ordered)
+
+    def get_packages(
+        self,
+        tracking_number: str | None = None,
+        loop_id: PydanticObjectId | None = None,
+        limit: int = 999,
+        offset: int = 0,
+    ):
+        _params = {
+            "tracking_number": tracking_number,
+            "loop_id": loop_id,
+            "limit": limit,
+            "offset": offset,
+        }
+        params = {k: v for k, v in _params.items() if v}
+        return self.get("/packages", params=params, model="Package", many=True)
+
+    def iter_packages(
+        self,
+        tracking_number: str | None = None,
+        loop_id: PydanticObjectId | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        prefetch: bool = True,
+    ):
+        return self._paginate(
+            lambda limit, offset: self.get_packages(
+                tracking_number=tracking_number,
+                loop_id=loop_id,
+                limit=limit,
+                offset=offset,
+            ),
+            page_size,
+            prefetch,
+        )
+
+    def create_package(self, body: dict[str, Any]):
+        return self.post("/packages", json=body, model="Package")
+
+    def delete_package(self, id: PydanticObjectId):
+        return self.delete(f"/packages/{id}")
+
+    def create_packages(
+        self,
+        bodies: Iterable[dict[str, Any]],
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        bulk_url: str | None = None,
+        bulk_size: int = DEFAULT_BULK_SIZE,
+    ) -> BatchResult:
+        return self._write_many(
+            self.create_package, bodies, max_concurrency, bulk_url, bulk_size, "Package"
+        )
+
+    def delete_packages(
+        self,
+        ids: Iterable[PydanticObjectId],
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> BatchResult:
+        return self._write_many(self.delete_package, ids, max_concurrency)
+
+    def get_sessions(self, loop_id: PydanticObjectId):
+        return self.get(f"/loops/{loop_id}/sessions", model="Session", many=True)
+
+    def set_baseline(self, loop_id: PydanticObjectId, start: datetime, end: datetime):
+        return self.post(f"/ml/baseline/{loop_id}", json={"start": start, "stop": end})
+
+    def _ws_uri(self, path: str, **params) -> str:
+        """Websocket URI for `path` relative to the client's base URL."""
+        base_url = self.client.base_url
+        scheme = "ws" if base_url.scheme == "http" else "wss"
+        url = base_url.copy_with(scheme=scheme).join(path)
+        return str(url.copy_merge_params(params))
+
+    def _metered(self, ws, loop_id: PydanticObjectId, stream: str):
+        """`ws`, counting its messages into `metrics` when set."""
+        metrics = self.metrics
+        if metrics is None:
+            return ws
+
+        async def messages():
+            async for message in ws:
+                metrics.message(str(loop_id), stream, len(message))
+                yield message
+
+        return messages()
+
+    async def listen_status(self, loop_id: PydanticObjectId, process_fn=print):
+        # imported here so websockets only loads for streaming
+        from websockets.client import connect
+
+        uri = self._ws_uri(f"loops/{loop_id}/status", token=self.access_token)
+        async with connect(uri) as ws:
+            # Close the connection when receiving SIGTERM, SIGINT
+            loop = asyncio.get_running_loop()
+            loop.add_signal_handler(
+                signal.SIGTERM, lambda: loop.create_task(ws.close())
+            )
+            loop.add_signal_handler(signal.SIGINT, lambda: loop.create_task(ws.close()))
+
+            # Process messages received on the connection.
+            async for message in self._metered(ws, loop_id, "status"):
+                process_fn(message)
+
+    async def listen_data(
+        self,
+        loop_id: PydanticObjectId,
+        *,
+        type="eeg",
+        process_fn=print,
+        pipeline: StreamPipeline | None = None,
+        decoder: Callable[[Any], Any] | None = None,
+    ):
+        """Call `process_fn` for every message of the loop's data stream.
+
+        With a `pipeline`, messages are queued and handed to its consumer in
+        batches instead, so a slow consumer does not stall the socket read.
+        A `decoder` (e.g. `eeg.EEGDecoder`) is applied to each message before
+        it reaches `process_fn`; pipeline consumers receive raw messages.
+        """
+        from websockets.client import connect
+
+        uri = self._ws_uri(f"loops/{loop_id}/data", type=type, token=self.access_token)
+        async with connect(uri) as ws:
+            # Close the connection when receiving SIGTERM, SIGINT
+            loop = asyncio.get_running_loop()
+            loop.add_signal_handler(
+                signal.SIGTERM, lambda: loop.create_task(ws.close())
+            )
+            loop.add_signal_handler(signal.SIGINT, lambda: loop.create_task(ws.close()))
+
+            # Process messages received on the connection.
+            messages = self._metered(ws, loop_id, type)
+            if pipeline is not None:
+                await pipeline.run(messages)
+                return
+            async for message in messages:
+                process_fn(decoder(message) if decoder else message)
@@ -0,0 +1,495 @@
+import os
+import asyncio
+import time
+from contextlib import asynccontextmanager, nullcontext
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable
+
+import httpx
+
+from .APIError import APIError
+from .APIRoutes import APIRoutes
+from .auth import MemoryTokenStore, Token, TokenStore
+from .bulk import acollect_batch, amap_concurrent
+from .cache import ResponseCache
+from .codec import JSONCodec, get_codec
+from .metrics import Metrics, RequestTimer, body_size
+from .offload import DecodePool
+from .pagination import apaginate
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy, body_rewinder
+from .singleflight import AsyncSingleFlight
+from .transfer import (
+    DEFAULT_CHUNK_SIZE,
+    DownloadResult,
+    range_headers,
+    resume_offset,
+    upload_kwargs,
+)
+from .transport import TransportProfile
+
+
+class AsyncAPIClient(APIRoutes):
+    """asyncio twin of `APIClient` backed by `httpx.AsyncClient`.
+
+    All route methods return awaitables. Since `__init__` cannot await, a
+    username/password pair is exchanged for a token on the first request (or
+    on `__aenter__`), guarded by a lock so concurrent tasks only log in once.
+    """
+
+    _paginate = staticmethod(apaginate)
+    _map_concurrent = staticmethod(amap_concurrent)
+    _collect_batch = staticmethod(acollect_batch)
+
+    def __init__(
+        self,
+        base_url: str = os.environ.get("API_BASE_URL", "https://dev.tempzeit.com"),
+        username: str | None = None,
+        password: str | None = None,
+        access_token: str | None = None,
+        headers: dict | None = None,
+        profile: TransportProfile | None = None,
+        cache: ResponseCache | None = None,
+        coalesce: bool = False,
+        retry: RetryPolicy | None = None,
+        limiter: RateLimiter | None = None,
+        validation: str | None = None,
+        codec: JSONCodec | str | None = None,
+        transport: Any = None,
+        metrics: Metrics | None = None,
+        token_store: TokenStore | None = None,
+        decode_pool: DecodePool | None = None,
+    ):
+        if headers is None:
+            headers = {}
+        self.access_token = access_token
+        if access_token:
+            headers = {"Authorization": f"Bearer {self.access_token}"}
+        if profile is None:
+            profile = TransportProfile()
+        if transport is not None:
+            profile = replace(profile, transport=transport)
+        self.profile = profile
+        self.cache = cache
+        self.retry = retry
+        self.limiter = limiter
+        self.validation = validation
+        self.codec = get_codec(codec)
+        self.metrics = metrics
+        self.decode_pool = decode_pool
+        self.token_store = (
+            token_store if token_store is not None else MemoryTokenStore()
+        )
+        self._token = Token.parse(access_token) if access_token else None
+        self._single_flight = AsyncSingleFlight() if coalesce else None
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            **profile.httpx_kwargs(asynchronous=True),
+        )
+        self._credentials = (username, password) if username and password else None
+        self._auth_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self._ensure_auth()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _ensure_auth(self):
+        if not self._needs_login():
+            return
+        async with self._auth_lock:
+            if self._needs_login():
+                await self._login()
+
+    async def _login(self, stale: Token | None = None) -> bool:
+        """`APIClient._login`; callers hold `_auth_lock`. Waiting for the
+        store's lock happens in a worker thread."""
+        key = self._token_key()
+        token = self.token_store.fresh(key, stale)
+        if token is None:
+            await self._acquire(key)
+            try:
+                token = self.token_store.fresh(key, stale)
+                if token is None:
+                    res = await self.client.send(self._login_request())
+                    if res.status_code != 200:
+                        self._credentials = None
+                        return False
+                    token = Token.from_login(res.json())
+                    self.token_store.set(key, token)
+            finally:
+                self.token_store.release(key)
+        self._use_token(token)
+        return True
+
+    async def _acquire(self, key: str):
+        acquiring = asyncio.ensure_future(
+            asyncio.to_thread(self.token_store.acquire, key)
+        )
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # the worker thread still takes the lock: give it back once it has
+            acquiring.add_done_callback(
+                lambda done: done.exception() or self.token_store.release(key)
+            )
+            raise
+
+    async def _request(
+        self, method: str, url, model: str | None = None, many: bool = False, **kwargs
+    ):
+        await self._ensure_auth()
+        request, send_kwargs = self._build_request(method, url, **kwargs)
+        fresh, entry = self._cache_lookup(request, model, many)
+        if fresh:
+            return entry.value
+        if self._single_flight is not None and request.method == "GET":
+            return await self._single_flight.do(
+                ResponseCache.key(request, self._variant(model, many)),
+                lambda: self._send(request, entry, model, many, **send_kwargs),
+            )
+        return await self._send(request, entry, model, many, **send_kwargs)
+
+    async def _send(
+        self,
+        request: httpx.Request,
+        entry=None,
+        model: str | None = None,
+        many: bool = False,
+        reauth: bool = True,
+        rewind: Callable[[], None] | None = body_rewinder(),
+        **send_kwargs,
+    ):
+        metrics = self.metrics
+        if metrics is not None:
+            route = metrics.route(request.url.path)
+            timer = RequestTimer(metrics, route)
+            request.extensions["trace"] = timer.atrace
+            start = time.perf_counter()
+        try:
+            res = await self._send_retrying(request, rewind=rewind, **send_kwargs)
+        except httpx.TransportError:
+            if metrics is not None:
+                metrics.request(
+                    request.method,
+                    route,
+                    0,
+                    time.perf_counter() - start,
+                    body_size(request),
+                    0,
+                )
+            raise
+        if metrics is not None:
+            metrics.request(
+                request.method,
+                route,
+                res.status_code,
+                time.perf_counter() - start,
+                body_size(request),
+                res.num_bytes_downloaded or len(res.content),
+            )
+        if reauth and (stale := self._reauth_token(request, res)) is not None:
+            async with self._auth_lock:
+                logged_in = await self._login(stale)
+            # a body that cannot be sent again leaves the 401 to the caller
+            if logged_in and rewind is not None:
+                rewind()
+                request.headers["Authorization"] = f"Bearer {self.access_token}"
+                return await self._send(
+                    request, entry, model, many, False, rewind, **send_kwargs
+                )
+        decoded = self._offload(res, model, many)
+        if decoded is not None:
+            # wait without raising; errors are handled by `_parse_response`
+            await asyncio.wait([asyncio.wrap_future(decoded)])
+        return self._handle_response(request, res, entry, model, many, decoded)
+
+    async def _send_retrying(
+        self,
+        request: httpx.Request,
+        limit: bool = True,
+        rewind: Callable[[], None] | None = body_rewinder(),
+        **send_kwargs,
+    ) -> httpx.Response:
+        """`APIClient._send_retrying`."""
+        metrics = self.metrics
+        attempt = 0
+        while True:
+            try:
+                if self.limiter is None or not limit:
+                    res = await self.client.send(request, **send_kwargs)
+                else:
+                    async with self.limiter.alimit(request.url.path):
+                        res = await self.client.send(request, **send_kwargs)
+            except httpx.TransportError as error:
+                if self.retry is None or rewind is None:
+                    raise
+                delay = self.retry.next_delay(request.method, attempt, error=error)
+                if delay is None:
+                    raise
+                if metrics is not None:
+                    route = metrics.route(request.url.path)
+                    metrics.retry(request.method, route, type(error).__name__)
+            else:
+                if self.retry is None or rewind is None:
+                    return res
+                delay = self.retry.next_delay(request.method, attempt, response=res)
+                if delay is None:
+                    return res
+                if metrics is not None:
+                    route = metrics.route(request.url.path)
+                    metrics.retry(request.method, route, str(res.status_code))
+                await res.aclose()
+            await asyncio.sleep(delay)
+            rewind()
+            attempt += 1
+
+    async def get(
+        self,
+        url,
+        *,
+        params=None,
+        headers=None,
+        cookies=None,
+        **kwargs,
+    ):
+        return await self._request(
+            "GET", url, params=params, headers=headers, cookies=cookies, **kwargs
+        )
+
+    async def post(
+        self,
+        url,
+        *,
+        content=None,
+        data=None,
+        files=None,
+        json=None,
+        params=None,
+        headers=None,
+        cookies=None,
+        **kwargs,
+    ):
+        return await self._request(
+            "POST",
+            url,
+            content=content,
+            data=data,
+            files=files,
+            json=json,
+            params=params,
+            headers=headers,
+            cookies=cookies,
+            **kwargs,
+        )
+
+    async def put(
+        self,
+        url,
+        *,
+        content=None,
+        data=None,
+        files=None,
+        json=None,
+        params=None,
+        headers=None,
+        cookies=None,
+        **kwargs,
+    ):
+        return await self._request(
+            "PUT",
+            url,
+            content=content,
+            data=data,
+            files=files,
+            json=json,
+            params=params,
+            headers=headers,
+            cookies=cookies,
+            **kwargs,
+        )
+
+    async def patch(
+        self,
+        url,
+        *,
+        content=None,
+        data=None,
+        files=None,
+        json=None,
+        params=None,
+        headers=None,
+        cookies=None,
+        **kwargs,
+    ):
+        return await self._request(
+            "PATCH",
+            url,
+            content=content,
+            data=data,
+            files=files,
+            json=json,
+            params=params,
+            headers=headers,
+            cookies=cookies,
+            **kwargs,
+        )
+
+    async def delete(
+        self,
+        url,
+        *,
+        params=None,
+        headers=None,
+        cookies=None,
+        **kwargs,
+    ):
+        return await self._request(
+            "DELETE",
+            url,
+            params=params,
+            headers=headers,
+            cookies=cookies,
+            **kwargs,
+        )
+
+    @asynccontextmanager
+    async def _stream(self, request: httpx.Request):
+        """`APIClient._stream`."""
+        metrics = self.metrics
+        if metrics is not None:
+            route = metrics.route(request.url.path)
+            request.extensions["trace"] = RequestTimer(metrics, route).atrace
+            start = time.perf_counter()
+        limit = self.limiter.alimit(request.url.path) if self.limiter else nullcontext()
+        async with limit:
+            response = await self._send_retrying(request, limit=False, stream=True)
+            if (stale := self._reauth_token(request, response)) is not None:
+                async with self._auth_lock:
+                    logged_in = await self._login(stale)
+                if logged_in:
+                    await response.aclose()
+                    request.headers["Authorization"] = f"Bearer {self.access_token}"
+                    response = await self._send_retrying(
+                        request, limit=False, stream=True
+                    )
+            try:
+                yield response
+            finally:
+                await response.aclose()
+                if metrics is not None:
+                    metrics.request(
+                        request.method,
+                        route,
+                        response.status_code,
+                        time.perf_counter() - start,
+                        0,
+                        response.num_bytes_downloaded,
+                    )
+
+    async def upload(
+        self,
+        url,
+        file: Any,
+        *,
+        method: str = "POST",
+        field: str | None = None,
+        filename: str | None = None,
+        content_type: str | None = None,
+        data: dict | None = None,
+        params=None,
+        headers=None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        **kwargs,
+    ):
+        """Stream `file` (a path, a binary file or an (async) iterator of
+        bytes) to `url`; see `APIClient.upload`.
+        """
+        opened = None
+        if isinstance(file, (str, os.PathLike)):
+            file = opened = open(file, "rb")
+        try:
+            return await self._request(
+                method,
+                url,
+                params=params,
+                **upload_kwargs(
+                    file,
+                    field=field,
+                    filename=filename,
+                    content_type=content_type,
+                    data=data,
+                    headers=headers,
+                    chunk_size=chunk_size,
+                    asynchronous=True,
+                ),
+                **kwargs,
+            )
+        finally:
+            if opened is not None:
+                opened.close()
+
+    async def download(
+        self,
+        url,
+        path: str | os.PathLike,
+        *,
+        params=None,
+        headers=None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        resume: bool = True,
+        max_resumes: int = 3,
+    ) -> DownloadResult:
+        """Write the body of `url` to `path` as it arrives; see
+        `APIClient.download`. File writes run in a worker thread.
+        """
+        await self._ensure_auth()
+        path = Path(path)
+        offset = path.stat().st_size if resume and path.exists() else 0
+        result = DownloadResult(path, offset, resumed_from=offset)
+        while True:
+            request = self.client.build_request(
+                "GET", url, params=params, headers=range_headers(headers, offset)
+            )
+            try:
+                async with self._stream(request) as response:
+                    start = resume_offset(response, offset)
+                    if start is None:
+                        return result
+                    if not response.is_success:
+                        # raised before the partial file is touched, whatever
+                        # the error body is
+                        await response.aread()
+                        raise APIError(
+                            str(response.url), response.status_code, response.text
+                        )
+                    with open(path, "r+b" if start else "wb") as file:
+                        file.seek(start)
+                        file.truncate()
+                        offset = start
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            await asyncio.to_thread(file.write, chunk)
+                            offset += len(chunk)
+                result.size = offset
+                return result
+            except httpx.TransportError:
+                if not resume or result.resumes >= max_resumes:
+                    raise
+                if self.retry is not None:
+                    await asyncio.sleep(self.retry.backoff(result.resumes))
+                result.resumes += 1
+
+    async def auth(self, username: str, password: str):
+        """`APIClient.auth`."""
+        self._credentials = (username, password)
+        if self.access_token and not self._needs_login():
+            return True
+        async with self._auth_lock:
+            return await self._login()
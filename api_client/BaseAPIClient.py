@@ -1,4 +1,6 @@
 from __future__ import annotations
+import time
+from urllib.parse import urlsplit
 from abc import abstractmethod
 from typing import Any, Dict, List, Optional, Union
 
@@ -6,7 +8,11 @@ import requests
 from requests import Response
 from requests.sessions import HTTPAdapter
 from .APIError import APIError
+from .codec import JSONCodec, get_codec
+from .metrics import Metrics, body_size
+from .retry import RetryPolicy, body_rewinder
 from .singleton import AbstractSingleton
+from .transport import TransportProfile
 
 
 def prepare_params(params: Dict) -> Dict:
@@ -21,10 +27,28 @@ class BaseAPIClient(metaclass=AbstractSingleton):
         """Define this property in subclasses"""
         assert self._API_NAME
 
-    def __init__(self):
+    def __init__(
+        self,
+        profile: TransportProfile | None = None,
+        retry: RetryPolicy | None = None,
+        codec: JSONCodec | str | None = None,
+        metrics: Metrics | None = None,
+    ):
         self.requests_session = requests.Session()
-        self.requests_session.mount("http://", HTTPAdapter(max_retries=3))
-        self.requests_session.mount("https://", HTTPAdapter(max_retries=3))
+        self.retry = retry
+        self.codec = get_codec(codec)
+        self.metrics = metrics
+        # connection errors are retried by the policy instead of urllib3
+        max_retries = 0 if retry else 3
+        if profile is None:
+            for prefix in ("http://", "https://"):
+                self.requests_session.mount(
+                    prefix, HTTPAdapter(max_retries=max_retries)
+                )
+            self._timeout = None
+        else:
+            profile.mount(self.requests_session, max_retries=max_retries)
+            self._timeout = profile.requests_timeout()
         # self.requests_session.headers.update(
         #     {
         #         "Content-Type": "application/json",
@@ -45,6 +69,67 @@ class BaseAPIClient(metaclass=AbstractSingleton):
             request_headers.update(headers)
         return request_headers
 
+    def _send(self, method: str, url, **kwargs) -> Response:
+        kwargs.setdefault("timeout", self._timeout)
+        body = kwargs.pop("json", None)
+        # like requests, `json` is ignored when `data` or `files` make the body
+        if body is not None and kwargs.get("data") is None and not kwargs.get("files"):
+            kwargs["headers"] = {
+                "Content-Type": "application/json",
+                **(kwargs.get("headers") or {}),
+            }
+            kwargs["data"] = self.codec.dumps(body)
+        # None when the body cannot be sent twice: no retries then
+        rewind = body_rewinder(kwargs.get("data"), kwargs.get("files"))
+        metrics = self.metrics
+        if metrics is not None:
+            route = metrics.route(urlsplit(url).path)
+            start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = self.requests_session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                delay = None
+                if self.retry is not None and rewind is not None:
+                    delay = self.retry.next_delay(method, attempt, error=error)
+                if metrics is not None:
+                    if delay is None:
+                        seconds = time.perf_counter() - start
+                        metrics.request(method, route, 0, seconds, 0, 0)
+                    else:
+                        metrics.retry(method, route, type(error).__name__)
+                if delay is None:
+                    raise
+            else:
+                delay = None
+                if self.retry is not None and rewind is not None:
+                    delay = self.retry.next_delay(method, attempt, response=response)
+                if delay is None:
+                    if metrics is not None:
+                        self._record(metrics, route, start, response)
+                    return response
+                if metrics is not None:
+                    metrics.retry(method, route, str(response.status_code))
+                response.close()
+            time.sleep(delay)
+            rewind()
+            attempt += 1
+
+    @staticmethod
+    def _record(metrics: Metrics, route: str, start: float, response: Response):
+        method = response.request.method
+        # `elapsed` runs until the response headers were parsed
+        metrics.phase(route, "wait", response.elapsed.total_seconds())
+        metrics.request(
+            method,
+            route,
+            response.status_code,
+            time.perf_counter() - start,
+            body_size(response.request),
+            len(response.content),
+        )
+
     def _parse_response(self, response: Response, raw: bool = False) -> Any:
         success = 200 <= response.status_code < 300
 
@@ -52,7 +137,13 @@ class BaseAPIClient(metaclass=AbstractSingleton):
             return response.content
 
         try:
-            response_json = response.json()
+            if self.metrics is None:
+                response_json = self.codec.loads(response.content)
+            else:
+                start = time.perf_counter()
+                response_json = self.codec.loads(response.content)
+                route = self.metrics.route(urlsplit(response.url).path)
+                self.metrics.phase(route, "decode", time.perf_counter() - start)
 
             if success:
                 return response_json
@@ -69,7 +160,8 @@ class BaseAPIClient(metaclass=AbstractSingleton):
         self, url, params: Dict | None = None, headers: Dict | None = None, raw=False
     ) -> Any:
         try:
-            response = self.requests_session.get(
+            response = self._send(
+                "GET",
                 url,
                 headers=self._make_headers(headers),
                 params=prepare_params(params if params else {}),
@@ -88,7 +180,8 @@ class BaseAPIClient(metaclass=AbstractSingleton):
         data=None,
         raw=False,
     ) -> Any:
-        response = self.requests_session.post(
+        response = self._send(
+            "POST",
             url,
             json=json if json else None,
             headers=self._make_headers(headers),
@@ -107,7 +200,8 @@ class BaseAPIClient(metaclass=AbstractSingleton):
         files: Dict | None = None,
         raw: bool = False,
     ):
-        response = self.requests_session.patch(
+        response = self._send(
+            "PATCH",
             url,
             json=json if json else None,
             headers=self._make_headers(headers),
@@ -125,7 +219,8 @@ class BaseAPIClient(metaclass=AbstractSingleton):
         files: Dict | None = None,
         raw: bool = False,
     ):
-        response = self.requests_session.put(
+        response = self._send(
+            "PUT",
             url,
             json=json if json else None,
             headers=self._make_headers(headers),
@@ -135,7 +230,8 @@ class BaseAPIClient(metaclass=AbstractSingleton):
         return self._parse_response(response, raw=raw)
 
     def _delete(self, url, params: dict = None, headers: dict = None):
-        response = self.requests_session.delete(
+        response = self._send(
+            "DELETE",
             url,
             headers=self._make_headers(headers),
             params=prepare_params(params if params else {}),
@@ -1,3 +1,36 @@
+import importlib
+
 from .APIClient import APIClient
+from .AsyncAPIClient import AsyncAPIClient
 from .APIError import APIError
-from .schemas.pydanticobjectid import PydanticObjectId
+from .transport import TransportProfile
+from .bulk import BatchResult
+from .cache import ResponseCache
+from .codec import JSONCodec, get_codec
+from .retry import RetryBudget, RetryPolicy
+from .ratelimit import RateLimiter, RouteLimit
+from .pipeline import StreamPipeline
+from .metrics import InMemoryMetrics, Metrics, PrometheusMetrics
+from .auth import CallbackTokenStore, FileTokenStore, MemoryTokenStore, TokenStore
+from .offload import DecodePool
+
+# loaded on first access, as they import pydantic or websockets
+_LAZY = {
+    "PydanticObjectId": ".schemas.pydanticobjectid",
+    "StreamManager": ".streams",
+    "StreamMessage": ".streams",
+    "Mirror": ".mirror",
+}
+
+
+def __getattr__(name: str):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_LAZY})
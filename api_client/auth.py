@@ -0,0 +1,228 @@
+"""Access token stores shared between clients and processes.
+
+A client built with a username and password looks for a valid token in its
+`token_store` before posting to `/auth/login`, and saves the token it gets
+there, so clients sharing a store (e.g. a `FileTokenStore` used by a fleet
+of worker processes) log in once between them. Tokens are refreshed (by
+logging in again) `refresh_margin` seconds before the `exp` claim of the JWT,
+and a request answered with 401 is retried once with a new token.
+"""
+
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Iterator
+
+DEFAULT_REFRESH_MARGIN = 60.0
+
+DEFAULT_TOKEN_FILE = Path.home() / ".cache" / "api_client" / "tokens.json"
+
+
+def jwt_expiry(access_token: str) -> float | None:
+    """The `exp` claim of a JWT (not verified), or None."""
+    try:
+        payload = access_token.split(".")[1]
+        claims = json.loads(
+            base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+        )
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def token_key(base_url: str, username: str) -> str:
+    return f"{username}@{base_url}"
+
+
+@dataclass(frozen=True)
+class Token:
+    access_token: str
+    # unix time, None when the token does not say
+    expires_at: float | None = None
+
+    @classmethod
+    def parse(cls, access_token: str) -> "Token":
+        return cls(access_token, jwt_expiry(access_token))
+
+    @classmethod
+    def from_login(cls, payload: dict) -> "Token":
+        token = cls.parse(payload.get("access_token", ""))
+        if token.expires_at is None and payload.get("expires_in"):
+            return cls(token.access_token, time.time() + float(payload["expires_in"]))
+        return token
+
+    def expiring(self, margin: float = DEFAULT_REFRESH_MARGIN) -> bool:
+        return self.expires_at is not None and time.time() >= self.expires_at - margin
+
+
+class TokenStore:
+    """Base class of token stores; also the interface clients rely on.
+
+    `acquire`/`release` serialize logins for one key so that concurrent
+    clients wait for the first one's token instead of logging in too.
+    """
+
+    def __init__(self, refresh_margin: float = DEFAULT_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+
+    def get(self, key: str) -> Token | None:
+        raise NotImplementedError
+
+    def set(self, key: str, token: Token):
+        raise NotImplementedError
+
+    def acquire(self, key: str):
+        pass
+
+    def release(self, key: str):
+        pass
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    def fresh(self, key: str, stale: Token | None = None) -> Token | None:
+        """The stored token unless it is missing, about to expire or `stale`
+        (a token the server just rejected)."""
+        token = self.get(key)
+        if token is None or token.expiring(self.refresh_margin):
+            return None
+        if stale is not None and token.access_token == stale.access_token:
+            return None
+        return token
+
+
+class MemoryTokenStore(TokenStore):
+    """Tokens shared by the clients of one process. Thread-safe."""
+
+    def __init__(self, refresh_margin: float = DEFAULT_REFRESH_MARGIN):
+        super().__init__(refresh_margin)
+        self._tokens: dict[str, Token] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def get(self, key):
+        return self._tokens.get(key)
+
+    def set(self, key, token):
+        self._tokens[key] = token
+
+    def _lock(self, key: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def acquire(self, key):
+        self._lock(key).acquire()
+
+    def release(self, key):
+        self._lock(key).release()
+
+
+class FileTokenStore(TokenStore):
+    """Tokens shared by the processes of one machine, in a JSON file.
+
+    Logins are serialized with an exclusive lock on `<path>.lock` (`flock`,
+    or `msvcrt.locking` on Windows); the file is replaced atomically and
+    only readable by its owner. `set` is meant to be called while holding
+    the lock, as the clients do.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike = DEFAULT_TOKEN_FILE,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+    ):
+        super().__init__(refresh_margin)
+        self.path = Path(path)
+        self._files: dict[str, int] = {}
+        self._guard = threading.Lock()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key):
+        entry = self._read().get(key)
+        return Token(**entry) if entry else None
+
+    def set(self, key, token):
+        tokens = self._read()
+        tokens[key] = asdict(token)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name)
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(tokens, file)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def acquire(self, key):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            _lock_fd(fd)
+        except BaseException:
+            os.close(fd)
+            raise
+        with self._guard:
+            self._files[key] = fd
+
+    def release(self, key):
+        with self._guard:
+            fd = self._files.pop(key)
+        # closing the descriptor drops the lock
+        os.close(fd)
+
+
+def _lock_fd(fd: int):
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+
+class CallbackTokenStore(TokenStore):
+    """Tokens kept elsewhere (a secrets manager, a shared cache...).
+
+    `load(key)` returns a `Token`, a bare access token or None; `save(key,
+    token)`, if given, is called with every new token.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[str], Token | str | None],
+        save: Callable[[str, Token], None] | None = None,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+    ):
+        super().__init__(refresh_margin)
+        self.load = load
+        self.save = save
+
+    def get(self, key):
+        token = self.load(key)
+        if isinstance(token, str):
+            return Token.parse(token)
+        return token
+
+    def set(self, key, token):
+        if self.save is not None:
+            self.save(key, token)
@@ -0,0 +1,214 @@
+import asyncio
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+    Sequence,
+)
+
+import httpx
+
+from .APIError import APIError
+from .pagination import _page_items
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_BULK_SIZE = 100
+
+
+def _as_api_error(error: Exception) -> APIError:
+    if isinstance(error, APIError):
+        return error
+    try:
+        url = str(error.request.url)
+    except (AttributeError, RuntimeError):
+        url = ""
+    return APIError(url, 0, repr(error))
+
+
+def _call(fn: Callable[[Any], Any], item: Any) -> Any:
+    try:
+        return fn(item)
+    except (APIError, httpx.TransportError) as error:
+        return _as_api_error(error)
+
+
+def map_concurrent(
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_concurrency: int = DEFAULT_CONCURRENCY,
+    ordered: bool = True,
+) -> Iterator[tuple[Any, Any]]:
+    """Run `fn` over `items` on a thread pool, yielding `(item, result)` pairs.
+
+    At most `max_concurrency` calls are in flight and `items` is consumed
+    lazily. Failed calls yield an `APIError` as their result instead of
+    aborting the batch. Results come back in input order if `ordered`,
+    otherwise in completion order.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be a positive integer")
+
+    items = iter(items)
+    pending: deque = deque()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+
+        def submit_next() -> bool:
+            for item in items:
+                pending.append((item, executor.submit(_call, fn, item)))
+                return True
+            return False
+
+        try:
+            while len(pending) < max_concurrency and submit_next():
+                pass
+            while pending:
+                if ordered:
+                    item, future = pending.popleft()
+                    yield item, future.result()
+                else:
+                    wait([f for _, f in pending], return_when=FIRST_COMPLETED)
+                    for entry in [e for e in pending if e[1].done()]:
+                        pending.remove(entry)
+                        yield entry[0], entry[1].result()
+                while len(pending) < max_concurrency and submit_next():
+                    pass
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+async def _acall(fn: Callable[[Any], Awaitable[Any]], item: Any) -> Any:
+    try:
+        return await fn(item)
+    except (APIError, httpx.TransportError) as error:
+        return _as_api_error(error)
+
+
+async def amap_concurrent(
+    fn: Callable[[Any], Awaitable[Any]],
+    items: Iterable[Any],
+    max_concurrency: int = DEFAULT_CONCURRENCY,
+    ordered: bool = True,
+) -> AsyncIterator[tuple[Any, Any]]:
+    """Async counterpart of `map_concurrent` running the calls as tasks."""
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be a positive integer")
+
+    items = iter(items)
+    pending: deque = deque()
+
+    def submit_next() -> bool:
+        for item in items:
+            pending.append((item, asyncio.ensure_future(_acall(fn, item))))
+            return True
+        return False
+
+    try:
+        while len(pending) < max_concurrency and submit_next():
+            pass
+        while pending:
+            if ordered:
+                item, task = pending.popleft()
+                yield item, await task
+            else:
+                await asyncio.wait(
+                    [t for _, t in pending], return_when=asyncio.FIRST_COMPLETED
+                )
+                for entry in [e for e in pending if e[1].done()]:
+                    pending.remove(entry)
+                    yield entry[0], entry[1].result()
+            while len(pending) < max_concurrency and submit_next():
+                pass
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+
+@dataclass
+class BatchResult:
+    """Outcome of a batch write.
+
+    `succeeded` holds `(item, result)` and `failed` `(item, APIError)` pairs,
+    in completion order.
+    """
+
+    succeeded: list[tuple[Any, Any]] = field(default_factory=list)
+    failed: list[tuple[Any, APIError]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+    def __len__(self) -> int:
+        return len(self.succeeded) + len(self.failed)
+
+    def add(self, item: Any, result: Any):
+        if isinstance(result, APIError):
+            self.failed.append((item, result))
+        else:
+            self.succeeded.append((item, result))
+
+    def raise_for_errors(self):
+        """Raise the first `APIError` of the batch, if any."""
+        if self.failed:
+            raise self.failed[0][1]
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[list]:
+    if size < 1:
+        raise ValueError("size must be a positive integer")
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+
+def _expand(chunk: list, result: Any) -> Iterator[tuple[Any, Any]]:
+    """Pair the items of a bulk request with their share of its response.
+
+    A response listing one result per item is split up; anything else, an
+    `APIError` included, is reported for every item of the chunk.
+    """
+    if not isinstance(result, APIError):
+        results = _page_items(result)
+        if (
+            isinstance(results, Sequence)
+            and not isinstance(results, (str, bytes))
+            and len(results) == len(chunk)
+        ):
+            yield from zip(chunk, results)
+            return
+    for item in chunk:
+        yield item, result
+
+
+def collect_batch(
+    pairs: Iterable[tuple[Any, Any]], chunks: bool = False
+) -> BatchResult:
+    """Gather `map_concurrent` output into a `BatchResult`.
+
+    With `chunks`, every pair is a bulk request `(list of items, response)`.
+    """
+    batch = BatchResult()
+    for item, result in pairs:
+        for pair in _expand(item, result) if chunks else [(item, result)]:
+            batch.add(*pair)
+    return batch
+
+
+async def acollect_batch(
+    pairs: AsyncIterable[tuple[Any, Any]], chunks: bool = False
+) -> BatchResult:
+    """Async counterpart of `collect_batch` for `amap_concurrent` output."""
+    batch = BatchResult()
+    async for item, result in pairs:
+        for pair in _expand(item, result) if chunks else [(item, result)]:
+            batch.add(*pair)
+    return batch
@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    expires_at: float
+    resources: frozenset[str]
+    etag: str | None = None
+    last_modified: str | None = None
+
+    @property
+    def revalidatable(self) -> bool:
+        return self.etag is not None or self.last_modified is not None
+
+
+def _resources(path: str) -> frozenset[str]:
+    """Collections named in a path, e.g. `"/users/{id}/loops"` ->
+    `{"users", "loops"}` (every other segment, the ones between are ids)."""
+    return frozenset(path.strip("/").split("/")[::2])
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of parsed GET responses with per-route TTLs.
+
+    `route_ttls` maps path prefixes (e.g. `"/users/me"`) to a TTL in seconds;
+    the longest matching prefix wins and `ttl` applies otherwise. A TTL of 0
+    disables caching for that route. Expired entries that carried an `ETag` or
+    `Last-Modified` header are revalidated with a conditional request instead
+    of being refetched. Any non-GET request through the client invalidates
+    every entry whose path names a resource its path names: a write to
+    `/loops/{id}` drops `/loops/...` as well as `/users/{id}/loops`.
+
+    Cached values are shared between callers and must be treated as read-only.
+    The cache is thread-safe and can be shared by several clients.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 30.0,
+        route_ttls: dict[str, float] | None = None,
+    ):
+        if maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.route_ttls = sorted(
+            (route_ttls or {}).items(), key=lambda item: len(item[0]), reverse=True
+        )
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._entries: OrderedDict[tuple, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ttl_for(self, path: str) -> float:
+        for prefix, ttl in self.route_ttls:
+            if path.startswith(prefix):
+                return ttl
+        return self.ttl
+
+    @staticmethod
+    def key(request: httpx.Request, variant: tuple = ()) -> tuple:
+        """`variant` tells apart the values parsed differently from the same
+        response (a dict, a model, a lazy list...)."""
+        return (str(request.url), request.headers.get("Authorization"), *variant)
+
+    def lookup(
+        self, request: httpx.Request, variant: tuple = ()
+    ) -> tuple[bool, CacheEntry | None]:
+        """Return `(fresh, entry)` for a GET request.
+
+        A stale entry that can be revalidated is returned with `fresh=False`
+        after the conditional headers have been added to `request`.
+        """
+        if self.ttl_for(request.url.path) <= 0:
+            return False, None
+        key = self.key(request, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            if entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry
+            if not entry.revalidatable:
+                del self._entries[key]
+                self.misses += 1
+                return False, None
+        if entry.etag is not None:
+            request.headers["If-None-Match"] = entry.etag
+        if entry.last_modified is not None:
+            request.headers["If-Modified-Since"] = entry.last_modified
+        return False, entry
+
+    def revalidated(
+        self, request: httpx.Request, entry: CacheEntry, variant: tuple = ()
+    ) -> Any:
+        """Refresh `entry` after a `304 Not Modified` and return its value."""
+        entry.expires_at = time.monotonic() + self.ttl_for(request.url.path)
+        key = self.key(request, variant)
+        with self._lock:
+            self.revalidations += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+        return entry.value
+
+    def store(
+        self,
+        request: httpx.Request,
+        response: httpx.Response,
+        value: Any,
+        variant: tuple = (),
+    ):
+        ttl = self.ttl_for(request.url.path)
+        if ttl <= 0 or response.status_code != 200:
+            return
+        if "no-store" in response.headers.get("Cache-Control", ""):
+            return
+        entry = CacheEntry(
+            value,
+            time.monotonic() + ttl,
+            _resources(request.url.path),
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+        key = self.key(request, variant)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, path: str):
+        """Drop every entry sharing a resource with `path`."""
+        resources = _resources(path)
+        with self._lock:
+            for key in [
+                key
+                for key, entry in self._entries.items()
+                if entry.resources & resources
+            ]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
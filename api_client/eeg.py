@@ -0,0 +1,125 @@
+"""NumPy decoding of EEG frames received from `listen_data(type="eeg")`.
+
+Requires the optional `numpy` dependency.
+"""
+
+import json
+from typing import Any, Literal
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("EEG decoding requires numpy: `pip install numpy`")
+
+
+class EEGDecoder:
+    """Turn websocket EEG frames into `(channels, samples)` arrays.
+
+    Binary frames are wrapped with `np.frombuffer` without copying: the
+    result is a read-only view over the received bytes (skipping `offset`
+    header bytes). `layout="interleaved"` means one sample of every channel
+    after the other, which yields a transposed, non-contiguous view;
+    `"planar"` means all samples of channel 0 first, which yields a contiguous
+    one. Text frames are parsed as JSON, either a list of per-channel sample
+    lists or an object holding it under `key`.
+    """
+
+    def __init__(
+        self,
+        channels: int,
+        *,
+        dtype: str = "<f4",
+        layout: Literal["interleaved", "planar"] = "interleaved",
+        offset: int = 0,
+        key: str = "data",
+    ):
+        _require_numpy()
+        if layout not in ("interleaved", "planar"):
+            raise ValueError(f"Unknown layout {layout!r}")
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.layout = layout
+        self.offset = offset
+        self.key = key
+
+    def __call__(self, message: Any) -> "np.ndarray":
+        if isinstance(message, str):
+            return self.decode_json(message)
+        return self.decode_binary(message)
+
+    def decode_binary(self, message: bytes | bytearray | memoryview) -> "np.ndarray":
+        samples = np.frombuffer(message, dtype=self.dtype, offset=self.offset)
+        if samples.size % self.channels:
+            raise ValueError(
+                f"Frame of {samples.size} values does not split into "
+                f"{self.channels} channels"
+            )
+        if self.layout == "planar":
+            return samples.reshape(self.channels, -1)
+        return samples.reshape(-1, self.channels).T
+
+    def decode_json(self, message: str | bytes) -> "np.ndarray":
+        data = json.loads(message)
+        if isinstance(data, dict):
+            data = data[self.key]
+        frame = np.asarray(data, dtype=self.dtype)
+        if frame.ndim != 2 or frame.shape[0] != self.channels:
+            raise ValueError(
+                f"Expected {self.channels} channels, got an array of {frame.shape}"
+            )
+        return frame
+
+
+class EEGRingBuffer:
+    """Preallocated `(channels, capacity)` ring buffer for rolling windows.
+
+    Frames are copied in place into the buffer; no allocation happens on
+    `append`. `latest(n)` returns a view when the window does not wrap around
+    the end of the buffer and a copy otherwise.
+    """
+
+    def __init__(self, channels: int, capacity: int, dtype: str = "<f4"):
+        _require_numpy()
+        self.channels = channels
+        self.capacity = capacity
+        self.data = np.zeros((channels, capacity), dtype=dtype)
+        self.total = 0
+        self._head = 0
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+    def append(self, frame: "np.ndarray"):
+        if frame.shape[0] != self.channels:
+            raise ValueError(f"Expected {self.channels} channels, got {frame.shape}")
+        n = frame.shape[1]
+        if n >= self.capacity:
+            # only the newest `capacity` samples survive
+            self.data[:] = frame[:, n - self.capacity :]
+            self._head = 0
+        else:
+            end = self._head + n
+            if end <= self.capacity:
+                self.data[:, self._head : end] = frame
+            else:
+                split = self.capacity - self._head
+                self.data[:, self._head :] = frame[:, :split]
+                self.data[:, : n - split] = frame[:, split:]
+            self._head = end % self.capacity
+        self.total += n
+
+    def latest(self, n: int | None = None) -> "np.ndarray":
+        """The newest `n` samples (all buffered samples by default), oldest first."""
+        size = len(self)
+        n = size if n is None else min(n, size)
+        start = (self._head - n) % self.capacity
+        if start + n <= self.capacity:
+            return self.data[:, start : start + n]
+        return np.concatenate(
+            (self.data[:, start:], self.data[:, : n - (self.capacity - start)]), axis=1
+        )
@@ -0,0 +1,335 @@
+"""Request metrics and tracing hooks for the API clients.
+
+A client given a `metrics` sink reports, per route:
+
+- the duration, status, request and response bytes of every call,
+- phase timings: `connect`, `tls`, `send_headers`, `send_body`, `wait`
+  (server time until the response headers) and `download`, taken from
+  httpcore's `trace` extension, plus the client-side `decode` (JSON) and
+  `validate` (response models) steps,
+- retries, with their reason,
+- websocket messages received by `listen_*` and `StreamManager`.
+
+Sinks subclass `Metrics`, whose methods do nothing. Without a sink (the
+default) the clients skip all of this, so instrumentation costs nothing.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Iterable
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_ID_SEGMENT = re.compile(r"[0-9a-fA-F]{24}|\d+")
+
+# httpcore trace steps, e.g. "http11.receive_response_headers.complete"
+_PHASES = {
+    "connect_tcp": "connect",
+    "start_tls": "tls",
+    "send_request_headers": "send_headers",
+    "send_request_body": "send_body",
+    "receive_response_headers": "wait",
+    "receive_response_body": "download",
+}
+
+
+@lru_cache(maxsize=4096)
+def route_template(path: str) -> str:
+    """`/loops/5eb7.../sessions` -> `/loops/{id}/sessions`, to bound labels."""
+    return "/".join(
+        "{id}" if _ID_SEGMENT.fullmatch(segment) else segment
+        for segment in path.split("/")
+    )
+
+
+class Metrics:
+    """No-op sink; subclasses override the hooks they need."""
+
+    def route(self, path: str) -> str:
+        return route_template(path)
+
+    def request(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        seconds: float,
+        bytes_out: int,
+        bytes_in: int,
+    ):
+        """One finished call; `status` is 0 when no response was received."""
+
+    def phase(self, route: str, phase: str, seconds: float):
+        pass
+
+    def retry(self, method: str, route: str, reason: str):
+        pass
+
+    def message(self, loop_id: str, stream: str, size: int):
+        pass
+
+
+class RequestTimer:
+    """Turns httpcore trace events into `Metrics.phase` calls."""
+
+    __slots__ = ("metrics", "route", "_started")
+
+    def __init__(self, metrics: Metrics, route: str):
+        self.metrics = metrics
+        self.route = route
+        self._started: dict[str, float] = {}
+
+    def trace(self, event_name: str, info: dict):
+        step, _, stage = event_name.rpartition(".")
+        step = step.rpartition(".")[2]
+        phase = _PHASES.get(step)
+        if phase is None:
+            return
+        if stage == "started":
+            self._started[step] = time.perf_counter()
+        elif step in self._started:
+            seconds = time.perf_counter() - self._started.pop(step)
+            self.metrics.phase(self.route, phase, seconds)
+
+    async def atrace(self, event_name: str, info: dict):
+        self.trace(event_name, info)
+
+
+def body_size(request: Any) -> int:
+    """Request body size from its headers (streamed bodies are not read)."""
+    return int(request.headers.get("Content-Length", 0))
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Iterable[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """`(upper bound, count <= bound)` pairs, ending with `+inf`."""
+        total, pairs = 0, []
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the `q` quantile."""
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return float("inf")
+
+
+class InMemoryMetrics(Metrics):
+    """Keeps histograms and counters in memory; safe to share across threads."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.durations: dict[tuple[str, str], Histogram] = {}
+        self.phases: dict[tuple[str, str], Histogram] = {}
+        self.statuses: Counter = Counter()
+        self.bytes_out: Counter = Counter()
+        self.bytes_in: Counter = Counter()
+        self.retries: Counter = Counter()
+        self.messages: Counter = Counter()
+        self.message_bytes: Counter = Counter()
+        self._first_message: dict[tuple[str, str], float] = {}
+        self._last_message: dict[tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, histograms: dict, key: tuple) -> Histogram:
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(self.buckets)
+        return histogram
+
+    def request(self, method, route, status, seconds, bytes_out, bytes_in):
+        key = (method, route)
+        with self._lock:
+            self._histogram(self.durations, key).observe(seconds)
+            self.statuses[method, route, status] += 1
+            self.bytes_out[key] += bytes_out
+            self.bytes_in[key] += bytes_in
+
+    def phase(self, route, phase, seconds):
+        with self._lock:
+            self._histogram(self.phases, (route, phase)).observe(seconds)
+
+    def retry(self, method, route, reason):
+        with self._lock:
+            self.retries[method, route, reason] += 1
+
+    def message(self, loop_id, stream, size):
+        key = (loop_id, stream)
+        now = time.monotonic()
+        with self._lock:
+            self.messages[key] += 1
+            self.message_bytes[key] += size
+            self._first_message.setdefault(key, now)
+            self._last_message[key] = now
+
+    def message_rate(self, loop_id: str, stream: str) -> float:
+        """Messages per second between the first and last message seen."""
+        key = (loop_id, stream)
+        if self.messages[key] < 2:
+            return 0.0
+        elapsed = self._last_message[key] - self._first_message[key]
+        return (self.messages[key] - 1) / elapsed if elapsed else float("inf")
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: Any) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return "{" + pairs + "}"
+
+
+class PrometheusMetrics(InMemoryMetrics):
+    """`InMemoryMetrics` that renders the Prometheus text exposition format."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS, prefix="api_client"):
+        super().__init__(buckets)
+        self.prefix = prefix
+
+    def _histogram_lines(self, name, help, histograms, label_names) -> list[str]:
+        lines = [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+        for key, histogram in sorted(histograms.items()):
+            labels = dict(zip(label_names, key))
+            for bound, total in histogram.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels(**labels, le=le)} {total}")
+            lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+        return lines
+
+    def _counter_lines(self, name, help, counter, label_names) -> list[str]:
+        lines = [f"# HELP {name} {help}", f"# TYPE {name} counter"]
+        for key, value in sorted(counter.items()):
+            lines.append(f"{name}{_labels(**dict(zip(label_names, key)))} {value}")
+        return lines
+
+    def render(self) -> str:
+        p = self.prefix
+        with self._lock:
+            lines = [
+                *self._histogram_lines(
+                    f"{p}_request_duration_seconds",
+                    "Duration of API calls, retries included.",
+                    self.durations,
+                    ("method", "route"),
+                ),
+                *self._histogram_lines(
+                    f"{p}_phase_duration_seconds",
+                    "Duration of the phases of API calls.",
+                    self.phases,
+                    ("route", "phase"),
+                ),
+                *self._counter_lines(
+                    f"{p}_responses_total",
+                    "API calls by response status (0: no response).",
+                    self.statuses,
+                    ("method", "route", "status"),
+                ),
+                *self._counter_lines(
+                    f"{p}_request_bytes_total",
+                    "Request body bytes sent.",
+                    self.bytes_out,
+                    ("method", "route"),
+                ),
+                *self._counter_lines(
+                    f"{p}_response_bytes_total",
+                    "Response body bytes received.",
+                    self.bytes_in,
+                    ("method", "route"),
+                ),
+                *self._counter_lines(
+                    f"{p}_retries_total",
+                    "Retried attempts by reason.",
+                    self.retries,
+                    ("method", "route", "reason"),
+                ),
+                *self._counter_lines(
+                    f"{p}_stream_messages_total",
+                    "Websocket messages received.",
+                    self.messages,
+                    ("loop_id", "stream"),
+                ),
+                *self._counter_lines(
+                    f"{p}_stream_bytes_total",
+                    "Websocket message bytes received.",
+                    self.message_bytes,
+                    ("loop_id", "stream"),
+                ),
+            ]
+        return "\n".join(lines) + "\n"
+
+
+class OpenTelemetryMetrics(Metrics):
+    """Reports to OpenTelemetry instruments, and one span per API call.
+
+    Requires the optional `opentelemetry-api` package; the global meter and
+    tracer providers are used unless `meter` / `tracer` are given.
+    """
+
+    def __init__(self, meter: Any = None, tracer: Any = None):
+        from opentelemetry import metrics, trace
+
+        meter = meter or metrics.get_meter("api_client")
+        self.tracer = tracer or trace.get_tracer("api_client")
+        self._duration = meter.create_histogram(
+            "http.client.request.duration", unit="s"
+        )
+        self._phase = meter.create_histogram("api_client.phase.duration", unit="s")
+        self._bytes_out = meter.create_counter(
+            "http.client.request.body.size", unit="By"
+        )
+        self._bytes_in = meter.create_counter(
+            "http.client.response.body.size", unit="By"
+        )
+        self._retries = meter.create_counter("api_client.retries")
+        self._messages = meter.create_counter("api_client.stream.messages")
+
+    def request(self, method, route, status, seconds, bytes_out, bytes_in):
+        attributes = {
+            "http.request.method": method,
+            "http.route": route,
+            "http.response.status_code": status,
+        }
+        self._duration.record(seconds, attributes)
+        self._bytes_out.add(bytes_out, attributes)
+        self._bytes_in.add(bytes_in, attributes)
+        end = time.time_ns()
+        span = self.tracer.start_span(
+            f"{method} {route}",
+            start_time=end - int(seconds * 1e9),
+            attributes=attributes,
+        )
+        span.end(end_time=end)
+
+    def phase(self, route, phase, seconds):
+        self._phase.record(seconds, {"http.route": route, "phase": phase})
+
+    def retry(self, method, route, reason):
+        self._retries.add(
+            1, {"http.request.method": method, "http.route": route, "reason": reason}
+        )
+
+    def message(self, loop_id, stream, size):
+        self._messages.add(1, {"loop_id": loop_id, "stream": stream})
@@ -0,0 +1,338 @@
+"""Local SQLite mirror of users, loops and packages.
+
+    mirror = Mirror(client, "zeit.db")
+    mirror.sync()                       # first run: every page, concurrently
+    mirror.sync()                       # later runs: only the new entities
+    mirror.user_by_email("a@b.com")     # index lookups, no API round trip
+
+List endpoints page by offset in `_id` order (`sort_params` are sent with
+every list request for servers that need to be asked), so the mirror keeps,
+per collection, the last `_id` it stored and how many entities came before
+it. An incremental sync re-reads the list from that position and stores
+what follows; if that `_id` is no longer there (entities were deleted) or
+the ids do not increase, it falls back to a full sync, which also removes
+the entities gone from the server. A full sync whose ids do not increase
+stores no position, so every sync of that collection stays a full one.
+Since ids embed their creation time, `created_between` is a range scan of
+the primary key (`ObjectId.from_datetime`).
+
+Edits to existing entities are only seen by a full sync (`sync(full=True)`),
+unless the server filters lists by update time: with `updated_param` (e.g.
+`"updated_since"`), an incremental sync also fetches the entities whose
+`updated_field` is newer than the latest one stored.
+"""
+
+import datetime
+import itertools
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+from .APIError import APIError
+from .bulk import DEFAULT_CONCURRENCY
+from .pagination import DEFAULT_PAGE_SIZE, _is_last_page, _page_items
+from .schemas.objectid import ObjectId
+
+
+@dataclass(frozen=True)
+class Collection:
+    path: str
+    # top-level fields stored in indexed columns
+    indexed: tuple[str, ...]
+
+
+COLLECTIONS = {
+    "users": Collection("/users", ("email",)),
+    "loops": Collection("/loops", ("name", "status", "type")),
+    "packages": Collection("/packages", ("tracking_number", "loop_id")),
+}
+
+
+def _collection(name: str) -> Collection:
+    # also keeps table names in queries to the known ones
+    if name not in COLLECTIONS:
+        raise ValueError(f"Unknown collection {name!r}")
+    return COLLECTIONS[name]
+
+
+def _ascending(items: list[dict]) -> bool:
+    ids = [item["_id"] for item in items]
+    return all(a < b for a, b in zip(ids, ids[1:]))
+
+
+@dataclass
+class SyncResult:
+    collection: str
+    full: bool
+    fetched: int = 0
+    stored: int = 0
+    deleted: int = 0
+
+
+class Mirror:
+    """SQLite mirror kept up to date through an `APIClient`.
+
+    Pages are fetched `max_concurrency` at a time on the client's thread
+    pool; the database is only used from the thread calling `sync` and the
+    queries.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        path: str | os.PathLike = ":memory:",
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        updated_field: str = "updated_at",
+        updated_param: str | None = None,
+        sort_params: dict | None = None,
+    ):
+        self.client = client
+        self.page_size = page_size
+        self.max_concurrency = max_concurrency
+        self.updated_field = updated_field
+        self.updated_param = updated_param
+        self.sort_params = sort_params or {}
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self._create_tables()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _create_tables(self):
+        with self.db:
+            for name, collection in COLLECTIONS.items():
+                columns = "".join(f", {column} TEXT" for column in collection.indexed)
+                self.db.execute(
+                    f"CREATE TABLE IF NOT EXISTS {name} (id TEXT PRIMARY KEY,"
+                    f" updated_at TEXT{columns}, data TEXT NOT NULL)"
+                )
+                for column in collection.indexed:
+                    self.db.execute(
+                        f"CREATE INDEX IF NOT EXISTS {name}_{column}"
+                        f" ON {name} ({column})"
+                    )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS user_loops (user_id TEXT, loop_id TEXT,"
+                " PRIMARY KEY (user_id, loop_id)) WITHOUT ROWID"
+            )
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS user_loops_loop_id ON user_loops (loop_id)"
+            )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks (collection TEXT PRIMARY KEY,"
+                " last_id TEXT, position INTEGER, updated_at TEXT, synced_at REAL)"
+            )
+
+    # fetching
+
+    def _fetch(self, path: str, params: dict, offset: int) -> Any:
+        params = {**self.sort_params, **params}
+        params.update(limit=self.page_size, offset=offset)
+        return self.client.get(path, params=params)
+
+    def _pages(self, path: str, params: dict, start: int = 0) -> Iterator[list]:
+        """Pages of `path` from offset `start` until the last one, with up to
+        `max_concurrency` requests in flight."""
+        offsets = itertools.count(start, self.page_size)
+        pages = self.client._map_concurrent(
+            lambda offset: self._fetch(path, params, offset),
+            offsets,
+            self.max_concurrency,
+            True,
+        )
+        try:
+            for offset, page in pages:
+                if isinstance(page, APIError):
+                    raise page
+                items = _page_items(page)
+                yield items
+                if _is_last_page(page, items, offset, self.page_size):
+                    return
+        finally:
+            # waits for the requests already in flight past the last page
+            pages.close()
+
+    # storing
+
+    def _store(self, name: str, items: list[dict]) -> int:
+        collection = COLLECTIONS[name]
+        columns = ", ".join(collection.indexed)
+        placeholders = ", ".join("?" * (len(collection.indexed) + 3))
+        rows = [
+            (
+                item["_id"],
+                item.get(self.updated_field),
+                *(item.get(column) for column in collection.indexed),
+                self.client.codec.dumps(item).decode(),
+            )
+            for item in items
+        ]
+        self.db.executemany(
+            f"INSERT OR REPLACE INTO {name} (id, updated_at, {columns}, data)"
+            f" VALUES ({placeholders})",
+            rows,
+        )
+        if name == "users":
+            ids = [(item["_id"],) for item in items]
+            self.db.executemany("DELETE FROM user_loops WHERE user_id = ?", ids)
+            self.db.executemany(
+                "INSERT OR IGNORE INTO user_loops VALUES (?, ?)",
+                [
+                    (item["_id"], loop_id)
+                    for item in items
+                    for loop_id in item.get("loops") or ()
+                ],
+            )
+        return len(rows)
+
+    def _watermark(self, name: str) -> sqlite3.Row | None:
+        return self.db.execute(
+            "SELECT * FROM watermarks WHERE collection = ?", (name,)
+        ).fetchone()
+
+    def _set_watermark(self, name: str, last_id: str | None, position: int | None):
+        (updated_at,) = self.db.execute(
+            f"SELECT max(updated_at) FROM {name}"
+        ).fetchone()
+        self.db.execute(
+            "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?, ?)",
+            (name, last_id, position, updated_at, time.time()),
+        )
+
+    # syncing
+
+    def sync(self, *collections: str, full: bool = False) -> dict[str, SyncResult]:
+        """Bring `collections` (all by default) up to date."""
+        return {name: self._sync(name, full) for name in collections or COLLECTIONS}
+
+    def _sync(self, name: str, full: bool) -> SyncResult:
+        path = _collection(name).path
+        watermark = self._watermark(name)
+        if full or watermark is None or watermark["position"] is None:
+            return self._full_sync(name)
+
+        result = SyncResult(name, full=False)
+        position, last_id = watermark["position"], watermark["last_id"]
+        items = [
+            item
+            for page in self._pages(path, {}, max(position - 1, 0))
+            for item in page
+        ]
+        if last_id is not None and (not items or items[0]["_id"] != last_id):
+            # entities before the watermark were deleted: offsets moved
+            return self._full_sync(name)
+        if not _ascending(items):
+            # the list is not in `_id` order (any more)
+            return self._full_sync(name)
+        if last_id is not None:
+            items = items[1:]
+        with self.db:
+            result.fetched = len(items)
+            result.stored = self._store(name, items)
+            if self.updated_param is not None and watermark["updated_at"]:
+                params = {self.updated_param: watermark["updated_at"]}
+                for page in self._pages(path, params):
+                    result.fetched += len(page)
+                    result.stored += self._store(name, page)
+            if items:
+                last_id = items[-1]["_id"]
+            self._set_watermark(name, last_id, position + len(items))
+        return result
+
+    def _full_sync(self, name: str) -> SyncResult:
+        result = SyncResult(name, full=True)
+        items = [
+            item for page in self._pages(COLLECTIONS[name].path, {}) for item in page
+        ]
+        with self.db:
+            result.fetched = len(items)
+            result.stored = self._store(name, items)
+            self.db.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS seen (id TEXT PRIMARY KEY)"
+            )
+            self.db.execute("DELETE FROM seen")
+            self.db.executemany(
+                "INSERT OR IGNORE INTO seen VALUES (?)", [(i["_id"],) for i in items]
+            )
+            result.deleted = self.db.execute(
+                f"DELETE FROM {name} WHERE id NOT IN (SELECT id FROM seen)"
+            ).rowcount
+            if name == "users":
+                self.db.execute(
+                    "DELETE FROM user_loops WHERE user_id NOT IN (SELECT id FROM seen)"
+                )
+            if not _ascending(items):
+                # offsets say nothing about what is new: no incremental sync
+                self._set_watermark(name, None, None)
+            else:
+                last_id = items[-1]["_id"] if items else None
+                self._set_watermark(name, last_id, len(items))
+        return result
+
+    # queries
+
+    def _query(self, query: str, *args: Any) -> list[dict]:
+        loads = self.client.codec.loads
+        return [loads(row["data"]) for row in self.db.execute(query, args)]
+
+    def get(self, collection: str, id: Any) -> dict | None:
+        _collection(collection)
+        rows = self._query(f"SELECT data FROM {collection} WHERE id = ?", str(id))
+        return rows[0] if rows else None
+
+    def find(self, collection: str, **filters: Any) -> list[dict]:
+        """Documents whose indexed columns equal `filters`."""
+        indexed = _collection(collection).indexed
+        for column in filters:
+            if column not in indexed:
+                raise ValueError(
+                    f"{collection} are indexed by {indexed}, not {column!r}"
+                )
+        where = " AND ".join(f"{column} = ?" for column in filters) or "1"
+        return self._query(
+            f"SELECT data FROM {collection} WHERE {where}",
+            *(str(value) for value in filters.values()),
+        )
+
+    def created_between(
+        self,
+        collection: str,
+        start: datetime.datetime,
+        end: datetime.datetime | None = None,
+    ) -> list[dict]:
+        """Documents whose `_id` was generated in `[start, end)`."""
+        _collection(collection)
+        query = f"SELECT data FROM {collection} WHERE id >= ?"
+        args = [str(ObjectId.from_datetime(start))]
+        if end is not None:
+            query += " AND id < ?"
+            args.append(str(ObjectId.from_datetime(end)))
+        return self._query(query + " ORDER BY id", *args)
+
+    def user_by_email(self, email: str) -> dict | None:
+        users = self.find("users", email=email)
+        return users[0] if users else None
+
+    def users_for_loop(self, loop_id: Any) -> list[dict]:
+        return self._query(
+            "SELECT data FROM users JOIN user_loops ON users.id = user_id"
+            " WHERE loop_id = ?",
+            str(loop_id),
+        )
+
+    def packages_for_loop(self, loop_id: Any) -> list[dict]:
+        return self.find("packages", loop_id=loop_id)
+
+    def package_by_tracking_number(self, tracking_number: str) -> dict | None:
+        packages = self.find("packages", tracking_number=tracking_number)
+        return packages[0] if packages else None
@@ -0,0 +1,138 @@
+"""Decoding and validating large responses outside the calling thread.
+
+JSON decoding and model validation of a page of hundreds of items hold the
+GIL for milliseconds, stalling every other thread of the process. A client
+given a `DecodePool` hands the raw body of responses of `threshold` bytes or
+more to the pool's workers instead: `APIClient` waits on the result with the
+GIL released, `AsyncAPIClient` awaits it without blocking the event loop.
+
+Results come back pickled, and unpickling them also holds the GIL: the pool
+pays off when decoding and validation cost clearly more than that (heavy
+models, the standard library codec), which `python -m benchmarks.run --only
+decode_offload` measures.
+
+Workers are processes started with `forkserver` (`spawn` where unavailable),
+so they do not inherit the threads and locks of the parent. On free-threaded
+Python builds, threads are used instead. Any `concurrent.futures.Executor`
+can be passed as `executor`.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any
+
+from .codec import BACKENDS, JSONCodec, get_codec
+
+DEFAULT_THRESHOLD = 256 << 10
+
+# validation modes applied in the workers; "lazy" lists are built by the client
+WORKER_VALIDATION = ("full", "construct")
+
+
+@lru_cache(maxsize=None)
+def _named_codec(name: str) -> JSONCodec:
+    return get_codec(name)
+
+
+def _warm_up():
+    # import the response models once per worker rather than on first decode
+    from .schemas import responses  # noqa: F401
+
+
+def decode(
+    content: bytes,
+    codec: JSONCodec | str = "json",
+    model: str | None = None,
+    validation: str | None = None,
+    many: bool = False,
+) -> Any:
+    """What `APIRoutes._parse_response` does with a successful body, minus
+    "lazy" validation; runs in the workers."""
+    if isinstance(codec, str):
+        codec = _named_codec(codec)
+    if model is None or validation not in WORKER_VALIDATION:
+        return codec.loads(content)
+    from .schemas import responses
+
+    type = getattr(responses, model)
+    if validation == "full" and not many:
+        return codec.decode(content, type)
+    return responses.validate_response(codec.loads(content), type, validation, many)
+
+
+def _default_executor(max_workers: int | None) -> Executor:
+    if not getattr(sys, "_is_gil_enabled", lambda: True)():
+        return ThreadPoolExecutor(max_workers, thread_name_prefix="api_client-decode")
+    # multiprocessing is only imported once a pool is used
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    method = (
+        "forkserver"
+        if "forkserver" in multiprocessing.get_all_start_methods()
+        else "spawn"
+    )
+    return ProcessPoolExecutor(
+        max_workers,
+        mp_context=multiprocessing.get_context(method),
+        initializer=_warm_up,
+    )
+
+
+class DecodePool:
+    """Worker pool shared by any number of clients; see the module docstring.
+
+    The executor is created on first use and shut down by `close`.
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        threshold: int = DEFAULT_THRESHOLD,
+        executor: Executor | None = None,
+    ):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.threshold = threshold
+        self._executor = executor
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = _default_executor(self.max_workers)
+            return self._executor
+
+    def submit(
+        self,
+        content: bytes,
+        codec: JSONCodec | str | None = None,
+        model: str | None = None,
+        validation: str | None = None,
+        many: bool = False,
+    ) -> Future:
+        """Decode (and validate) `content` in a worker."""
+        codec = get_codec(codec)
+        if type(codec) is BACKENDS.get(codec.name):
+            # the built-in codecs are rebuilt in the workers rather than pickled
+            codec = codec.name
+        return self.executor.submit(decode, content, codec, model, validation, many)
+
+    async def adecode(self, content: bytes, **kwargs) -> Any:
+        return await asyncio.wrap_future(self.submit(content, **kwargs))
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
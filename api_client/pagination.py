@@ -0,0 +1,95 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator
+
+DEFAULT_PAGE_SIZE = 100
+
+
+def _page_items(page: Any) -> list:
+    """Items of a list response: `{"items": [...]}`, a `Page` or a bare list."""
+    if isinstance(page, dict):
+        return page.get("items", [])
+    return getattr(page, "items", page)
+
+
+def _is_last_page(page: Any, items: list, offset: int, page_size: int) -> bool:
+    if len(items) < page_size:
+        return True
+    if isinstance(page, dict):
+        total = page.get("total")
+    else:
+        total = getattr(page, "total", None)
+    return total is not None and offset + len(items) >= total
+
+
+def paginate(
+    fetch_page: Callable[[int, int], Any],
+    page_size: int = DEFAULT_PAGE_SIZE,
+    prefetch: bool = True,
+) -> Iterator[Any]:
+    """Lazily yield items from `fetch_page(limit, offset)`, one page at a time.
+
+    With `prefetch`, the next page is requested on a background thread while
+    the caller consumes the current one, so at most two pages are in memory.
+    """
+    if page_size < 1:
+        raise ValueError("page_size must be a positive integer")
+
+    if not prefetch:
+        offset = 0
+        while True:
+            page = fetch_page(page_size, offset)
+            items = _page_items(page)
+            yield from items
+            if _is_last_page(page, items, offset, page_size):
+                return
+            offset += len(items)
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        offset = 0
+        future = executor.submit(fetch_page, page_size, offset)
+        while True:
+            page = future.result()
+            items = _page_items(page)
+            last = _is_last_page(page, items, offset, page_size)
+            offset += len(items)
+            if not last:
+                future = executor.submit(fetch_page, page_size, offset)
+            del page
+            yield from items
+            if last:
+                return
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def apaginate(
+    fetch_page: Callable[[int, int], Awaitable[Any]],
+    page_size: int = DEFAULT_PAGE_SIZE,
+    prefetch: bool = True,
+) -> AsyncIterator[Any]:
+    """Async counterpart of `paginate`; prefetching runs as a concurrent task."""
+    if page_size < 1:
+        raise ValueError("page_size must be a positive integer")
+
+    offset = 0
+    task = asyncio.ensure_future(fetch_page(page_size, offset))
+    try:
+        while True:
+            page = await task
+            items = _page_items(page)
+            last = _is_last_page(page, items, offset, page_size)
+            offset += len(items)
+            if not last and prefetch:
+                task = asyncio.ensure_future(fetch_page(page_size, offset))
+            del page
+            for item in items:
+                yield item
+            if last:
+                return
+            if not prefetch:
+                task = asyncio.ensure_future(fetch_page(page_size, offset))
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,196 @@
+import asyncio
+import inspect
+import struct
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Callable, Literal
+
+Backpressure = Literal["block", "drop_oldest", "spill"]
+
+_DONE = object()
+_HEADER = struct.Struct(">BI")
+_BYTES, _STR, _END = 0, 1, 2
+
+
+class SpillFile:
+    """Append-only FIFO of websocket messages in a temporary file."""
+
+    def __init__(self, directory: str | None = None):
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self._read_pos = 0
+        self._write_pos = 0
+        self.pending = 0
+
+    def __bool__(self) -> bool:
+        return self.pending > 0
+
+    def write(self, message: Any):
+        if message is _DONE:
+            kind, payload = _END, b""
+        elif isinstance(message, str):
+            kind, payload = _STR, message.encode()
+        else:
+            kind, payload = _BYTES, bytes(message)
+        self._file.seek(self._write_pos)
+        self._file.write(_HEADER.pack(kind, len(payload)) + payload)
+        self._write_pos = self._file.tell()
+        self.pending += 1
+
+    def read(self) -> Any:
+        self._file.seek(self._read_pos)
+        kind, size = _HEADER.unpack(self._file.read(_HEADER.size))
+        payload = self._file.read(size)
+        self._read_pos = self._file.tell()
+        self.pending -= 1
+        if not self.pending:
+            # everything was consumed, reclaim the disk space
+            self._file.seek(0)
+            self._file.truncate()
+            self._read_pos = self._write_pos = 0
+        if kind == _END:
+            return _DONE
+        return payload.decode() if kind == _STR else payload
+
+    def close(self):
+        self._file.close()
+
+
+@dataclass
+class PipelineStats:
+    received: int = 0
+    delivered: int = 0
+    batches: int = 0
+    dropped: int = 0
+    spilled: int = 0
+
+
+class StreamPipeline:
+    """Bounded queue between a websocket reader and (async) consumers.
+
+    `consumer` is called with lists of messages, either sync or async. A batch
+    is flushed once it holds `batch_size` messages or, if `batch_interval` is
+    set, when that many seconds passed since its first message. Without an
+    interval, a batch only takes the messages that are already queued.
+
+    When the queue is full, `backpressure` decides what happens: `"block"`
+    stops reading the socket until there is room, `"drop_oldest"` discards the
+    oldest queued message and `"spill"` writes messages to a temporary file in
+    `spill_dir` which is drained in order once the consumers catch up.
+    """
+
+    def __init__(
+        self,
+        consumer: Callable[[list], Any],
+        *,
+        maxsize: int = 1000,
+        backpressure: Backpressure = "block",
+        batch_size: int = 1,
+        batch_interval: float | None = None,
+        concurrency: int = 1,
+        spill_dir: str | None = None,
+    ):
+        if backpressure not in ("block", "drop_oldest", "spill"):
+            raise ValueError(f"Unknown backpressure mode {backpressure!r}")
+        if maxsize < 1 or batch_size < 1 or concurrency < 1:
+            raise ValueError("maxsize, batch_size and concurrency must be positive")
+        self.consumer = consumer
+        self.maxsize = maxsize
+        self.backpressure = backpressure
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.concurrency = concurrency
+        self.spill_dir = spill_dir
+        self.stats = PipelineStats()
+        self._queue: asyncio.Queue | None = None
+        self._spill: SpillFile | None = None
+        self._finished = False
+
+    async def put(self, message: Any):
+        self.stats.received += 1
+        if self._spill:
+            # keep ordering: while anything is on disk, new messages go there too
+            self._spill.write(message)
+            self.stats.spilled += 1
+        elif not self._queue.full():
+            self._queue.put_nowait(message)
+        elif self.backpressure == "block":
+            await self._queue.put(message)
+        elif self.backpressure == "drop_oldest":
+            self._queue.get_nowait()
+            self.stats.dropped += 1
+            self._queue.put_nowait(message)
+        else:
+            if self._spill is None:
+                self._spill = SpillFile(self.spill_dir)
+            self._spill.write(message)
+            self.stats.spilled += 1
+
+    async def _next(self, timeout: float | None = None) -> Any:
+        if not self._queue.empty():
+            return self._queue.get_nowait()
+        if self._spill:
+            return self._spill.read()
+        if timeout is None:
+            return await self._queue.get()
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+    async def _consume(self):
+        while not self._finished:
+            message = await self._next()
+            if message is _DONE:
+                break
+            batch = [message]
+            deadline = time.monotonic() + (self.batch_interval or 0)
+            while len(batch) < self.batch_size:
+                if self.batch_interval is None:
+                    if self._queue.empty() and not self._spill:
+                        break
+                    message = await self._next()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        message = await self._next(remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if message is _DONE:
+                    self._finished = True
+                    break
+                batch.append(message)
+            result = self.consumer(batch)
+            if inspect.isawaitable(result):
+                await result
+            self.stats.batches += 1
+            self.stats.delivered += len(batch)
+        self._finished = True
+        try:
+            # wake the other consumers
+            self._queue.put_nowait(_DONE)
+        except asyncio.QueueFull:
+            pass
+
+    async def _read(self, source: AsyncIterable):
+        async for message in source:
+            await self.put(message)
+        if self._spill:
+            self._spill.write(_DONE)
+        else:
+            await self._queue.put(_DONE)
+
+    async def run(self, source: AsyncIterable):
+        """Feed every message of `source` through the pipeline until it ends."""
+        self._queue = asyncio.Queue(self.maxsize)
+        self._finished = False
+        tasks = [asyncio.create_task(self._read(source))]
+        tasks += [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+        try:
+            # a failing consumer cancels the reader instead of leaving it blocked
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
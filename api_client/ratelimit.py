@@ -0,0 +1,202 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second.
+
+    `reserve` takes a token immediately, letting the balance go negative, and
+    returns how long the caller must wait before using it. The waiting itself
+    happens outside the lock, so the same bucket serves threads and asyncio.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class InFlightGate:
+    """Caps concurrent requests across threads and event loops."""
+
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError("max_in_flight must be a positive integer")
+        self.limit = limit
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._async_waiters: deque = deque()
+
+    def acquire(self) -> bool:
+        """Block until a slot is free; return whether the caller had to wait."""
+        with self._cond:
+            waited = self.in_flight >= self.limit
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+        return waited
+
+    async def acquire_async(self) -> bool:
+        loop = asyncio.get_running_loop()
+        waited = False
+        while True:
+            with self._lock:
+                if self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return waited
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+            waited = True
+            await future
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._cond.notify()
+            # waiters re-check the count, so waking all of them is safe
+            waiters, self._async_waiters = self._async_waiters, deque()
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+
+@dataclass
+class RouteLimit:
+    """Requests per second (`rate`, with `burst`) and/or a `max_in_flight` cap."""
+
+    rate: float | None = None
+    burst: float | None = None
+    max_in_flight: int | None = None
+
+
+@dataclass
+class LimiterStats:
+    requests: int = 0
+    waited: int = 0
+    wait_seconds: float = 0.0
+
+
+class _Limits:
+    def __init__(self, limit: RouteLimit):
+        self.bucket = TokenBucket(limit.rate, limit.burst) if limit.rate else None
+        self.gate = InFlightGate(limit.max_in_flight) if limit.max_in_flight else None
+        self.stats = LimiterStats()
+
+
+class RateLimiter:
+    """Client-side rate limiting and concurrency governor.
+
+    The global limit applies to every request; on top of it the longest
+    matching prefix in `routes` (e.g. `{"/packages": RouteLimit(rate=5)}`)
+    applies its own limit. Time spent waiting on buckets and in-flight caps is
+    counted per route prefix in `stats` (`"*"` holds the global counters).
+    One limiter can be shared between threads, event loops and clients.
+    """
+
+    def __init__(
+        self,
+        rate: float | None = None,
+        burst: float | None = None,
+        max_in_flight: int | None = None,
+        routes: dict[str, RouteLimit] | None = None,
+    ):
+        self._global = _Limits(RouteLimit(rate, burst, max_in_flight))
+        self._stats_lock = threading.Lock()
+        self._routes = {
+            prefix: _Limits(limit)
+            for prefix, limit in sorted(
+                (routes or {}).items(), key=lambda item: len(item[0]), reverse=True
+            )
+        }
+
+    @property
+    def stats(self) -> dict[str, LimiterStats]:
+        stats = {"*": self._global.stats}
+        stats.update((prefix, limits.stats) for prefix, limits in self._routes.items())
+        return stats
+
+    def _match(self, path: str) -> list[_Limits]:
+        # route limits first, so waiting on a narrow cap holds no global slot
+        for prefix, limits in self._routes.items():
+            if path.startswith(prefix):
+                return [limits, self._global]
+        return [self._global]
+
+    @staticmethod
+    def _reserve(matched: list[_Limits]) -> float:
+        return max(
+            (limits.bucket.reserve() for limits in matched if limits.bucket),
+            default=0.0,
+        )
+
+    def _record(self, matched: list[_Limits], started: float, waited: bool):
+        elapsed = time.monotonic() - started
+        with self._stats_lock:
+            for limits in matched:
+                limits.stats.requests += 1
+                if waited:
+                    limits.stats.waited += 1
+                    limits.stats.wait_seconds += elapsed
+
+    @contextmanager
+    def limit(self, path: str):
+        matched = self._match(path)
+        started = time.monotonic()
+        delay = self._reserve(matched)
+        if delay:
+            time.sleep(delay)
+        acquired = []
+        waited = delay > 0
+        try:
+            for limits in matched:
+                if limits.gate:
+                    waited = limits.gate.acquire() or waited
+                    acquired.append(limits.gate)
+            self._record(matched, started, waited)
+            yield
+        finally:
+            for gate in acquired:
+                gate.release()
+
+    @asynccontextmanager
+    async def alimit(self, path: str):
+        matched = self._match(path)
+        started = time.monotonic()
+        delay = self._reserve(matched)
+        if delay:
+            await asyncio.sleep(delay)
+        acquired = []
+        waited = delay > 0
+        try:
+            for limits in matched:
+                if limits.gate:
+                    waited = await limits.gate.acquire_async() or waited
+                    acquired.append(limits.gate)
+            self._record(matched, started, waited)
+            yield
+        finally:
+            for gate in acquired:
+                gate.release()
@@ -0,0 +1,159 @@
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+class RetryBudget:
+    """Token bucket capping retries to a fraction of the request volume.
+
+    Every request deposits `ratio` tokens and every retry withdraws one, so in
+    steady state at most `ratio` of the traffic is retries. `min_per_second`
+    tokens are added per second so low-traffic clients can still retry, and
+    the balance never exceeds `max_tokens`. Thread-safe; share one budget
+    between clients to cap retries process-wide.
+    """
+
+    def __init__(
+        self, ratio: float = 0.2, min_per_second: float = 1.0, max_tokens: float = 20.0
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, amount: float = 0.0):
+        now = time.monotonic()
+        self._tokens = min(
+            self.max_tokens,
+            self._tokens + amount + (now - self._updated) * self.min_per_second,
+        )
+        self._updated = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill(self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+def _rewind_nothing():
+    pass
+
+
+def body_rewinder(*bodies: Any) -> Callable[[], None] | None:
+    """A function putting request bodies (`content`, `data`, `files` values)
+    back where the first attempt started reading them, to call before sending
+    the request again; `None` when they cannot be sent again (iterators,
+    generators, files that cannot seek) and the request must not be retried.
+    """
+    files = []
+
+    def collect(body: Any) -> bool:
+        if body is None or isinstance(body, (bytes, bytearray, str, int, float)):
+            return True
+        if isinstance(body, dict):
+            return all(collect(value) for value in body.values())
+        if isinstance(body, (list, tuple)):
+            return all(collect(value) for value in body)
+        if hasattr(body, "replayable"):
+            # e.g. `FileChunks`, which rewinds itself
+            return body.replayable
+        if hasattr(body, "read"):
+            if not (hasattr(body, "seekable") and body.seekable()):
+                return False
+            files.append((body, body.tell()))
+            return True
+        return False
+
+    if not collect(bodies):
+        return None
+    if not files:
+        return _rewind_nothing
+
+    def rewind():
+        for file, position in files:
+            file.seek(position)
+
+    return rewind
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a `Retry-After` header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter, shared by `APIClient`,
+    `AsyncAPIClient` and `BaseAPIClient`.
+
+    Only `methods` are retried, on connection errors or on `statuses`. A
+    `Retry-After` header overrides the computed backoff (capped at
+    `max_retry_after`), and each retry must be paid for by `budget`.
+    """
+
+    max_retries: int = 3
+    backoff_factor: float = 0.5
+    max_backoff: float = 30.0
+    jitter: bool = True
+    statuses: frozenset[int] = RETRY_STATUSES
+    methods: frozenset[str] = IDEMPOTENT_METHODS
+    respect_retry_after: bool = True
+    max_retry_after: float = 60.0
+    budget: RetryBudget | None = field(default_factory=RetryBudget)
+
+    def backoff(self, attempt: int) -> float:
+        delay = min(self.max_backoff, self.backoff_factor * (2**attempt))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def next_delay(
+        self,
+        method: str,
+        attempt: int,
+        response: Any = None,
+        error: BaseException | None = None,
+    ) -> float | None:
+        """Seconds to sleep before retry number `attempt + 1`, or `None`.
+
+        Call after every attempt with either the `response` (httpx or requests)
+        or the connection `error` that ended it.
+        """
+        if attempt == 0 and self.budget is not None:
+            self.budget.deposit()
+        if error is None and (
+            response is None or response.status_code not in self.statuses
+        ):
+            return None
+        if attempt >= self.max_retries or method.upper() not in self.methods:
+            return None
+        if self.budget is not None and not self.budget.withdraw():
+            return None
+
+        if self.respect_retry_after and response is not None:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return min(retry_after, self.max_retry_after)
+        return self.backoff(attempt)
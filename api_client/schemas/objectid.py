@@ -15,7 +15,6 @@
 """Tools for working with MongoDB ObjectIds.
 """
 
-import binascii
 import calendar
 import datetime
 import os
@@ -29,13 +28,25 @@ from typing import Any, NoReturn, Optional, Type, Union
 _MAX_COUNTER_VALUE = 0xFFFFFF
 
 
+class InvalidId(ValueError):
+    """Raised when trying to create an ObjectId from invalid data."""
+
+
 def _raise_invalid_id(oid: str) -> NoReturn:
-    raise ValueError(
+    raise InvalidId(
         "%r is not a valid ObjectId, it must be a 12-byte input"
         " or a 24-character hex string" % oid
     )
 
 
+def _utc_timestamp(generation_time: datetime.datetime) -> int:
+    """Seconds since the epoch; naive datetimes are taken to be UTC."""
+    offset = generation_time.utcoffset()
+    if offset is not None:
+        generation_time = generation_time - offset
+    return int(calendar.timegm(generation_time.timetuple()))
+
+
 def _random_bytes() -> bytes:
     """Get the 5-byte random field of an ObjectId."""
     return os.urandom(5)
@@ -51,7 +62,7 @@ class ObjectId(object):
 
     __random = _random_bytes()
 
-    __slots__ = ("__id",)
+    __slots__ = ("__id", "__hex")
 
     _type_marker = 7
 
@@ -79,7 +90,7 @@ class ObjectId(object):
           >>> ObjectId('0123456789ab0123456789ab')
           ObjectId('0123456789ab0123456789ab')
 
-        Raises :class:`~bson.errors.InvalidId` if `oid` is not 12 bytes nor
+        Raises :class:`InvalidId` if `oid` is not 12 bytes nor
         24 hex digits, or :class:`TypeError` if `oid` is not an accepted type.
 
         :Parameters:
@@ -93,6 +104,7 @@ class ObjectId(object):
            <https://github.com/mongodb/specifications/blob/master/source/
            objectid.rst>`_.
         """
+        self.__hex: Optional[str] = None
         if oid is None:
             self.__generate()
         elif isinstance(oid, bytes) and len(oid) == 12:
@@ -130,13 +142,28 @@ class ObjectId(object):
           - `generation_time`: :class:`~datetime.datetime` to be used
             as the generation time for the resulting ObjectId.
         """
-        offset = generation_time.utcoffset()
-        if offset is not None:
-            generation_time = generation_time - offset
-        timestamp = calendar.timegm(generation_time.timetuple())
-        oid = struct.pack(">I", int(timestamp)) + b"\x00\x00\x00\x00\x00\x00\x00\x00"
+        timestamp = _utc_timestamp(generation_time)
+        oid = struct.pack(">I", timestamp) + b"\x00\x00\x00\x00\x00\x00\x00\x00"
         return cls(oid)
 
+    @classmethod
+    def from_hex(cls: Type["ObjectId"], oid: str) -> "ObjectId":
+        """Parse a hex string; a faster equivalent of ``ObjectId(oid)``."""
+        # `fromhex` skips whitespace: only 24 characters are 12 bytes of hex
+        # when none of them is a space
+        if not isinstance(oid, str) or len(oid) != 24:
+            _raise_invalid_id(oid)
+        try:
+            binary = bytes.fromhex(oid)
+        except ValueError:
+            binary = b""
+        if len(binary) != 12:
+            _raise_invalid_id(oid)
+        instance = object.__new__(cls)
+        instance.__id = binary
+        instance.__hex = None
+        return instance
+
     @classmethod
     def is_valid(cls: Type["ObjectId"], oid: Any) -> bool:
         """Checks if a `oid` string is valid or not.
@@ -164,6 +191,16 @@ class ObjectId(object):
             cls.__random = _random_bytes()
         return cls.__random
 
+    @classmethod
+    def _after_fork(cls) -> None:
+        """Reset the per-process state in a forked child: the random field,
+        and the counter lock, which may have been held by another thread of
+        the parent at the time of the fork."""
+        cls._pid = os.getpid()
+        cls.__random = _random_bytes()
+        cls._inc = SystemRandom().randint(0, _MAX_COUNTER_VALUE)
+        cls._inc_lock = threading.Lock()
+
     def __generate(self) -> None:
         """Generate a new value for this ObjectId."""
 
@@ -194,13 +231,7 @@ class ObjectId(object):
         if isinstance(oid, ObjectId):
             self.__id = oid.binary
         elif isinstance(oid, str):
-            if len(oid) == 24:
-                try:
-                    self.__id = bytes.fromhex(oid)
-                except (TypeError, ValueError):
-                    _raise_invalid_id(oid)
-            else:
-                _raise_invalid_id(oid)
+            self.__id = ObjectId.from_hex(oid).binary
         else:
             raise TypeError(
                 "id must be an instance of (bytes, str, ObjectId), not %s"
@@ -224,6 +255,11 @@ class ObjectId(object):
         timestamp = struct.unpack(">I", self.__id[0:4])[0]
         return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
 
+    def __reduce__(self) -> tuple:
+        # the 12 bytes through the constructor: a smaller and faster pickle
+        # than the default reconstructor + `__setstate__` pair
+        return (type(self), (self.__id,))
+
     def __getstate__(self) -> bytes:
         """return value of object for pickling.
         needed explicitly because __slots__() defined.
@@ -245,9 +281,13 @@ class ObjectId(object):
             self.__id = oid.encode("latin-1")
         else:
             self.__id = oid
+        self.__hex = None
 
     def __str__(self) -> str:
-        return binascii.hexlify(self.__id).decode()
+        # cached: ids are formatted over and over into URLs and JSON bodies
+        if self.__hex is None:
+            self.__hex = self.__id.hex()
+        return self.__hex
 
     def __repr__(self):
         return "ObjectId('%s')" % (str(self),)
@@ -285,3 +325,218 @@ class ObjectId(object):
     def __hash__(self) -> int:
         """Get a hash value for this :class:`ObjectId`."""
         return hash(self.__id)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=ObjectId._after_fork)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover - optional dependency
+        raise ImportError(
+            "ObjectIdArray requires numpy: `pip install api-client[numpy]`"
+        )
+    return numpy
+
+
+_HEX_DIGITS = b"0123456789abcdef"
+
+
+def _hex_table():
+    """Nibble value of every ASCII code, 255 for non hex digits."""
+    np = _numpy()
+    table = np.full(256, 255, dtype=np.uint8)
+    for value, digit in enumerate(_HEX_DIGITS):
+        table[digit] = value
+        table[ord(chr(digit).upper())] = value
+    return table
+
+
+class ObjectIdArray:
+    """A compact, vectorized array of ObjectIds.
+
+    Ids are stored back to back, 12 bytes each, in a NumPy ``S12`` array, so
+    a million ids take 12 MB instead of a million Python objects. Parsing,
+    formatting, validation, timestamp extraction, sorting and membership
+    tests run over the whole array at once; an :class:`ObjectId` is only
+    created when a single element is accessed.
+
+    Byte strings order like the ids themselves, and ids start with their
+    generation time, so a sorted array is also sorted by generation time.
+
+    Requires the optional `numpy` dependency.
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: Any = ()) -> None:
+        """Wrap `data`: an ``S12`` array or an iterable of ObjectIds.
+
+        Use :meth:`from_hex` to parse hex strings and :meth:`from_bytes` to
+        wrap a packed buffer without copying.
+        """
+        np = _numpy()
+        if isinstance(data, ObjectIdArray):
+            data = data._data
+        elif not (isinstance(data, np.ndarray) and data.dtype == np.dtype("S12")):
+            data = np.frombuffer(
+                b"".join(ObjectId(oid).binary for oid in data), dtype="S12"
+            )
+        self._data = data
+
+    @classmethod
+    def from_bytes(cls, buffer: Any) -> "ObjectIdArray":
+        """Wrap a buffer of packed 12-byte ids without copying it."""
+        np = _numpy()
+        if len(memoryview(buffer).cast("B")) % 12:
+            raise ValueError("buffer size must be a multiple of 12 bytes")
+        return cls(np.frombuffer(buffer, dtype="S12"))
+
+    @staticmethod
+    def _parse(ids: Any):
+        """Decode hex strings into `(octets, valid)` arrays."""
+        np = _numpy()
+        text = np.asarray(ids, dtype=str).reshape(-1)
+        valid = np.char.str_len(text) == 24
+        # one uint32 code point per character
+        codes = text.astype("U24").view(np.uint32).reshape(-1, 24)
+        nibbles = _hex_table()[np.minimum(codes, 255)]
+        valid &= (nibbles != 255).all(axis=1)
+        octets = (nibbles[:, 0::2] << 4) | nibbles[:, 1::2]
+        return octets, valid
+
+    @classmethod
+    def is_valid(cls, ids: Any):
+        """Boolean array telling which of the hex strings `ids` are ObjectIds."""
+        return cls._parse(ids)[1]
+
+    @classmethod
+    def from_hex(cls, ids: Any, errors: str = "raise") -> "ObjectIdArray":
+        """Parse 24-character hex strings.
+
+        Invalid ids raise :class:`ValueError` with ``errors="raise"`` and are
+        left out with ``errors="drop"``.
+        """
+        if errors not in ("raise", "drop"):
+            raise ValueError(f"Unknown errors mode {errors!r}")
+        np = _numpy()
+        octets, valid = cls._parse(ids)
+        if not valid.all():
+            if errors == "raise":
+                _raise_invalid_id(np.asarray(ids).reshape(-1)[~valid][0])
+            octets = octets[valid]
+        return cls(np.ascontiguousarray(octets).view("S12").reshape(-1))
+
+    def _octets(self):
+        np = _numpy()
+        return np.ascontiguousarray(self._data).view(np.uint8).reshape(-1, 12)
+
+    @property
+    def binary(self) -> bytes:
+        """The ids packed back to back, 12 bytes each."""
+        return self._data.tobytes()
+
+    def to_hex(self):
+        """Array of 24-character hex strings."""
+        np = _numpy()
+        octets = self._octets()
+        digits = np.empty((len(octets), 24), dtype=np.uint8)
+        table = np.frombuffer(_HEX_DIGITS, dtype=np.uint8)
+        digits[:, 0::2] = table[octets >> 4]
+        digits[:, 1::2] = table[octets & 0xF]
+        return digits.view("S24").reshape(-1).astype("U24")
+
+    def timestamps(self):
+        """Generation times as ``uint32`` seconds since the epoch."""
+        np = _numpy()
+        return self._data.view([("time", ">u4"), ("rest", "V8")])["time"].astype(
+            np.uint32
+        )
+
+    def generation_times(self):
+        """Generation times as a ``datetime64[s]`` array (UTC)."""
+        return self.timestamps().astype("datetime64[s]")
+
+    def generated_between(
+        self,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+    ):
+        """Boolean mask of the ids generated in ``[start, end)``.
+
+        Naive datetimes are taken to be UTC.
+        """
+        np = _numpy()
+        timestamps = self.timestamps()
+        mask = np.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= timestamps >= _utc_timestamp(start)
+        if end is not None:
+            mask &= timestamps < _utc_timestamp(end)
+        return mask
+
+    def searchsorted(self, value: Any, side: str = "left") -> Any:
+        """Insertion index of an ObjectId or datetime in a sorted array.
+
+        A datetime is located as :meth:`ObjectId.from_datetime` would be, so
+        ``arr[arr.searchsorted(start):arr.searchsorted(end)]`` selects a time
+        range of a sorted array without scanning it.
+        """
+        np = _numpy()
+        if isinstance(value, datetime.datetime):
+            value = ObjectId.from_datetime(value)
+        return self._data.searchsorted(
+            np.frombuffer(ObjectId(value).binary, dtype="S12")[0], side=side
+        )
+
+    def argsort(self):
+        return self._data.argsort(kind="stable")
+
+    def sort(self) -> "ObjectIdArray":
+        """A sorted copy, which is also in order of generation time."""
+        np = _numpy()
+        return ObjectIdArray(np.sort(self._data))
+
+    def unique(self) -> "ObjectIdArray":
+        """The distinct ids, sorted."""
+        np = _numpy()
+        return ObjectIdArray(np.unique(self._data))
+
+    def isin(self, other: Any):
+        """Boolean mask of the ids that are also in `other`."""
+        np = _numpy()
+        return np.isin(self._data, ObjectIdArray(other)._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, (int, _numpy().integer)):
+            # fancy indexing keeps the trailing NUL bytes a scalar would strip
+            return ObjectId(self._data[[index]].tobytes())
+        return ObjectIdArray(self._data[index])
+
+    def __iter__(self):
+        binary = self.binary
+        for start in range(0, len(binary), 12):
+            yield ObjectId(binary[start : start + 12])
+
+    def __contains__(self, oid: Any) -> bool:
+        np = _numpy()
+        try:
+            value = np.frombuffer(ObjectId(oid).binary, dtype="S12")[0]
+        except (TypeError, ValueError):
+            return False
+        return bool((self._data == value).any())
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, ObjectIdArray):
+            return self.binary == other.binary
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return "ObjectIdArray(%d ids)" % len(self)
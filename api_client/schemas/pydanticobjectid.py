@@ -1,4 +1,6 @@
-from .objectid import ObjectId
+from pydantic_core import core_schema
+
+from .objectid import InvalidId, ObjectId
 
 
 class PydanticObjectId(ObjectId):
@@ -6,22 +8,40 @@ class PydanticObjectId(ObjectId):
     Object Id field. Compatible with Pydantic.
     """
 
+    __slots__ = ()
+
     @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
+    def __get_pydantic_core_schema__(cls, source_type, handler):
+        # Hex strings, by far the most common input, skip `__init__` and go
+        # straight to `bytes.fromhex` via `from_hex`.
+        return core_schema.json_or_python_schema(
+            json_schema=core_schema.chain_schema(
+                [
+                    core_schema.str_schema(strict=True),
+                    core_schema.no_info_plain_validator_function(cls.from_hex),
+                ]
+            ),
+            python_schema=core_schema.no_info_plain_validator_function(cls.validate),
+            serialization=core_schema.to_string_ser_schema(),
+        )
 
     @classmethod
     def validate(cls, v):
         if isinstance(v, bytes):
             v = v.decode("utf-8")
         try:
-            return PydanticObjectId(v)
-        except InvalidId:
-            raise TypeError("Id must be of type PydanticObjectId")
+            if isinstance(v, str):
+                return cls.from_hex(v)
+            if isinstance(v, cls):
+                return v
+            return cls(v)
+        except (InvalidId, TypeError):
+            # pydantic only turns ValueErrors into validation errors
+            raise ValueError("Id must be of type PydanticObjectId")
 
     @classmethod
-    def __modify_schema__(cls, field_schema):
-        field_schema.update(
-            type="string",
-            examples=["5eb7cf5a86d9755df3a6c593", "5eb7cfb05e32e07750a1756a"],
-        )
+    def __get_pydantic_json_schema__(cls, schema, handler):
+        return {
+            "type": "string",
+            "examples": ["5eb7cf5a86d9755df3a6c593", "5eb7cfb05e32e07750a1756a"],
+        }
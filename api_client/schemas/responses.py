@@ -0,0 +1,187 @@
+"""Typed response models and the validation modes used to build them.
+
+Responses only declare the fields the client relies on and keep any other
+field the API sends (`extra="allow"`), so they keep working as the API grows.
+"""
+
+from collections.abc import Sequence
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Literal, Type, get_args, get_origin
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from .objectid import InvalidId
+from .pydanticobjectid import PydanticObjectId
+
+ValidationMode = Literal["full", "construct", "lazy"]
+
+
+class ResponseModel(BaseModel):
+    model_config = ConfigDict(extra="allow", populate_by_name=True)
+
+    id: PydanticObjectId | None = Field(default=None, alias="_id")
+
+
+class User(ResponseModel):
+    email: str | None = None
+    is_active: bool | None = None
+    is_superuser: bool | None = None
+    is_verified: bool | None = None
+    short_name: str | None = None
+    full_name: str | None = None
+    patient_code: str | None = None
+    site_code: str | None = None
+    address: Dict[str, Any] | None = None
+    phone: str | None = None
+    loops: List[PydanticObjectId] | None = None
+    role: str | None = None
+    caregiver: PydanticObjectId | str | None = None
+    patients: List[PydanticObjectId] | None = None
+    onboarding_complete: bool | None = None
+    enroller_email: str | None = None
+    timezone: str | None = None
+    hotspot_id: str | None = None
+
+
+class Loop(ResponseModel):
+    name: str | None = None
+    type: str | None = None
+    status: str | None = None
+
+
+class Package(ResponseModel):
+    tracking_number: str | None = None
+    loop_id: PydanticObjectId | None = None
+
+
+class Session(ResponseModel):
+    loop_id: PydanticObjectId | None = None
+    start: datetime | None = None
+    stop: datetime | None = None
+
+
+class LazyList(Sequence):
+    """List of raw items that are validated the first time they are accessed."""
+
+    __slots__ = ("_raw", "_items", "_validate")
+
+    def __init__(self, raw: list, validate: Callable[[Any], Any]):
+        self._raw = raw
+        self._items: list = [None] * len(raw)
+        self._validate = validate
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        item = self._items[index]
+        if item is None:
+            item = self._items[index] = self._validate(self._raw[index])
+        return item
+
+    def __repr__(self) -> str:
+        return f"LazyList({len(self)} items)"
+
+
+class Page(BaseModel):
+    """A list response; `items` holds models, or a `LazyList` in lazy mode."""
+
+    model_config = ConfigDict(extra="allow", arbitrary_types_allowed=True)
+
+    items: Sequence[Any]
+    total: int | None = None
+    limit: int | None = None
+    offset: int | None = None
+
+
+@lru_cache(maxsize=None)
+def _object_id_fields(model: Type[BaseModel]) -> tuple[tuple[str, bool], ...]:
+    """`(key, many)` of the fields of `model` declared as (lists of) ids."""
+    fields = []
+    for name, info in model.model_fields.items():
+        types = [
+            arg
+            for arg in get_args(info.annotation) or (info.annotation,)
+            if arg is not type(None)
+        ]
+        if types == [PydanticObjectId]:
+            many = False
+        elif (
+            len(types) == 1
+            and get_origin(types[0]) is list
+            and get_args(types[0]) == (PydanticObjectId,)
+        ):
+            many = True
+        else:
+            continue
+        for key in {info.alias or name, name}:
+            fields.append((key, many))
+    return tuple(fields)
+
+
+def _object_id(value: Any) -> Any:
+    if not isinstance(value, str):
+        return value
+    try:
+        return PydanticObjectId.from_hex(value)
+    except InvalidId:
+        return value
+
+
+def _construct(model: Type[BaseModel], item: dict) -> BaseModel:
+    """`model.model_construct`, with the id fields parsed from hex (any
+    other field keeps its JSON type)."""
+    converted = None
+    for key, many in _object_id_fields(model):
+        value = item.get(key)
+        if value is None:
+            continue
+        if converted is None:
+            converted = dict(item)
+        if many:
+            if isinstance(value, list):
+                converted[key] = [_object_id(v) for v in value]
+        else:
+            converted[key] = _object_id(value)
+    return model.model_construct(**(item if converted is None else converted))
+
+
+def _item_validator(model: Type[BaseModel], mode: ValidationMode):
+    if mode == "construct":
+        return lambda item: _construct(model, item)
+    # single objects are validated right away in lazy mode too
+    return model.model_validate
+
+
+def validate_response(
+    data: Any, model: Type[BaseModel], mode: ValidationMode, many: bool = False
+) -> Any:
+    """Turn decoded JSON into `model` instances.
+
+    `"full"` validates everything up front, `"construct"` builds models without
+    any validation (ids are parsed, dates and other fields keep their JSON
+    types) and `"lazy"` validates each item of a list response when it
+    is first accessed. List responses (`many`) come back as a `Page` when the
+    API wraps them in `{"items": [...]}` and as a sequence otherwise.
+    """
+    if mode not in ("full", "construct", "lazy"):
+        raise ValueError(f"Unknown validation mode {mode!r}")
+    validate = _item_validator(model, mode)
+    if isinstance(data, dict) and not (many and "items" in data):
+        return validate(data)
+    if not many:
+        return data
+
+    items = data["items"] if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return data
+    if mode == "lazy":
+        items = LazyList(items, model.model_validate)
+    else:
+        items = [validate(item) for item in items]
+    if isinstance(data, dict):
+        return Page.model_construct(**{**data, "items": items})
+    return items
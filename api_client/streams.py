@@ -0,0 +1,373 @@
+import asyncio
+import contextlib
+import inspect
+import json
+import logging
+import random
+import signal
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Iterable, Literal
+
+from websockets.client import connect
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+
+from .APIError import APIError
+from .APIRoutes import APIRoutes
+
+logger = logging.getLogger(__name__)
+
+StreamType = Literal["status", "data"]
+
+_CLOSED = object()
+
+POSITION_KEYS = ("seq", "sequence", "timestamp", "ts")
+
+
+def message_position(payload: Any) -> int | float | str | None:
+    """Sequence number or timestamp of a JSON text message, if it carries one.
+
+    Binary frames and other payloads yield `None` and are not tracked.
+    """
+    if not isinstance(payload, str) or not payload.startswith("{"):
+        return None
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        return None
+    for key in POSITION_KEYS:
+        if key in message:
+            return message[key]
+    return None
+
+
+def _is_sequence(position: Any) -> bool:
+    return isinstance(position, int) and not isinstance(position, bool)
+
+
+@dataclass(frozen=True)
+class StreamMessage:
+    loop_id: str
+    stream: StreamType
+    type: str | None
+    payload: Any
+    received_at: float
+    position: int | float | str | None = None
+    replayed: bool = False
+
+
+@dataclass
+class Subscription:
+    """One websocket stream of one loop, with its health counters."""
+
+    loop_id: str
+    stream: StreamType = "status"
+    type: str | None = None
+    connected: bool = False
+    # waiting for one of the manager's `max_connections` slots
+    waiting: bool = False
+    connects: int = 0
+    messages: int = 0
+    errors: int = 0
+    last_message_at: float | None = None
+    last_error: str | None = None
+    last_position: int | float | str | None = None
+    gaps: int = 0
+    missed: int = 0
+    replayed: int = 0
+    duplicates: int = 0
+    downtime: float = 0.0
+
+    @property
+    def key(self) -> tuple:
+        return (self.loop_id, self.stream, self.type)
+
+    def params(self) -> dict[str, Any]:
+        return {"type": self.type} if self.type else {}
+
+
+class StreamManager:
+    """Listen to the status and data streams of many loops on one event loop.
+
+    Every subscription runs as a task on its own websocket, reconnecting with
+    jittered exponential backoff whenever the connection drops. Liveness is
+    checked with websocket ping/pong every `ping_interval` seconds. Messages of
+    all subscriptions are delivered, tagged with their loop id and stream, by
+    iterating the manager; they pass through one queue of `queue_size`
+    messages, and each socket buffers at most `max_queue` frames, so memory
+    stays bounded however many loops are watched. Each subscription holds a
+    websocket (a file descriptor) of its own; `max_connections` caps how many
+    are open at once. Subscriptions beyond the cap get no messages: they wait,
+    first come first served, for a slot freed by an unsubscribe or a dropped
+    connection, are listed by `pending`, and a warning is logged when one
+    starts waiting. There is no cap by default. SIGTERM/SIGINT handlers are
+    installed once for the whole manager.
+
+    `position` extracts a sequence number or timestamp from each message and
+    the last one seen is kept per subscription. On reconnect, it is sent as
+    the `resume_param` query parameter (when the server supports resuming)
+    and passed to `backfill(subscription, last_position)`, whose returned
+    payloads (e.g. fetched through `get_sessions`) are delivered with
+    `replayed=True`. Integer sequence numbers are also used to drop
+    duplicates and to count gaps and missed messages; these metrics, plus
+    the time spent disconnected, live on each `Subscription`.
+
+        # at most 400 websockets: past that, subscriptions wait (with a warning)
+        async with StreamManager(client, max_connections=400) as streams:
+            for loop_id in loop_ids:
+                streams.subscribe(loop_id, "data", type="eeg")
+            async for message in streams:
+                ...
+    """
+
+    def __init__(
+        self,
+        client: APIRoutes,
+        *,
+        queue_size: int = 10_000,
+        max_queue: int = 32,
+        max_connections: int | None = None,
+        ping_interval: float | None = 20.0,
+        ping_timeout: float | None = 20.0,
+        reconnect_delay: float = 0.5,
+        max_reconnect_delay: float = 30.0,
+        handle_signals: bool = True,
+        position: Callable[[Any], Any] | None = message_position,
+        resume_param: str | None = None,
+        backfill: Callable[[Subscription, Any], Iterable | Any] | None = None,
+    ):
+        self.client = client
+        self.queue_size = queue_size
+        self.max_queue = max_queue
+        self.max_connections = max_connections
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.handle_signals = handle_signals
+        self.position = position
+        self.resume_param = resume_param
+        self.backfill = backfill
+        self.subscriptions: dict[tuple, Subscription] = {}
+        self._tasks: dict[tuple, asyncio.Task] = {}
+        self._queue: asyncio.Queue | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._signals: list[int] = []
+
+    @property
+    def running(self) -> bool:
+        return self._queue is not None
+
+    @property
+    def pending(self) -> list[Subscription]:
+        """Subscriptions waiting for a connection slot."""
+        return [s for s in self.subscriptions.values() if s.waiting]
+
+    def subscribe(
+        self, loop_id: Any, stream: StreamType = "status", *, type: str | None = None
+    ) -> Subscription:
+        if stream == "data" and type is None:
+            type = "eeg"
+        subscription = Subscription(str(loop_id), stream, type)
+        if subscription.key in self.subscriptions:
+            return self.subscriptions[subscription.key]
+        self.subscriptions[subscription.key] = subscription
+        if self.running:
+            self._start(subscription)
+        return subscription
+
+    def unsubscribe(
+        self, loop_id: Any, stream: StreamType = "status", *, type: str | None = None
+    ):
+        if stream == "data" and type is None:
+            type = "eeg"
+        key = (str(loop_id), stream, type)
+        self.subscriptions.pop(key, None)
+        task = self._tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def _start(self, subscription: Subscription):
+        self._tasks[subscription.key] = asyncio.create_task(self._run(subscription))
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(self.queue_size)
+        if self.max_connections is not None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        for subscription in self.subscriptions.values():
+            self._start(subscription)
+        if self.handle_signals:
+            loop = asyncio.get_running_loop()
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                try:
+                    loop.add_signal_handler(
+                        signum, lambda: asyncio.ensure_future(self.close())
+                    )
+                except (NotImplementedError, RuntimeError):
+                    # not the main thread, or a platform without signal support
+                    break
+                self._signals.append(signum)
+
+    async def close(self):
+        if not self.running:
+            return
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        queue, self._queue = self._queue, None
+        self._slots = None
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(_CLOSED)
+        if self._signals:
+            loop = asyncio.get_running_loop()
+            for signum in self._signals:
+                loop.remove_signal_handler(signum)
+            self._signals = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def __aiter__(self) -> AsyncIterator[StreamMessage]:
+        queue = self._queue
+        if queue is None:
+            raise RuntimeError("StreamManager is not running; use `async with`")
+        while True:
+            message = await queue.get()
+            if message is _CLOSED:
+                return
+            yield message
+
+    def _uri(self, subscription: Subscription) -> str:
+        params = subscription.params()
+        if self.resume_param and subscription.last_position is not None:
+            params[self.resume_param] = subscription.last_position
+        return self.client._ws_uri(
+            f"loops/{subscription.loop_id}/{subscription.stream}",
+            **params,
+            token=self.client.access_token,
+        )
+
+    def _track(self, subscription: Subscription, position: Any) -> bool:
+        """Update gap metrics; return `False` for an already delivered message."""
+        if position is None:
+            return True
+        last = subscription.last_position
+        if _is_sequence(position) and _is_sequence(last):
+            if position <= last:
+                subscription.duplicates += 1
+                return False
+            if position > last + 1:
+                subscription.gaps += 1
+                subscription.missed += position - last - 1
+        subscription.last_position = position
+        return True
+
+    async def _on_message(
+        self, subscription: Subscription, payload: Any, replayed: bool = False
+    ):
+        position = self.position(payload) if self.position else None
+        if not self._track(subscription, position):
+            return
+        if replayed:
+            subscription.replayed += 1
+        else:
+            subscription.messages += 1
+        subscription.last_message_at = time.time()
+        await self._queue.put(
+            StreamMessage(
+                subscription.loop_id,
+                subscription.stream,
+                subscription.type,
+                payload,
+                subscription.last_message_at,
+                position,
+                replayed,
+            )
+        )
+
+    async def _backfill(self, subscription: Subscription):
+        try:
+            payloads = self.backfill(subscription, subscription.last_position)
+            if inspect.isawaitable(payloads):
+                payloads = await payloads
+        except (Exception, APIError) as error:
+            # keep streaming live data even if the gap cannot be filled
+            subscription.errors += 1
+            subscription.last_error = repr(error)
+            return
+        for payload in payloads or ():
+            await self._on_message(subscription, payload, replayed=True)
+
+    @contextlib.asynccontextmanager
+    async def _connection_slot(self, subscription: Subscription):
+        """Hold one of the `max_connections` slots while the websocket is open."""
+        slots = self._slots
+        if slots is None:
+            yield
+            return
+        if slots.locked():
+            logger.warning(
+                "%s stream of loop %s waits for a connection slot:"
+                " max_connections=%d are in use",
+                subscription.stream,
+                subscription.loop_id,
+                self.max_connections,
+            )
+        subscription.waiting = True
+        try:
+            await slots.acquire()
+        finally:
+            subscription.waiting = False
+        try:
+            yield
+        finally:
+            slots.release()
+
+    async def _run(self, subscription: Subscription):
+        delay = self.reconnect_delay
+        disconnected_at = None
+        while True:
+            try:
+                async with self._connection_slot(subscription), connect(
+                    self._uri(subscription),
+                    ping_interval=self.ping_interval,
+                    ping_timeout=self.ping_timeout,
+                    max_queue=self.max_queue,
+                ) as ws:
+                    subscription.connected = True
+                    subscription.connects += 1
+                    delay = self.reconnect_delay
+                    if disconnected_at is not None:
+                        subscription.downtime += time.monotonic() - disconnected_at
+                        if self.backfill and subscription.last_position is not None:
+                            await self._backfill(subscription)
+                    metrics = self.client.metrics
+                    async for payload in ws:
+                        if metrics is not None:
+                            metrics.message(
+                                subscription.loop_id, subscription.stream, len(payload)
+                            )
+                        await self._on_message(subscription, payload)
+            except (
+                ConnectionClosed,
+                InvalidHandshake,
+                OSError,
+                asyncio.TimeoutError,
+            ) as error:
+                subscription.errors += 1
+                subscription.last_error = repr(error)
+            finally:
+                if subscription.connected:
+                    disconnected_at = time.monotonic()
+                subscription.connected = False
+            await asyncio.sleep(random.uniform(0, delay))
+            delay = min(delay * 2, self.max_reconnect_delay)
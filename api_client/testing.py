@@ -0,0 +1,511 @@
+"""An in-process fake Zeit API for offline tests and load tests.
+
+`FakeZeitAPI` keeps users, loops, packages and sessions in memory and serves
+the routes used by `APIRoutes` without any network::
+
+    api = FakeZeitAPI().seed(loops=100)
+    client = APIClient(transport=api.transport(), username=api.username,
+                       password=api.password)
+    async_client = AsyncAPIClient(transport=api)  # as an ASGI app
+
+For clients that need a real socket (`BaseAPIClient`, or measuring the
+network stack), `serve_http` serves the same routes on a local port; the
+status and data websocket streams are served by `serve_streams`. `latency`
+and `error_rate` (or `inject_error`) make the fake behave like a slow or
+flaky server.
+"""
+
+import asyncio
+import base64
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Iterator
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+
+from .auth import jwt_expiry
+from .schemas.objectid import ObjectId
+
+Reply = tuple[int, Any]
+
+
+class FakeZeitAPI:
+    def __init__(
+        self,
+        *,
+        username: str = "user@example.com",
+        password: str = "password",
+        latency: float | tuple[float, float] = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        stream_interval: float = 0.01,
+        stream_messages: int | None = None,
+        channels: int = 4,
+        samples: int = 8,
+        seed: int | None = None,
+        token_ttl: float | None = None,
+    ):
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stream_interval = stream_interval
+        self.stream_messages = stream_messages
+        self.channels = channels
+        self.samples = samples
+        self.random = random.Random(seed)
+        # tokens are unsigned JWTs expiring after `token_ttl` seconds if set
+        self.token_ttl = token_ttl
+        self.calls: Counter = Counter()
+        self.tokens: set[str] = set()
+        self._issued = 0
+        self.users: dict[str, dict] = {}
+        self.loops: dict[str, dict] = {}
+        self.packages: dict[str, dict] = {}
+        self.sessions: dict[str, list[dict]] = {}
+        self.baselines: dict[str, dict] = {}
+        self._errors: deque = deque()
+        self.me = self._add(self.users, {"email": username, "loops": []})
+        self._routes = [
+            (method, re.compile(pattern), getattr(self, name))
+            for method, pattern, name in [
+                ("POST", r"/auth/login", "_login"),
+                ("POST", r"/auth/logout", "_logout"),
+                ("POST", r"/auth/register", "_register"),
+                ("POST", r"/auth/request-verify-token", "_verify_token"),
+                ("GET", r"/users/me", "_get_me"),
+                ("GET", r"/users", "_list_users"),
+                ("GET", r"/users/(\w+)/loops", "_get_user_loops"),
+                ("GET", r"/users/(\w+)", "_get_user"),
+                ("PATCH", r"/users/(\w+)", "_patch_user"),
+                ("DELETE", r"/users/(\w+)", "_delete_user"),
+                ("GET", r"/loops/me", "_get_my_loops"),
+                ("GET", r"/loops", "_list_loops"),
+                ("POST", r"/loops", "_create_loop"),
+                ("GET", r"/loops/(\w+)/sessions", "_get_sessions"),
+                ("GET", r"/loops/(\w+)", "_get_loop"),
+                ("PATCH", r"/loops/(\w+)", "_patch_loop"),
+                ("DELETE", r"/loops/(\w+)", "_delete_loop"),
+                ("GET", r"/packages", "_list_packages"),
+                ("POST", r"/packages", "_create_package"),
+                ("GET", r"/packages/(\w+)", "_get_package"),
+                ("DELETE", r"/packages/(\w+)", "_delete_package"),
+                ("POST", r"/ml/baseline/(\w+)", "_set_baseline"),
+            ]
+        ]
+
+    # data
+
+    @staticmethod
+    def _add(collection: dict, document: dict) -> dict:
+        document = {"_id": str(ObjectId()), **document}
+        collection[document["_id"]] = document
+        return document
+
+    def seed(
+        self, users: int = 0, loops: int = 0, packages: int = 0, sessions: int = 0
+    ) -> "FakeZeitAPI":
+        """Add generated documents; every loop gets `sessions` sessions."""
+        for i in range(users):
+            self._add(self.users, {"email": f"user{i}@example.com", "loops": []})
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for i in range(loops):
+            loop = self._add(
+                self.loops,
+                {"name": f"loop {i}", "type": "eeg", "status": "active"},
+            )
+            self.me["loops"].append(loop["_id"])
+            self.sessions[loop["_id"]] = [
+                {
+                    "_id": str(ObjectId()),
+                    "loop_id": loop["_id"],
+                    "start": (start + timedelta(hours=j)).isoformat(),
+                    "stop": (start + timedelta(hours=j, minutes=30)).isoformat(),
+                }
+                for j in range(sessions)
+            ]
+        loop_ids = list(self.loops)
+        for i in range(packages):
+            self._add(
+                self.packages,
+                {
+                    "tracking_number": f"1Z{i:08d}",
+                    "loop_id": loop_ids[i % len(loop_ids)] if loop_ids else None,
+                },
+            )
+        return self
+
+    # failure injection
+
+    def inject_error(self, path: str = "/", status: int | None = None, count=1):
+        """Fail the next `count` requests whose path starts with `path`."""
+        for _ in range(count):
+            self._errors.append((path, status or self.error_status))
+
+    def _delay(self) -> float:
+        if isinstance(self.latency, tuple):
+            return self.random.uniform(*self.latency)
+        return self.latency
+
+    def _injected_error(self, path: str) -> int | None:
+        for entry in self._errors:
+            if path.startswith(entry[0]):
+                self._errors.remove(entry)
+                return entry[1]
+        if self.error_rate and self.random.random() < self.error_rate:
+            return self.error_status
+        return None
+
+    # request handling
+
+    def respond(
+        self, method: str, path: str, params: dict, headers: Any, body: bytes
+    ) -> Reply:
+        """Status code and JSON payload for one request."""
+        path = "/" + path.strip("/")
+        self.calls[method, path] += 1
+        status = self._injected_error(path)
+        if status is not None:
+            return status, {"detail": "Injected error"}
+        for route_method, pattern, route in self._routes:
+            match = pattern.fullmatch(path)
+            if match is None or route_method != method:
+                continue
+            if not path.startswith("/auth/"):
+                token = headers.get("authorization", "").removeprefix("Bearer ")
+                if not self._valid_token(token):
+                    return 401, {"detail": "Unauthorized"}
+            if not body:
+                body = {}
+            elif "json" in headers.get("content-type", ""):
+                body = json.loads(body)
+            else:
+                body = dict(parse_qsl(body.decode()))
+            return route(params, body, *match.groups())
+        return 404, {"detail": "Not Found"}
+
+    @staticmethod
+    def _response(reply: Reply) -> httpx.Response:
+        status, payload = reply
+        if payload is None:
+            return httpx.Response(status)
+        return httpx.Response(status, json=payload)
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        """`httpx.MockTransport` handler for `APIClient`."""
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        return self._response(
+            self.respond(
+                request.method,
+                request.url.path,
+                dict(request.url.params),
+                request.headers,
+                request.read(),
+            )
+        )
+
+    async def ahandler(self, request: httpx.Request) -> httpx.Response:
+        """`httpx.MockTransport` handler for `AsyncAPIClient`."""
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self._response(
+            self.respond(
+                request.method,
+                request.url.path,
+                dict(request.url.params),
+                request.headers,
+                await request.aread(),
+            )
+        )
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handler)
+
+    def async_transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.ahandler)
+
+    async def __call__(self, scope, receive, send):
+        """ASGI entry point, for `httpx.ASGITransport` or a real server."""
+        if scope["type"] != "http":
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        headers = httpx.Headers([(k.decode(), v.decode()) for k, v in scope["headers"]])
+        params = dict(parse_qsl(scope.get("query_string", b"").decode()))
+        status, payload = self.respond(
+            scope["method"], scope["path"], params, headers, body
+        )
+        content = b"" if payload is None else json.dumps(payload).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"application/json")],
+            }
+        )
+        await send({"type": "http.response.body", "body": content})
+
+    @contextmanager
+    def serve_http(self, host: str = "127.0.0.1", port: int = 0) -> Iterator[str]:
+        """Serve the HTTP routes from a background thread; yields the base URL."""
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body are written separately; don't let Nagle's
+            # algorithm hold the body back for a delayed ACK
+            disable_nagle_algorithm = True
+
+            def handle_one(self):
+                url = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                delay = api._delay()
+                if delay:
+                    time.sleep(delay)
+                status, payload = api.respond(
+                    self.command,
+                    url.path,
+                    dict(parse_qsl(url.query)),
+                    httpx.Headers(dict(self.headers)),
+                    body,
+                )
+                content = b"" if payload is None else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = handle_one
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield f"http://{host}:{server.server_address[1]}"
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    # routes
+
+    @staticmethod
+    def _page(documents: list, params: dict) -> Reply:
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 100))
+        return 200, {
+            "items": documents[offset : offset + limit],
+            "total": len(documents),
+        }
+
+    @staticmethod
+    def _find(collection: dict, id: str) -> Reply:
+        if id not in collection:
+            return 404, {"detail": "Not Found"}
+        return 200, collection[id]
+
+    @staticmethod
+    def _patch(collection: dict, id: str, body: dict) -> Reply:
+        if id not in collection:
+            return 404, {"detail": "Not Found"}
+        collection[id].update(body)
+        return 200, collection[id]
+
+    @staticmethod
+    def _delete(collection: dict, id: str) -> Reply:
+        if collection.pop(id, None) is None:
+            return 404, {"detail": "Not Found"}
+        return 204, None
+
+    def _login(self, params, body) -> Reply:
+        if (body.get("username"), body.get("password")) != (
+            self.username,
+            self.password,
+        ):
+            return 400, {"detail": "LOGIN_BAD_CREDENTIALS"}
+        self._issued += 1
+        token = f"token-{self._issued}"
+        if self.token_ttl is not None:
+            claims = {"sub": token, "exp": time.time() + self.token_ttl}
+            token = ".".join(
+                base64.urlsafe_b64encode(json.dumps(part).encode()).decode().rstrip("=")
+                for part in ({"alg": "none", "typ": "JWT"}, claims)
+            )
+            token += ".unsigned"
+        self.tokens.add(token)
+        return 200, {"access_token": token, "token_type": "bearer"}
+
+    def _valid_token(self, token: str) -> bool:
+        if token not in self.tokens:
+            return False
+        return self.token_ttl is None or jwt_expiry(token) > time.time()
+
+    def _logout(self, params, body) -> Reply:
+        return 204, None
+
+    def _register(self, params, body) -> Reply:
+        body = {k: v for k, v in body.items() if k != "password"}
+        return 201, self._add(self.users, {"loops": [], **body})
+
+    def _verify_token(self, params, body) -> Reply:
+        return 202, None
+
+    def _get_me(self, params, body) -> Reply:
+        return 200, self.me
+
+    def _list_users(self, params, body) -> Reply:
+        users = [
+            user
+            for user in self.users.values()
+            if params.get("email") in (None, user.get("email"))
+            and params.get("loop_id", None) in (None, *user.get("loops", []))
+        ]
+        return self._page(users, params)
+
+    def _get_user_loops(self, params, body, id) -> Reply:
+        status, user = self._find(self.users, id)
+        if status != 200:
+            return status, user
+        return 200, [self.loops[i] for i in user.get("loops", []) if i in self.loops]
+
+    def _get_user(self, params, body, id) -> Reply:
+        return self._find(self.users, id)
+
+    def _patch_user(self, params, body, id) -> Reply:
+        return self._patch(self.users, id, body)
+
+    def _delete_user(self, params, body, id) -> Reply:
+        return self._delete(self.users, id)
+
+    def _get_my_loops(self, params, body) -> Reply:
+        return self._get_user_loops(params, body, self.me["_id"])
+
+    def _list_loops(self, params, body) -> Reply:
+        loops = [
+            loop
+            for loop in self.loops.values()
+            if all(
+                params.get(key) in (None, loop.get(key))
+                for key in ("name", "status", "type")
+            )
+        ]
+        return self._page(loops, params)
+
+    def _create_loop(self, params, body) -> Reply:
+        loop = self._add(self.loops, body)
+        self.sessions[loop["_id"]] = []
+        return 201, loop
+
+    def _get_sessions(self, params, body, id) -> Reply:
+        if id not in self.loops:
+            return 404, {"detail": "Not Found"}
+        return 200, self.sessions.get(id, [])
+
+    def _get_loop(self, params, body, id) -> Reply:
+        return self._find(self.loops, id)
+
+    def _patch_loop(self, params, body, id) -> Reply:
+        return self._patch(self.loops, id, body)
+
+    def _delete_loop(self, params, body, id) -> Reply:
+        return self._delete(self.loops, id)
+
+    def _list_packages(self, params, body) -> Reply:
+        packages = [
+            package
+            for package in self.packages.values()
+            if all(
+                params.get(key) in (None, package.get(key))
+                for key in ("tracking_number", "loop_id")
+            )
+        ]
+        return self._page(packages, params)
+
+    def _create_package(self, params, body) -> Reply:
+        return 201, self._add(self.packages, body)
+
+    def _get_package(self, params, body, id) -> Reply:
+        return self._find(self.packages, id)
+
+    def _delete_package(self, params, body, id) -> Reply:
+        return self._delete(self.packages, id)
+
+    def _set_baseline(self, params, body, loop_id) -> Reply:
+        if loop_id not in self.loops:
+            return 404, {"detail": "Not Found"}
+        self.baselines[loop_id] = body
+        return 200, {"loop_id": loop_id, **body}
+
+    # websocket streams
+
+    def _message(self, loop_id: str, stream: str, type: str | None, seq: int):
+        if stream == "status":
+            return {"seq": seq, "loop_id": loop_id, "status": "streaming"}
+        data = [
+            [self.random.gauss(0, 1) for _ in range(self.samples)]
+            for _ in range(self.channels)
+        ]
+        return {"seq": seq, "type": type, "data": data}
+
+    async def _stream(self, ws):
+        from websockets.exceptions import ConnectionClosed
+
+        url = httpx.URL(ws.path)
+        match = re.fullmatch(r"/loops/(\w+)/(status|data)", url.path)
+        if match is None or not self._valid_token(url.params.get("token", "")):
+            await ws.close(code=1008, reason="Unauthorized")
+            return
+        loop_id, stream = match.groups()
+        # resume after the last sequence number the client has seen
+        seq = int(url.params.get("after", 0))
+        sent = 0
+        try:
+            while self.stream_messages is None or sent < self.stream_messages:
+                seq += 1
+                sent += 1
+                type = url.params.get("type")
+                await ws.send(json.dumps(self._message(loop_id, stream, type, seq)))
+                await asyncio.sleep(self.stream_interval)
+            await ws.close()
+        except ConnectionClosed:
+            pass
+
+    @asynccontextmanager
+    async def serve_streams(
+        self, host: str = "127.0.0.1", port: int = 0
+    ) -> AsyncIterator[str]:
+        """Serve the websocket streams; yields the base URL for the client.
+
+        Streams send JSON messages with a `seq` number every
+        `stream_interval` seconds, resuming after the `after` query parameter,
+        and close after `stream_messages` messages when it is set.
+        """
+        from websockets.server import serve
+
+        async with serve(self._stream, host, port) as server:
+            host, port = server.sockets[0].getsockname()[:2]
+            yield f"http://{host}:{port}"
@@ -0,0 +1,132 @@
+"""Helpers for streaming uploads and resumable downloads.
+
+Bodies are read and written `chunk_size` bytes at a time, so memory use does
+not grow with the size of the file.
+"""
+
+import asyncio
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, AsyncIterator, Iterator
+
+import httpx
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+_CONTENT_RANGE = re.compile(r"bytes (?:(\d+)-\d+|\*)/(\d+|\*)")
+
+
+class FileChunks:
+    """Re-iterable body over a binary file, read in chunks from its current
+    position. Every iteration seeks back there, so a retried request sends
+    the whole body again.
+    """
+
+    def __init__(self, file: IO[bytes], chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.start = file.tell() if file.seekable() else None
+
+    @property
+    def replayable(self) -> bool:
+        """Whether every iteration sends the whole body (the file can seek)."""
+        return self.start is not None
+
+    def __len__(self) -> int:
+        """Bytes left to send, for files on disk."""
+        if self.start is None:
+            raise TypeError("size of a non-seekable file is unknown")
+        return os.fstat(self.file.fileno()).st_size - self.start
+
+    def _rewind(self):
+        if self.start is not None:
+            self.file.seek(self.start)
+
+    def __iter__(self) -> Iterator[bytes]:
+        self._rewind()
+        while chunk := self.file.read(self.chunk_size):
+            yield chunk
+
+
+class AsyncFileChunks(FileChunks):
+    """`FileChunks` for `AsyncAPIClient`; reads run in a worker thread."""
+
+    __iter__ = None  # httpx must only see an async iterable
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        self._rewind()
+        while chunk := await asyncio.to_thread(self.file.read, self.chunk_size):
+            yield chunk
+
+
+def upload_kwargs(
+    file: Any,
+    *,
+    field: str | None = None,
+    filename: str | None = None,
+    content_type: str | None = None,
+    data: dict | None = None,
+    headers: Any = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    asynchronous: bool = False,
+) -> dict:
+    """Request kwargs that stream `file` (a binary file or an iterator of
+    bytes) as the raw body or, with `field`, as one part of a multipart form.
+    """
+    if field is not None:
+        name = filename or os.path.basename(getattr(file, "name", "") or field)
+        return {
+            "files": {field: (name, file, content_type)},
+            "data": data,
+            "headers": headers,
+        }
+    headers = httpx.Headers(headers)
+    headers.setdefault("Content-Type", content_type or "application/octet-stream")
+    if hasattr(file, "read"):
+        chunks = (AsyncFileChunks if asynchronous else FileChunks)(file, chunk_size)
+        try:
+            headers.setdefault("Content-Length", str(len(chunks)))
+        except (TypeError, OSError, AttributeError):
+            # pipes and in-memory streams are sent chunked
+            pass
+        file = chunks
+    return {"content": file, "headers": headers}
+
+
+@dataclass
+class DownloadResult:
+    path: Path
+    size: int
+    resumed_from: int = 0
+    resumes: int = 0
+
+
+def range_headers(headers: Any, offset: int) -> httpx.Headers:
+    headers = httpx.Headers(headers)
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+    return headers
+
+
+def resume_offset(response: httpx.Response, offset: int) -> int | None:
+    """Where to start writing the body of a (ranged) download response.
+
+    Returns `offset` for a partial response, 0 when the server ignored the
+    range and sent the whole file, and `None` when the file is already
+    complete (416 with a matching size).
+    """
+    if response.status_code == 206:
+        match = _CONTENT_RANGE.fullmatch(response.headers.get("Content-Range", ""))
+        if match and match.group(1) is not None and int(match.group(1)) != offset:
+            raise httpx.RemoteProtocolError(
+                f"Server resumed at byte {match.group(1)}, expected {offset}",
+                request=response.request,
+            )
+        return offset
+    if response.status_code == 416 and offset:
+        match = _CONTENT_RANGE.fullmatch(response.headers.get("Content-Range", ""))
+        if match and match.group(2) == str(offset):
+            return None
+    return 0
@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+
+@dataclass
+class TransportProfile:
+    """Connection pool, protocol and timeout settings shared by the clients.
+
+    The defaults match httpx's own, so `TransportProfile()` behaves exactly like
+    a client built without one. `http2` needs the optional `h2` package
+    (`pip install httpx[http2]`). A caller-provided `transport` (for example
+    `httpx.MockTransport` or `httpx.HTTPTransport(retries=...)`) takes over
+    the connection handling entirely, in which case the pool limits and
+    `http2` are up to that transport. An application can be given instead of
+    a transport: an ASGI app for `AsyncAPIClient`, a WSGI app for `APIClient`.
+    """
+
+    max_connections: int | None = 100
+    max_keepalive_connections: int | None = 20
+    keepalive_expiry: float | None = 5.0
+    http2: bool = False
+    connect_timeout: float | None = 5.0
+    read_timeout: float | None = 5.0
+    write_timeout: float | None = 5.0
+    pool_timeout: float | None = 5.0
+    transport: Any = None
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout,
+        )
+
+    def httpx_kwargs(self, asynchronous: bool = False) -> dict[str, Any]:
+        """Keyword arguments for `httpx.Client` / `httpx.AsyncClient`."""
+        transport = self.transport
+        if transport is not None and not isinstance(
+            transport, (httpx.BaseTransport, httpx.AsyncBaseTransport)
+        ):
+            if asynchronous:
+                transport = httpx.ASGITransport(app=transport)
+            else:
+                transport = httpx.WSGITransport(app=transport)
+        return {
+            "limits": self.limits,
+            "timeout": self.timeout,
+            "http2": self.http2,
+            "transport": transport,
+        }
+
+    def requests_timeout(self) -> tuple[float | None, float | None]:
+        """`(connect, read)` timeout tuple understood by `requests`."""
+        return (self.connect_timeout, self.read_timeout)
+
+    def mount(self, session, max_retries: int = 3) -> None:
+        """Mount pooled adapters sized by this profile on a `requests.Session`.
+
+        `requests` has no HTTP/2 support and no keep-alive expiry, so only the
+        pool size applies there.
+        """
+        from requests.adapters import HTTPAdapter
+
+        pool_maxsize = self.max_connections or 100
+        for prefix in ("http://", "https://"):
+            session.mount(
+                prefix, HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=max_retries)
+            )
@@ -0,0 +1,87 @@
+"""Validation throughput of `PydanticObjectId` on list responses.
+
+    python -m benchmarks.bench_objectid [--count 100000] [--repeat 5]
+
+Compares the pydantic-core fast path with the plain-function validator it
+replaced, on a bare list of ids and on a `Loop` list response.
+"""
+
+import argparse
+import json
+import time
+from typing import List
+
+from pydantic import Field, TypeAdapter
+from pydantic_core import core_schema
+
+from api_client.schemas.objectid import InvalidId, ObjectId
+from api_client.schemas.pydanticobjectid import PydanticObjectId
+from api_client.schemas.responses import Loop
+
+
+class PlainObjectId(PydanticObjectId):
+    """The previous schema: every id goes through `validate` and `__init__`."""
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source_type, handler):
+        return core_schema.no_info_plain_validator_function(
+            cls.validate, serialization=core_schema.to_string_ser_schema()
+        )
+
+    @classmethod
+    def validate(cls, v):
+        if isinstance(v, bytes):
+            v = v.decode("utf-8")
+        try:
+            return cls(v)
+        except (InvalidId, TypeError):
+            raise ValueError("Id must be of type PydanticObjectId")
+
+
+class PlainLoop(Loop):
+    id: PlainObjectId | None = Field(default=None, alias="_id")
+
+
+def best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    ids = [str(ObjectId()) for _ in range(args.count)]
+    loops = [{"_id": id, "name": "loop"} for id in ids]
+    ids_json = json.dumps(ids)
+    loops_json = json.dumps(loops)
+
+    cases = {
+        "ids python": (List[PydanticObjectId], List[PlainObjectId], ids),
+        "ids json": (List[PydanticObjectId], List[PlainObjectId], ids_json),
+        "loops python": (List[Loop], List[PlainLoop], loops),
+        "loops json": (List[Loop], List[PlainLoop], loops_json),
+    }
+    print(f"{'case':<14}{'fast ids/s':>14}{'plain ids/s':>14}{'speedup':>10}")
+    for name, (fast, plain, data) in cases.items():
+        rates = []
+        for type_ in (fast, plain):
+            adapter = TypeAdapter(type_)
+            validate = (
+                adapter.validate_json
+                if isinstance(data, str)
+                else adapter.validate_python
+            )
+            rates.append(args.count / best_of(args.repeat, lambda: validate(data)))
+        speedup = rates[0] / rates[1]
+        print(f"{name:<14}{rates[0]:>14,.0f}{rates[1]:>14,.0f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
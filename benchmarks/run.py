@@ -0,0 +1,309 @@
+"""Offline benchmark suite for the API clients.
+
+    python -m benchmarks.run [--quick] [--only NAME] [--output results.json]
+
+Every benchmark runs against `api_client.testing.FakeZeitAPI`, either in
+process (`httpx.MockTransport`) or on a local port, so no network or
+credentials are needed. Each result records the best of `--repeat` runs;
+the JSON output also records the interpreter, platform and package versions
+so runs of different releases can be compared.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Any, Callable, List
+
+import httpx
+from pydantic import TypeAdapter
+
+from api_client import APIClient, TransportProfile
+from api_client.BaseAPIClient import BaseAPIClient
+from api_client.codec import BACKENDS, get_codec
+from api_client.metrics import InMemoryMetrics
+from api_client.offload import DecodePool
+from api_client.schemas.objectid import ObjectId
+from api_client.schemas.pydanticobjectid import PydanticObjectId
+from api_client.testing import FakeZeitAPI
+
+BENCHMARKS: dict[str, Callable] = {}
+
+
+def benchmark(fn: Callable) -> Callable:
+    BENCHMARKS[fn.__name__] = fn
+    return fn
+
+
+class Runner:
+    def __init__(self, repeat: int, quick: bool):
+        self.repeat = repeat
+        self.quick = quick
+        self.results: list[dict[str, Any]] = []
+
+    def scale(self, full: int) -> int:
+        return max(1, full // 10) if self.quick else full
+
+    def best(self, fn: Callable[[], Any]) -> float:
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def record(self, name: str, value: float, unit: str, **params):
+        self.results.append(
+            {"name": name, "value": value, "unit": unit, "params": params}
+        )
+        described = ", ".join(f"{k}={v}" for k, v in params.items())
+        print(f"{name:<28}{value:>16,.1f} {unit:<10}{described}")
+
+    def rate(self, name: str, count: int, fn: Callable[[], Any], **params):
+        """Record `count` operations per run of `fn` as operations/second."""
+        self.record(name, count / self.best(fn), "ops/s", count=count, **params)
+
+    def latency(self, name: str, count: int, fn: Callable[[], Any], **params):
+        """Record the time per operation of `count` calls to `fn`, in µs."""
+
+        def loop():
+            for _ in range(count):
+                fn()
+
+        self.record(name, self.best(loop) / count * 1e6, "us/op", **params)
+
+
+class BenchClient(BaseAPIClient):
+    _API_NAME = "bench"
+
+
+def empty_handler(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"ok": True})
+
+
+@benchmark
+def request_overhead(run: Runner):
+    """Time per request: in process (pure client overhead) and over HTTP."""
+    count = run.scale(2000)
+    body = {"name": "loop", "type": "eeg"}
+    client = APIClient(transport=httpx.MockTransport(empty_handler))
+    run.latency("APIClient.get", count, lambda: client.get("/x"), server="mock")
+    run.latency(
+        "APIClient.post", count, lambda: client.post("/x", json=body), server="mock"
+    )
+    client = APIClient(
+        transport=httpx.MockTransport(empty_handler), metrics=InMemoryMetrics()
+    )
+    run.latency(
+        "APIClient.get", count, lambda: client.get("/x"), server="mock", metrics=True
+    )
+
+    api = FakeZeitAPI()
+    with api.serve_http() as base_url:
+        client = APIClient(
+            base_url=base_url, username=api.username, password=api.password
+        )
+        base = BenchClient(profile=TransportProfile())
+        headers = {"Authorization": f"Bearer {client.access_token}"}
+        url = f"{base_url}/users/me"
+        count = run.scale(500)
+        run.latency("APIClient.get", count, client.get_me, server="http")
+        run.latency(
+            "APIClient.post",
+            count,
+            lambda: client.post("/loops", json=body),
+            server="http",
+        )
+        run.latency(
+            "BaseAPIClient._get",
+            count,
+            lambda: base._get(url, headers=headers),
+            server="http",
+        )
+        client.close()
+        base.close()
+
+
+@benchmark
+def pagination(run: Runner):
+    """Items per second through `iter_loops`, with and without prefetch."""
+    loops = run.scale(20_000)
+    api = FakeZeitAPI().seed(loops=loops)
+    client = APIClient(
+        transport=api.transport(), username=api.username, password=api.password
+    )
+    for prefetch in (False, True):
+        run.rate(
+            "iter_loops",
+            loops,
+            lambda: sum(1 for _ in client.iter_loops(page_size=100, prefetch=prefetch)),
+            page_size=100,
+            prefetch=prefetch,
+        )
+
+
+@benchmark
+def parse_response(run: Runner):
+    """`_parse_response` decode throughput by payload size and JSON codec."""
+    api = FakeZeitAPI().seed(loops=run.scale(10_000))
+    loops = list(api.loops.values())
+    request = httpx.Request("GET", "https://test/loops")
+    for size in (1, 100, len(loops)):
+        page = {"items": loops[:size], "total": len(loops)}
+        content = json.dumps(page).encode()
+        response = httpx.Response(200, content=content, request=request)
+        for name in BACKENDS:
+            try:
+                codec = get_codec(name)
+            except ImportError:
+                continue
+            client = APIClient(codec=codec)
+            for validation in (None, "full"):
+                client.validation = validation
+                seconds = run.best(
+                    lambda: client._parse_response(response, model="Loop", many=True)
+                )
+                run.record(
+                    "_parse_response",
+                    len(content) / seconds / 1e6,
+                    "MB/s",
+                    items=size,
+                    bytes=len(content),
+                    codec=name,
+                    validation=validation,
+                )
+
+
+@benchmark
+def decode_offload(run: Runner):
+    """999-item pages decoded inline or in a `DecodePool`, and how much a
+    busy thread of the same process gets done meanwhile."""
+    api = FakeZeitAPI().seed(loops=999)
+    count = run.scale(50)
+    with DecodePool(threshold=0) as pool:
+        for decode_pool in (None, pool):
+            client = APIClient(
+                transport=api.transport(),
+                username=api.username,
+                password=api.password,
+                validation="full",
+                decode_pool=decode_pool,
+            )
+            client.get_loops()  # start the workers
+            ticks, done = 0, threading.Event()
+
+            def busy():
+                nonlocal ticks
+                while not done.is_set():
+                    ticks += 1
+
+            thread = threading.Thread(target=busy)
+            thread.start()
+            start = time.perf_counter()
+            for _ in range(count):
+                client.get_loops()
+            seconds = time.perf_counter() - start
+            done.set()
+            thread.join()
+            offload = decode_pool is not None
+            run.record("get_loops", seconds / count * 1e3, "ms/op", offload=offload)
+            run.record("busy thread", ticks / seconds, "ticks/s", offload=offload)
+
+
+@benchmark
+def objectid(run: Runner):
+    """ObjectId / PydanticObjectId construction and validation rates."""
+    count = run.scale(100_000)
+    ids = [str(ObjectId()) for _ in range(count)]
+    ids_json = json.dumps(ids)
+    adapter = TypeAdapter(List[PydanticObjectId])
+    run.rate("ObjectId()", count, lambda: [ObjectId() for _ in range(count)])
+    run.rate("ObjectId(hex)", count, lambda: [ObjectId(id) for id in ids])
+    run.rate(
+        "PydanticObjectId.from_hex",
+        count,
+        lambda: [PydanticObjectId.from_hex(id) for id in ids],
+    )
+    run.rate(
+        "validate ids",
+        count,
+        lambda: adapter.validate_python(ids),
+        mode="python",
+    )
+    run.rate(
+        "validate ids", count, lambda: adapter.validate_json(ids_json), mode="json"
+    )
+    oids = adapter.validate_python(ids)
+    run.rate("str(ObjectId)", count, lambda: [str(oid) for oid in oids])
+
+
+@benchmark
+def listen_data(run: Runner):
+    """Messages per second received through `listen_data`."""
+    count = run.scale(20_000)
+    api = FakeZeitAPI(stream_interval=0, stream_messages=count)
+
+    async def receive() -> int:
+        received = 0
+
+        def process(message):
+            nonlocal received
+            received += 1
+
+        async with api.serve_streams() as base_url:
+            client = APIClient(
+                base_url=base_url,
+                transport=api.transport(),
+                username=api.username,
+                password=api.password,
+            )
+            await client.listen_data(str(ObjectId()), process_fn=process)
+        return received
+
+    run.rate("listen_data", count, lambda: asyncio.run(receive()), stream="eeg")
+
+
+def environment() -> dict[str, Any]:
+    versions = {}
+    for package in ("api-client", "httpx", "pydantic", "websockets", "orjson"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "versions": versions,
+        "date": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="10x smaller inputs")
+    parser.add_argument(
+        "--only", action="append", choices=sorted(BENCHMARKS), help="repeatable"
+    )
+    args = parser.parse_args(argv)
+
+    run = Runner(args.repeat, args.quick)
+    for name in args.only or BENCHMARKS:
+        BENCHMARKS[name](run)
+    report = {"environment": environment(), "results": run.results}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import asyncio
+
+import httpx
+import pytest
+
+from api_client import APIError, AsyncAPIClient, TransportProfile
+
+
+def handler(request: httpx.Request):
+    if request.url.path == "/auth/login":
+        return httpx.Response(200, json={"access_token": "token"})
+    if request.headers.get("Authorization") != "Bearer token":
+        return httpx.Response(401, json={"detail": "Unauthorized"})
+    if request.url.path == "/users/missing":
+        return httpx.Response(404, json={"detail": "Not Found"})
+    return httpx.Response(200, json={"path": request.url.path})
+
+
+def make_client(**kwargs):
+    profile = TransportProfile(transport=httpx.MockTransport(handler))
+    return AsyncAPIClient(base_url="https://test", profile=profile, **kwargs)
+
+
+def test_lazy_login_and_routes():
+    async def run():
+        async with make_client(username="user", password="pass") as client:
+            assert client.access_token == "token"
+            loops = await client.get_loops()
+            me, user = await asyncio.gather(client.get_me(), client.get_user("abc"))
+        return loops, me, user
+
+    loops, me, user = asyncio.run(run())
+    assert loops == {"path": "/loops"}
+    assert me == {"path": "/users/me"}
+    assert user == {"path": "/users/abc"}
+
+
+def test_error_response_raises_api_error():
+    async def run():
+        client = make_client(access_token="token")
+        try:
+            await client.get_user("missing")
+        finally:
+            await client.aclose()
+
+    with pytest.raises(APIError) as info:
+        asyncio.run(run())
+    assert info.value.status_code == 404
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api_client import (
+    APIClient,
+    AsyncAPIClient,
+    CallbackTokenStore,
+    FileTokenStore,
+    MemoryTokenStore,
+)
+from api_client.auth import Token, jwt_expiry
+from api_client.testing import FakeZeitAPI
+
+LOGIN = ("POST", "/auth/login")
+
+
+def make_client(api, cls=APIClient, **kwargs):
+    return cls(
+        transport=api.transport() if cls is APIClient else api.async_transport(),
+        username=api.username,
+        password=api.password,
+        **kwargs,
+    )
+
+
+def test_jwt_expiry():
+    api = FakeZeitAPI(token_ttl=100)
+    token = Token.parse(make_client(api).access_token)
+    assert 99 < token.expires_at - time.time() <= 100
+    assert not token.expiring()
+    assert token.expiring(margin=101)
+    assert jwt_expiry("token-0") is None
+    assert Token.from_login({"access_token": "opaque", "expires_in": 10}).expires_at
+
+
+def test_clients_share_a_token_and_retry_on_401():
+    api = FakeZeitAPI()
+    store = MemoryTokenStore()
+    first = make_client(api, token_store=store)
+    second = make_client(api, token_store=store)
+    assert second.access_token == first.access_token
+    assert api.calls[LOGIN] == 1
+
+    # the server forgets every token: one request fails, logs in and succeeds
+    api.tokens.clear()
+    assert first.get_me()["email"] == api.username
+    assert api.calls[LOGIN] == 2
+    # the other client's 401 is answered with the new token from the store
+    assert second.get_me()["email"] == api.username
+    assert api.calls[LOGIN] == 2
+    assert second.access_token == first.access_token
+    assert api.calls["GET", "/users/me"] == 4
+
+
+def test_token_refreshed_before_expiry():
+    api = FakeZeitAPI(token_ttl=10)
+    client = make_client(api, token_store=MemoryTokenStore(refresh_margin=9.8))
+    client.get_me()
+    assert api.calls[LOGIN] == 1
+    time.sleep(0.3)
+    client.get_me()
+    assert api.calls[LOGIN] == 2
+    assert api.calls["GET", "/users/me"] == 2
+
+
+def test_file_store_logs_in_once_across_clients(tmp_path):
+    api = FakeZeitAPI()
+    path = tmp_path / "tokens.json"
+
+    def worker(_):
+        return make_client(api, token_store=FileTokenStore(path)).get_me()
+
+    with ThreadPoolExecutor(8) as pool:
+        assert len(list(pool.map(worker, range(8)))) == 8
+    assert api.calls[LOGIN] == 1
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+
+def test_callback_store_and_bad_credentials():
+    api = FakeZeitAPI()
+    token = make_client(api).access_token
+    saved = {}
+    client = make_client(api, token_store=CallbackTokenStore(lambda key: token))
+    assert client.get_me()["email"] == api.username
+    assert api.calls[LOGIN] == 1
+
+    store = CallbackTokenStore(lambda key: None, saved.__setitem__)
+    client = make_client(api, token_store=store)
+    assert saved == {f"{api.username}@{client.client.base_url}": client._token}
+
+    client = APIClient(
+        transport=api.transport(), username=api.username, password="wrong"
+    )
+    assert client.access_token is None and client._credentials is None
+
+
+def test_async_clients_share_a_token():
+    api = FakeZeitAPI()
+    store = MemoryTokenStore()
+
+    async def run():
+        clients = [
+            make_client(api, AsyncAPIClient, token_store=store) for _ in range(4)
+        ]
+        await asyncio.gather(*(client.get_me() for client in clients for _ in range(3)))
+        api.tokens.clear()
+        await asyncio.gather(*(client.get_me() for client in clients))
+        for client in clients:
+            await client.aclose()
+
+    asyncio.run(run())
+    assert api.calls[LOGIN] == 2
+    assert api.calls["GET", "/users/me"] == 16 + 4
+
+
+def test_cancelled_async_login_releases_the_store_lock():
+    api = FakeZeitAPI()
+    store = MemoryTokenStore()
+    key = make_client(api)._token_key()
+
+    async def run():
+        store.acquire(key)
+        waiting = make_client(api, AsyncAPIClient, token_store=store)
+        task = asyncio.create_task(waiting.get_me())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        store.release(key)
+        # the cancelled login's worker thread took the lock, then gave it back
+        other = make_client(api, AsyncAPIClient, token_store=store)
+        me = await asyncio.wait_for(other.get_me(), 2)
+        await waiting.aclose()
+        await other.aclose()
+        return me
+
+    assert asyncio.run(run()) == api.me
@@ -0,0 +1,66 @@
+import io
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from api_client import APIError, RetryPolicy
+from api_client.BaseAPIClient import BaseAPIClient
+
+
+class RecordingAdapter(BaseAdapter):
+    """Answers every request with `statuses` in turn, then 200."""
+
+    def __init__(self, *statuses: int):
+        super().__init__()
+        self.statuses = list(statuses)
+        self.requests = []
+        self.bodies = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        body = request.body
+        self.bodies.append(body.read() if hasattr(body, "read") else body)
+        response = requests.Response()
+        response.status_code = self.statuses.pop(0) if self.statuses else 200
+        response._content = b"{}"
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+def make_client(adapter, **kwargs):
+    # a new subclass per client: BaseAPIClient subclasses are singletons
+    client = type("TestClient", (BaseAPIClient,), {"_API_NAME": "test"})(**kwargs)
+    client.requests_session.mount("https://", adapter)
+    return client
+
+
+def test_json_is_ignored_next_to_files():
+    adapter = RecordingAdapter()
+    client = make_client(adapter)
+    client._post("https://test/upload", json={"a": 1}, files={"file": b"content"})
+    request = adapter.requests[-1]
+    assert request.headers["Content-Type"].startswith("multipart/form-data")
+    assert b"content" in request.body and b'"a"' not in request.body
+
+    client._post("https://test/items", json={"a": 1})
+    assert adapter.requests[-1].body == b'{"a":1}'
+
+
+def test_only_replayable_bodies_are_retried():
+    retry = RetryPolicy(backoff_factor=0, methods=frozenset({"POST"}), budget=None)
+    adapter = RecordingAdapter(503)
+    client = make_client(adapter, retry=retry)
+    client._post("https://test/items", data=io.BytesIO(b"buffer"))
+    assert adapter.bodies == [b"buffer"] * 2
+
+    adapter.statuses = [503]
+    adapter.requests.clear()
+    with pytest.raises(APIError) as error:
+        client._post("https://test/items", data=(chunk for chunk in [b"a"]))
+    assert error.value.status_code == 503
+    assert len(adapter.requests) == 1
@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from api_client import APIClient, APIError, AsyncAPIClient, TransportProfile
+
+
+def handler(request: httpx.Request):
+    id = request.url.path.rsplit("/", 1)[-1]
+    if id == "missing":
+        return httpx.Response(404, json={"detail": "Not Found"})
+    return httpx.Response(200, json={"_id": id})
+
+
+IDS = ["a", "missing", "b", "c"]
+
+
+def check(results):
+    assert [id for id, _ in results] == IDS
+    for id, result in results:
+        if id == "missing":
+            assert isinstance(result, APIError)
+            assert result.status_code == 404
+        else:
+            assert result == {"_id": id}
+
+
+def test_get_users_many():
+    profile = TransportProfile(transport=httpx.MockTransport(handler))
+    client = APIClient(base_url="https://test", profile=profile)
+    check(list(client.get_users_many(IDS, max_concurrency=2)))
+    unordered = list(client.get_loops_many(IDS, ordered=False))
+    check(sorted(unordered, key=lambda pair: IDS.index(pair[0])))
+
+
+def test_async_get_packages_many():
+    async def run():
+        profile = TransportProfile(transport=httpx.MockTransport(handler))
+        client = AsyncAPIClient(base_url="https://test", profile=profile)
+        return [pair async for pair in client.get_packages_many(IDS, 3)]
+
+    check(asyncio.run(run()))
+
+
+class FakeServer:
+    """Records writes; ids or names containing "bad" are rejected."""
+
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, request: httpx.Request):
+        self.requests.append(request)
+        body = json.loads(request.content) if request.content else None
+        if request.url.path == "/loops/bulk":
+            created = [{"_id": str(i), **loop} for i, loop in enumerate(body)]
+            if any("bad" in loop["name"] for loop in body):
+                return httpx.Response(422, json={"detail": "invalid"})
+            return httpx.Response(201, json=created)
+        if "bad" in request.url.path or (body and "bad" in body.get("name", "")):
+            return httpx.Response(422, json={"detail": "invalid"})
+        if request.method == "DELETE":
+            return httpx.Response(204)
+        return httpx.Response(200, json={"_id": "1", **(body or {})})
+
+
+def test_batch_writes_report_partial_failures():
+    server = FakeServer()
+    profile = TransportProfile(transport=httpx.MockTransport(server))
+    client = APIClient(base_url="https://test", profile=profile)
+
+    created = client.create_loops(
+        [{"name": "a"}, {"name": "bad"}, {"name": "b"}], max_concurrency=2
+    )
+    assert len(created) == 3 and not created.ok
+    assert sorted(loop["name"] for _, loop in created.succeeded) == ["a", "b"]
+    [(body, error)] = created.failed
+    assert body == {"name": "bad"} and error.status_code == 422
+    with pytest.raises(APIError):
+        created.raise_for_errors()
+
+    patched = client.patch_users({"u1": {"role": "x"}, "bad": {"role": "y"}})
+    assert [update for update, _ in patched.failed] == [("bad", {"role": "y"})]
+    deleted = client.delete_packages(["p1", "p2", "p3"])
+    assert deleted.ok and len(deleted) == 3
+    assert sum(r.method == "DELETE" for r in server.requests) == 3
+
+
+def test_batch_writes_use_bulk_endpoint():
+    server = FakeServer()
+    profile = TransportProfile(transport=httpx.MockTransport(server))
+    client = APIClient(base_url="https://test", profile=profile)
+    bodies = [{"name": f"loop {i}"} for i in range(5)] + [{"name": "bad"}]
+
+    result = client.create_loops(bodies, bulk_url="/loops/bulk", bulk_size=2)
+    assert len(server.requests) == 3
+    assert sorted(body["name"] for body, _ in result.succeeded) == [
+        f"loop {i}" for i in range(4)
+    ]
+    for body, loop in result.succeeded:
+        assert loop["name"] == body["name"]
+    # the whole chunk holding the rejected body fails
+    assert [body["name"] for body, _ in result.failed] == ["loop 4", "bad"]
+
+
+def test_async_batch_writes():
+    async def run():
+        profile = TransportProfile(transport=httpx.MockTransport(FakeServer()))
+        client = AsyncAPIClient(base_url="https://test", profile=profile)
+        return await client.delete_loops(["l1", "bad", "l2"])
+
+    result = asyncio.run(run())
+    assert sorted(id for id, _ in result.succeeded) == ["l1", "l2"]
+    assert [id for id, _ in result.failed] == ["bad"]
@@ -0,0 +1,98 @@
+import httpx
+
+from api_client import APIClient, ResponseCache, TransportProfile
+
+
+class Server:
+    def __init__(self):
+        self.requests = []
+        self.version = 1
+
+    def __call__(self, request: httpx.Request):
+        self.requests.append(request)
+        etag = f'"v{self.version}"'
+        if request.method == "PATCH":
+            self.version += 1
+            return httpx.Response(200, json={})
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304)
+        return httpx.Response(
+            200, json={"version": self.version}, headers={"ETag": etag}
+        )
+
+
+def make_client(cache):
+    server = Server()
+    profile = TransportProfile(transport=httpx.MockTransport(server))
+    return APIClient(base_url="https://test", profile=profile, cache=cache), server
+
+
+def test_fresh_hits_skip_the_network():
+    client, server = make_client(ResponseCache(ttl=60))
+    assert client.get_loop("a") == {"version": 1}
+    assert client.get_loop("a") == {"version": 1}
+    assert len(server.requests) == 1
+
+
+def test_stale_entries_are_revalidated():
+    cache = ResponseCache(ttl=0.0001, route_ttls={"/users": 60, "/users/me": 0})
+    assert cache.ttl_for("/users/a") == 60
+    assert cache.ttl_for("/users/me") == 0
+    client, server = make_client(cache)
+    client.get_me()
+    client.get_loop("a")
+    client.get_loop("a")
+    assert server.requests[-1].headers["If-None-Match"] == '"v1"'
+    assert cache.revalidations == 1
+
+
+def test_writes_invalidate_the_resource():
+    client, server = make_client(ResponseCache(maxsize=2))
+    client.get_loop("a")
+    client.get_me()
+    client.patch_loop("a", {"name": "renamed"})
+    assert client.get_loop("a") == {"version": 2}
+    client.get_me()
+    assert len(server.requests) == 4
+
+
+def test_lru_eviction():
+    cache = ResponseCache(maxsize=2)
+    client, server = make_client(cache)
+    for id in ("a", "b", "c"):
+        client.get_user(id)
+    assert len(cache) == 2
+    client.get_user("a")
+    assert len(server.requests) == 4
+
+
+def test_parsed_shapes_are_cached_apart():
+    user = {"_id": "5eb7cf5a86d9755df3a6c593", "email": "a@b.com"}
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=user)
+
+    cache = ResponseCache(ttl=60)
+    profile = TransportProfile(transport=httpx.MockTransport(handler))
+    plain = APIClient(base_url="https://test", profile=profile, cache=cache)
+    validating = APIClient(
+        base_url="https://test", profile=profile, cache=cache, validation="full"
+    )
+    assert plain.get_user(user["_id"]) == user
+    assert validating.get_user(user["_id"]).email == "a@b.com"
+    assert validating.get(f"/users/{user['_id']}") == user
+    assert plain.get_user(user["_id"]) == user
+    assert len(requests) == 2
+
+
+def test_writes_invalidate_nested_listings():
+    client, server = make_client(ResponseCache(ttl=60))
+    client.get_user_loops("u")
+    client.get_loop("a")
+    client.get_me()
+    client.patch_loop("a", {"name": "renamed"})
+    assert client.get_user_loops("u") == {"version": 2}
+    client.get_me()
+    assert len(server.requests) == 5
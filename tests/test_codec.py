@@ -0,0 +1,79 @@
+import json
+from datetime import datetime
+
+import httpx
+import pytest
+
+from api_client import APIClient, TransportProfile
+from api_client.codec import BACKENDS, JSONCodec, get_codec
+from api_client.schemas.pydanticobjectid import PydanticObjectId
+from api_client.schemas.responses import User
+
+ID = "5eb7cf5a86d9755df3a6c593"
+requests_seen = []
+
+
+def handler(request: httpx.Request):
+    requests_seen.append(request)
+    if request.url.path == "/text":
+        return httpx.Response(200, content=b"not json")
+    return httpx.Response(200, json={"_id": ID, "email": "a@b.com"})
+
+
+def make_client(codec, validation=None):
+    profile = TransportProfile(transport=httpx.MockTransport(handler))
+    return APIClient(
+        base_url="https://test", profile=profile, codec=codec, validation=validation
+    )
+
+
+def installed_backends():
+    for name in BACKENDS:
+        try:
+            get_codec(name)
+        except ImportError:
+            continue
+        yield name
+
+
+@pytest.mark.parametrize("name", list(installed_backends()))
+def test_backends_round_trip(name):
+    client = make_client(name)
+    assert client.codec.name == name
+
+    client.set_baseline(
+        PydanticObjectId(ID), datetime(2024, 1, 2), datetime(2024, 1, 3)
+    )
+    request = requests_seen[-1]
+    assert request.headers["content-type"] == "application/json"
+    assert json.loads(request.content) == {
+        "start": "2024-01-02T00:00:00",
+        "stop": "2024-01-03T00:00:00",
+    }
+
+    assert client.get_me() == {"_id": ID, "email": "a@b.com"}
+    assert client.get("/text") == b"not json"
+    user = make_client(name, validation="full").get_user(ID)
+    assert isinstance(user, User)
+    assert str(user.id) == ID
+
+
+def test_get_codec(monkeypatch):
+    codec = JSONCodec()
+    assert get_codec(codec) is codec
+    monkeypatch.delenv("API_JSON_CODEC", raising=False)
+    assert type(get_codec()) is JSONCodec
+    for name in installed_backends():
+        monkeypatch.setenv("API_JSON_CODEC", name)
+        assert get_codec().name == name
+    with pytest.raises(ValueError):
+        get_codec("yaml")
+
+
+def test_default_codec_encodes_what_json_does(monkeypatch):
+    monkeypatch.delenv("API_JSON_CODEC", raising=False)
+    body = {1: "a", "big": 2**70, "nan": float("nan")}
+    assert (
+        make_client(None).codec.dumps(body)
+        == json.dumps(body, separators=(",", ":")).encode()
+    )
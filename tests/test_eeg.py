@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from api_client.eeg import EEGDecoder, EEGRingBuffer  # noqa: E402
+
+
+def test_binary_frames_are_zero_copy_views():
+    samples = np.arange(12, dtype="<f4")
+    message = samples.tobytes()
+    interleaved = EEGDecoder(3)(message)
+    assert interleaved.shape == (3, 4)
+    assert interleaved[1].tolist() == [1, 4, 7, 10]
+    assert np.shares_memory(interleaved, np.frombuffer(message, dtype="<f4"))
+    planar = EEGDecoder(3, layout="planar")(message)
+    assert planar[1].tolist() == [4, 5, 6, 7]
+    assert planar.flags.c_contiguous
+
+
+def test_json_frames():
+    decoder = EEGDecoder(2)
+    frame = decoder(json.dumps({"data": [[1, 2], [3, 4]]}))
+    assert frame.dtype == np.float32
+    assert frame.tolist() == [[1, 2], [3, 4]]
+    with pytest.raises(ValueError):
+        decoder("[[1, 2]]")
+
+
+def test_ring_buffer_wraps_in_place():
+    ring = EEGRingBuffer(2, 5)
+    data = ring.data
+    for start in range(0, 12, 3):
+        ring.append(np.arange(start, start + 3, dtype="<f4").repeat(2).reshape(3, 2).T)
+    assert ring.data is data
+    assert ring.total == 12
+    assert ring.latest()[0].tolist() == [7, 8, 9, 10, 11]
+    assert ring.latest(2)[1].tolist() == [10, 11]
+    ring.append(np.zeros((2, 7), dtype="<f4"))
+    assert ring.latest().tolist() == np.zeros((2, 5)).tolist()
@@ -0,0 +1,64 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# `import api_client` in a fresh interpreter; about 0.3 s and 15 MiB today
+IMPORT_SECONDS = 1.0
+IMPORT_MEMORY = 18 << 20
+
+MEASURE = """
+import json, sys, time, tracemalloc
+if {trace}:
+    tracemalloc.start()
+start = time.perf_counter()
+import api_client
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "memory": tracemalloc.get_traced_memory()[1],
+    "modules": sorted(sys.modules),
+}}))
+"""
+
+
+def measure_import(trace: bool = False) -> dict:
+    output = subprocess.check_output(
+        [sys.executable, "-c", MEASURE.format(trace=trace)], cwd=ROOT
+    )
+    return json.loads(output)
+
+
+def test_import_loads_no_optional_machinery():
+    modules = set(measure_import()["modules"])
+    for lazy in (
+        "pydantic",
+        "pydantic_core",
+        "websockets",
+        "numpy",
+        "api_client.schemas.objectid",
+        "api_client.streams",
+        "api_client.testing",
+    ):
+        assert lazy not in modules
+
+
+def test_lazy_exports_load_on_access():
+    import api_client
+
+    assert api_client.PydanticObjectId.__module__ == (
+        "api_client.schemas.pydanticobjectid"
+    )
+    assert api_client.StreamManager.__name__ == "StreamManager"
+    assert "StreamMessage" in dir(api_client)
+    with pytest.raises(AttributeError):
+        api_client.Missing
+
+
+def test_import_budget():
+    seconds = min(measure_import()["seconds"] for _ in range(3))
+    assert seconds < IMPORT_SECONDS
+    assert measure_import(trace=True)["memory"] < IMPORT_MEMORY
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from api_client import (
+    APIClient,
+    APIError,
+    AsyncAPIClient,
+    InMemoryMetrics,
+    PrometheusMetrics,
+    RetryPolicy,
+)
+from api_client.metrics import Histogram, route_template
+from api_client.testing import FakeZeitAPI
+
+
+def test_route_template_collapses_ids():
+    assert route_template("/loops/5eb7cf5a86d9755df3a6c593/sessions") == (
+        "/loops/{id}/sessions"
+    )
+    assert route_template("/users/me") == "/users/me"
+    assert route_template("/packages/42") == "/packages/{id}"
+
+
+def test_histogram_buckets():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    assert histogram.cumulative() == [(0.1, 2), (1.0, 3), (float("inf"), 4)]
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(1.0) == float("inf")
+
+
+def test_requests_retries_and_decode_are_recorded():
+    api = FakeZeitAPI().seed(loops=3)
+    metrics = InMemoryMetrics()
+    client = APIClient(
+        transport=api.transport(),
+        username=api.username,
+        password=api.password,
+        retry=RetryPolicy(backoff_factor=0, budget=None),
+        metrics=metrics,
+    )
+    api.inject_error("/users", count=1)
+    client.get_me()
+    loop_id = next(iter(api.loops))
+    client.patch_loop(loop_id, {"status": "done"})
+
+    assert metrics.statuses["GET", "/users/me", 200] == 1
+    assert metrics.retries["GET", "/users/me", "503"] == 1
+    assert metrics.durations["GET", "/users/me"].count == 1
+    assert metrics.statuses["PATCH", "/loops/{id}", 200] == 1
+    assert metrics.bytes_out["PATCH", "/loops/{id}"] == len(b'{"status":"done"}')
+    assert metrics.bytes_in["PATCH", "/loops/{id}"] > 0
+    assert metrics.phases["/loops/{id}", "decode"].count == 1
+
+
+def test_http_phases_and_prometheus_text():
+    api = FakeZeitAPI()
+    metrics = PrometheusMetrics()
+    with api.serve_http() as base_url:
+        client = APIClient(base_url=base_url, metrics=metrics)
+        with pytest.raises(APIError):
+            client.get_me()
+        client.auth(api.username, api.password)
+        client.get_me()
+        client.close()
+
+    phases = {phase for route, phase in metrics.phases if route == "/users/me"}
+    assert {"connect", "send_headers", "wait", "download", "decode"} <= phases
+    # the connection is reused by the second call
+    assert metrics.phases["/users/me", "connect"].count == 1
+    text = metrics.render()
+    assert (
+        'api_client_responses_total{method="GET",route="/users/me",status="401"} 1'
+        in text
+    )
+    assert (
+        'api_client_request_duration_seconds_bucket{method="GET",'
+        'route="/users/me",le="+Inf"} 2' in text
+    )
+    assert "# TYPE api_client_retries_total counter" in text
+
+
+def test_async_client_and_stream_messages():
+    api = FakeZeitAPI(stream_interval=0, stream_messages=5)
+    metrics = InMemoryMetrics()
+
+    async def run():
+        async with api.serve_streams() as base_url:
+            client = AsyncAPIClient(
+                base_url=base_url,
+                transport=api.async_transport(),
+                username=api.username,
+                password=api.password,
+                metrics=metrics,
+            )
+            await client.get_me()
+            await client.listen_data("loop", process_fn=lambda message: None)
+            await client.aclose()
+
+    asyncio.run(run())
+    assert metrics.statuses["GET", "/users/me", 200] == 1
+    assert metrics.messages["loop", "eeg"] == 5
+    assert metrics.message_bytes["loop", "eeg"] > 0
+    assert metrics.message_rate("loop", "eeg") > 0
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, timezone
+
+from api_client import APIClient, Mirror
+from api_client.testing import FakeZeitAPI
+
+LIST_LOOPS = ("GET", "/loops")
+
+
+def make_mirror(api, path=":memory:", **kwargs):
+    client = APIClient(
+        transport=api.transport(), username=api.username, password=api.password
+    )
+    return Mirror(client, path, page_size=7, max_concurrency=3, **kwargs)
+
+
+def test_full_sync_and_index_lookups():
+    api = FakeZeitAPI().seed(users=4, loops=30, packages=20)
+    mirror = make_mirror(api)
+    results = mirror.sync()
+    assert {name: result.stored for name, result in results.items()} == {
+        "users": 5,
+        "loops": 30,
+        "packages": 20,
+    }
+    assert all(result.full for result in results.values())
+
+    assert mirror.user_by_email(api.username) == api.me
+    package = next(iter(api.packages.values()))
+    assert mirror.package_by_tracking_number(package["tracking_number"]) == package
+    loop_id = package["loop_id"]
+    assert mirror.get("loops", loop_id) == api.loops[loop_id]
+    assert package in mirror.packages_for_loop(loop_id)
+    assert mirror.users_for_loop(loop_id) == [api.me]
+    assert len(mirror.find("loops", status="active")) == 30
+
+
+def test_incremental_sync_fetches_only_new_entities(tmp_path):
+    api = FakeZeitAPI().seed(loops=30)
+    path = tmp_path / "mirror.db"
+    make_mirror(api, path).sync("loops")
+    full_calls = api.calls[LIST_LOOPS]
+
+    api.seed(loops=5)
+    # a new mirror on the same file resumes from its watermark
+    result = make_mirror(api, path).sync("loops")["loops"]
+    assert not result.full
+    assert (result.fetched, result.stored) == (5, 5)
+    assert api.calls[LIST_LOOPS] - full_calls <= 3
+
+    mirror = make_mirror(api, path)
+    assert mirror.sync("loops")["loops"].fetched == 0
+    assert len(mirror.find("loops")) == 35
+
+
+def test_deletions_fall_back_to_a_full_sync():
+    api = FakeZeitAPI().seed(loops=10)
+    mirror = make_mirror(api)
+    mirror.sync("loops")
+    deleted = next(iter(api.loops))
+    del api.loops[deleted]
+    result = mirror.sync("loops")["loops"]
+    assert result.full and result.deleted == 1
+    assert mirror.get("loops", deleted) is None
+
+
+def test_created_between_uses_id_timestamps():
+    api = FakeZeitAPI().seed(loops=3)
+    mirror = make_mirror(api)
+    mirror.sync("loops")
+    now = datetime.now(timezone.utc)
+    assert len(mirror.created_between("loops", now - timedelta(minutes=1))) == 3
+    assert mirror.created_between("loops", now + timedelta(minutes=1)) == []
+
+
+class UpdatedSinceAPI(FakeZeitAPI):
+    """A server that stamps edits and filters lists by `updated_since`."""
+
+    def _patch(self, collection, id, body):
+        body = {**body, "updated_at": datetime.now(timezone.utc).isoformat()}
+        return super()._patch(collection, id, body)
+
+    def _list_loops(self, params, body):
+        since = params.get("updated_since")
+        if since is None:
+            return super()._list_loops(params, body)
+        loops = [
+            loop for loop in self.loops.values() if loop.get("updated_at", "") > since
+        ]
+        return self._page(loops, params)
+
+
+def test_updated_param_picks_up_edits():
+    api = UpdatedSinceAPI().seed(loops=10)
+    ids = list(api.loops)
+    api._patch(api.loops, ids[0], {"status": "done"})
+    mirror = make_mirror(api, updated_param="updated_since")
+    mirror.sync("loops")
+
+    api._patch(api.loops, ids[1], {"status": "done"})
+    result = mirror.sync("loops")["loops"]
+    assert not result.full and result.stored == 1
+    assert mirror.get("loops", ids[1])["status"] == "done"
+    assert len(mirror.find("loops", status="done")) == 2
+
+
+class UnorderedAPI(FakeZeitAPI):
+    """A server listing loops newest first, ignoring `sort`."""
+
+    def _list_loops(self, params, body):
+        self.sorts.append(params.get("sort"))
+        return self._page(list(self.loops.values())[::-1], params)
+
+
+def test_unordered_lists_are_always_fully_synced():
+    api = UnorderedAPI().seed(loops=10)
+    api.sorts = []
+    mirror = make_mirror(api, sort_params={"sort": "_id"})
+    assert mirror.sync("loops")["loops"].full
+    api.seed(loops=3)
+    result = mirror.sync("loops")["loops"]
+    assert result.full and result.stored == 13
+    assert set(api.sorts) == {"_id"}
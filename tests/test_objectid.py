@@ -0,0 +1,97 @@
+import datetime
+import pickle
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter, ValidationError
+
+from api_client.schemas.objectid import InvalidId, ObjectId, ObjectIdArray
+from api_client.schemas.pydanticobjectid import PydanticObjectId
+
+IDS = [
+    "5eb7cfb05e32e07750a1756a",
+    "5eb7cf5a86d9755df3a6c593",
+    "65a000000000000000000000",
+    "5EB7CF5A86D9755DF3A6C593",
+]
+# `bytes.fromhex` would accept these
+SPACED = [f" {IDS[0]} ", "5eb7 cfb0 5e32 e077 50a1 756a"]
+
+
+def test_from_hex_and_cached_str():
+    oid = PydanticObjectId.from_hex(IDS[3])
+    assert type(oid) is PydanticObjectId
+    assert oid == ObjectId(IDS[1])
+    assert str(oid) == IDS[1] and str(oid) is str(oid)
+    assert str(pickle.loads(pickle.dumps(oid))) == IDS[1]
+    for bad in ["xyz", IDS[0][:-2] + "  ", IDS[0] + "00", *SPACED]:
+        with pytest.raises(InvalidId):
+            ObjectId.from_hex(bad)
+        assert not ObjectId.is_valid(bad)
+    with pytest.raises(InvalidId):
+        ObjectId("xyz")
+
+
+def test_pydantic_validation():
+    adapter = TypeAdapter(List[PydanticObjectId])
+    oid = PydanticObjectId(IDS[0])
+    ids = adapter.validate_python([IDS[0], IDS[0].encode(), oid, ObjectId(IDS[0])])
+    assert all(type(id) is PydanticObjectId and id == oid for id in ids)
+    assert ids[2] is oid
+    assert adapter.validate_json(f'["{IDS[0]}"]') == [oid]
+    assert adapter.dump_json([oid]) == f'["{IDS[0]}"]'.encode()
+    for bad in ['["xyz"]', "[5]", *(f'["{id}"]' for id in SPACED)]:
+        with pytest.raises(ValidationError):
+            adapter.validate_json(bad)
+    for bad in SPACED:
+        with pytest.raises(ValidationError):
+            adapter.validate_python([bad])
+    with pytest.raises(ValidationError):
+        adapter.validate_python([5])
+
+
+def test_hex_round_trip_and_lazy_elements():
+    pytest.importorskip("numpy")
+    ids = ObjectIdArray.from_hex(IDS)
+    assert len(ids) == 4
+    assert ids.to_hex().tolist() == [oid.lower() for oid in IDS]
+    assert ids.binary == b"".join(ObjectId(oid).binary for oid in IDS)
+    # trailing NUL bytes survive element access
+    assert ids[2] == ObjectId(IDS[2])
+    assert ids[-1] == ObjectId(IDS[1])
+    assert list(ids) == [ObjectId(oid) for oid in IDS]
+    assert ObjectIdArray.from_bytes(ids.binary) == ids
+    assert ObjectIdArray([ObjectId(oid) for oid in IDS]) == ids
+
+
+def test_validity():
+    pytest.importorskip("numpy")
+    candidates = IDS + ["xyz", "5eb7cf5a86d9755df3a6c59g", IDS[0] + "00", ""]
+    assert ObjectIdArray.is_valid(candidates).tolist() == [True] * 4 + [False] * 4
+    with pytest.raises(ValueError):
+        ObjectIdArray.from_hex(candidates)
+    assert len(ObjectIdArray.from_hex(candidates, errors="drop")) == 4
+
+
+def test_timestamps_sorting_and_membership():
+    np = pytest.importorskip("numpy")
+    ids = ObjectIdArray.from_hex(IDS)
+    assert ids.timestamps().tolist() == [
+        ObjectId(oid).generation_time.timestamp() for oid in IDS
+    ]
+    generation_time = ObjectId(IDS[2]).generation_time.replace(tzinfo=None)
+    assert ids.generation_times()[2] == np.datetime64(generation_time)
+
+    ordered = ids.sort()
+    assert [str(oid) for oid in ordered] == sorted(oid.lower() for oid in IDS)
+    assert len(ids.unique()) == 3
+    assert ids.argsort().tolist() == [1, 3, 0, 2]
+
+    assert ObjectId(IDS[0]) in ids
+    assert ObjectId() not in ids
+    assert ids.isin([ObjectId(IDS[1])]).tolist() == [False, True, False, True]
+
+    start = datetime.datetime(2024, 1, 1)
+    assert ids.generated_between(start).tolist() == [False, False, True, False]
+    assert ids.generated_between(end=start).sum() == 3
+    assert ordered[ordered.searchsorted(start) :] == ids[[2]]
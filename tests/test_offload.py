@@ -0,0 +1,112 @@
+import asyncio
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api_client import APIClient, APIError, AsyncAPIClient, DecodePool
+from api_client.schemas.objectid import ObjectId
+from api_client.schemas.pydanticobjectid import PydanticObjectId
+from api_client.pagination import _page_items
+from api_client.schemas.responses import LazyList, Loop
+from api_client.testing import FakeZeitAPI
+
+
+def make_client(api, cls=APIClient, **kwargs):
+    transport = api.transport() if cls is APIClient else api.async_transport()
+    return cls(
+        transport=transport, username=api.username, password=api.password, **kwargs
+    )
+
+
+@pytest.mark.parametrize("validation", [None, "full", "construct", "lazy"])
+def test_offloaded_decoding_matches_inline(validation):
+    api = FakeZeitAPI().seed(loops=50)
+    loop_id = next(iter(api.loops))
+    inline = make_client(api, validation=validation)
+    with DecodePool(threshold=0, executor=ThreadPoolExecutor(2)) as pool:
+        client = make_client(api, validation=validation, decode_pool=pool)
+        loops = _page_items(client.get_loops())
+        assert list(loops) == list(_page_items(inline.get_loops()))
+        assert client.get_loop(loop_id) == inline.get_loop(loop_id)
+    if validation == "lazy":
+        assert isinstance(loops, LazyList)
+
+
+def test_small_and_failed_responses_stay_inline():
+    api = FakeZeitAPI().seed(loops=3)
+    submitted = []
+
+    class Pool(DecodePool):
+        def submit(self, content, *args, **kwargs):
+            submitted.append(len(content))
+            return super().submit(content, *args, **kwargs)
+
+    with Pool(threshold=1000, executor=ThreadPoolExecutor(1)) as pool:
+        client = make_client(api, decode_pool=pool)
+        client.get_me()
+        api.seed(loops=20)
+        client.get_loops()
+        api.inject_error("/loops")
+        with pytest.raises(APIError):
+            client.get_loops()
+    assert len(submitted) == 1 and submitted[0] >= 1000
+
+
+def test_process_pool_returns_models():
+    api = FakeZeitAPI().seed(loops=20)
+    with DecodePool(max_workers=1, threshold=0) as pool:
+        page = make_client(api, validation="full", decode_pool=pool).get_loops()
+    loops = page.items
+    assert all(isinstance(loop, Loop) for loop in loops)
+    assert {str(loop.id) for loop in loops} == set(api.loops)
+
+
+def test_async_client_awaits_the_pool():
+    api = FakeZeitAPI().seed(loops=20)
+
+    async def run():
+        with DecodePool(threshold=0, executor=ThreadPoolExecutor(2)) as pool:
+            client = make_client(
+                api, AsyncAPIClient, validation="full", decode_pool=pool
+            )
+            loops = await asyncio.gather(client.get_loops(), client.get_loops())
+            await client.aclose()
+        return loops
+
+    first, second = asyncio.run(run())
+    assert first == second and len(first.items) == 20
+
+
+def test_objectids_pickle_through_the_constructor():
+    for oid in (ObjectId(), PydanticObjectId()):
+        assert oid.__reduce__() == (type(oid), (oid.binary,))
+        copy = pickle.loads(pickle.dumps(oid))
+        assert copy == oid and type(copy) is type(oid)
+    # state pickled by earlier versions still loads
+    legacy = ObjectId.__new__(ObjectId)
+    legacy.__setstate__({"_ObjectId__id": oid.binary})
+    assert legacy == oid
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_objectid_state_is_reset_after_fork():
+    parent = ObjectId()
+    read, write = os.pipe()
+    # a thread holding the counter lock while the process forks
+    ObjectId._inc_lock.acquire()
+    try:
+        pid = os.fork()
+        if pid == 0:
+            os.write(write, ObjectId().binary)
+            os._exit(0)
+    finally:
+        ObjectId._inc_lock.release()
+    os.waitpid(pid, 0)
+    child = os.read(read, 12)
+    os.close(read)
+    os.close(write)
+    # the 5 random bytes identify the process
+    assert child[4:9] != parent.binary[4:9]
+    assert ObjectId().binary[4:9] == parent.binary[4:9]
@@ -0,0 +1,36 @@
+import asyncio
+
+from api_client.pagination import apaginate, paginate
+
+ITEMS = list(range(25))
+
+
+def fetch_page(limit, offset):
+    return {"items": ITEMS[offset : offset + limit], "total": len(ITEMS)}
+
+
+def test_paginate_walks_all_pages():
+    assert list(paginate(fetch_page, page_size=10)) == ITEMS
+    assert list(paginate(fetch_page, page_size=5, prefetch=False)) == ITEMS
+
+
+def test_paginate_stops_on_total():
+    calls = []
+
+    def fetch(limit, offset):
+        calls.append(offset)
+        return fetch_page(limit, offset)
+
+    assert list(paginate(fetch, page_size=25)) == ITEMS
+    assert calls == [0]
+
+
+def test_apaginate_walks_all_pages():
+    async def fetch(limit, offset):
+        return fetch_page(limit, offset)["items"]
+
+    async def run(prefetch):
+        return [item async for item in apaginate(fetch, 7, prefetch)]
+
+    assert asyncio.run(run(True)) == ITEMS
+    assert asyncio.run(run(False)) == ITEMS
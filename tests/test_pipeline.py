@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from api_client import StreamPipeline
+
+
+async def source(n, delay=0.0):
+    for i in range(n):
+        yield f"frame-{i}" if i % 2 else f"frame-{i}".encode()
+        await asyncio.sleep(delay)
+
+
+def frames(n):
+    return [f"frame-{i}" if i % 2 else f"frame-{i}".encode() for i in range(n)]
+
+
+def run(pipeline, n, delay=0.0):
+    asyncio.run(pipeline.run(source(n, delay)))
+
+
+@pytest.mark.parametrize("backpressure", ["block", "spill"])
+def test_slow_consumer_loses_nothing(backpressure, tmp_path):
+    received = []
+
+    async def consumer(batch):
+        await asyncio.sleep(0.001)
+        received.extend(batch)
+
+    pipeline = StreamPipeline(
+        consumer,
+        maxsize=4,
+        backpressure=backpressure,
+        batch_size=3,
+        spill_dir=str(tmp_path),
+    )
+    run(pipeline, 50)
+    assert received == frames(50)
+    assert pipeline.stats.delivered == 50
+    if backpressure == "spill":
+        assert pipeline.stats.spilled > 0
+
+
+def test_drop_oldest_keeps_newest():
+    received = []
+
+    async def consumer(batch):
+        await asyncio.sleep(0.01)
+        received.extend(batch)
+
+    pipeline = StreamPipeline(consumer, maxsize=2, backpressure="drop_oldest")
+    run(pipeline, 20)
+    assert pipeline.stats.dropped > 0
+    assert received[-1] == frames(20)[-1]
+    assert len(received) + pipeline.stats.dropped == 20
+
+
+def test_time_window_batching():
+    batches = []
+    pipeline = StreamPipeline(batches.append, batch_size=100, batch_interval=0.05)
+    run(pipeline, 10, delay=0.001)
+    assert sum(map(len, batches)) == 10
+    assert len(batches) < 10
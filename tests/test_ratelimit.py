@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from api_client import APIClient, AsyncAPIClient, RateLimiter, RouteLimit
+from api_client import TransportProfile
+from api_client.ratelimit import TokenBucket
+
+in_flight = 0
+peak = 0
+lock = threading.Lock()
+
+
+def handler(request: httpx.Request):
+    global in_flight, peak
+    with lock:
+        in_flight += 1
+        peak = max(peak, in_flight)
+    time.sleep(0.02)
+    with lock:
+        in_flight -= 1
+    return httpx.Response(200, json={})
+
+
+async def async_handler(request: httpx.Request):
+    return httpx.Response(200, json={})
+
+
+def test_token_bucket_reserves_ahead():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert 0.09 < bucket.reserve() <= 0.1
+
+
+def test_route_in_flight_cap_and_stats():
+    global peak
+    peak = 0
+    limiter = RateLimiter(routes={"/packages": RouteLimit(max_in_flight=2)})
+    profile = TransportProfile(transport=httpx.MockTransport(handler))
+    client = APIClient(base_url="https://test", profile=profile, limiter=limiter)
+    with ThreadPoolExecutor(6) as executor:
+        list(executor.map(client.get_package, range(12)))
+    assert peak == 2
+    stats = limiter.stats
+    assert stats["/packages"].requests == 12
+    assert stats["/packages"].waited > 0
+    assert stats["*"].requests == 12
+
+
+def test_async_rate_limit():
+    async def run():
+        limiter = RateLimiter(rate=50, burst=1)
+        profile = TransportProfile(transport=httpx.MockTransport(async_handler))
+        client = AsyncAPIClient(
+            base_url="https://test", profile=profile, limiter=limiter
+        )
+        started = time.monotonic()
+        await asyncio.gather(*(client.get_loop(i) for i in range(6)))
+        return time.monotonic() - started, limiter.stats["*"]
+
+    elapsed, stats = asyncio.run(run())
+    assert elapsed >= 0.09
+    assert stats.requests == 6
+    assert stats.wait_seconds > 0
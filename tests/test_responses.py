@@ -0,0 +1,74 @@
+import httpx
+import pytest
+
+from api_client import APIClient, TransportProfile
+from api_client.schemas.pydanticobjectid import PydanticObjectId
+from api_client.schemas.responses import (
+    LazyList,
+    Loop,
+    Page,
+    Package,
+    Session,
+    User,
+    validate_response,
+)
+
+IDS = ["5eb7cf5a86d9755df3a6c593", "5eb7cfb05e32e07750a1756a"]
+
+
+def handler(request: httpx.Request):
+    if request.url.path == "/loops":
+        items = [{"_id": id, "name": f"loop {id}", "site": "x"} for id in IDS]
+        return httpx.Response(200, json={"items": items, "total": 2})
+    if request.url.path == "/packages":
+        return httpx.Response(200, json=[{"_id": IDS[0], "loop_id": "bad"}])
+    return httpx.Response(200, json={"_id": IDS[1], "email": "a@b.com"})
+
+
+def make_client(validation):
+    profile = TransportProfile(transport=httpx.MockTransport(handler))
+    return APIClient(base_url="https://test", profile=profile, validation=validation)
+
+
+def test_without_validation_returns_dicts():
+    assert make_client(None).get_me() == {"_id": IDS[1], "email": "a@b.com"}
+
+
+@pytest.mark.parametrize("mode", ["full", "construct", "lazy"])
+def test_modes_return_models(mode):
+    client = make_client(mode)
+    user = client.get_user(IDS[1])
+    assert isinstance(user, User)
+    assert user.email == "a@b.com"
+    page = client.get_loops()
+    assert isinstance(page, Page)
+    assert page.total == 2
+    assert isinstance(page.items[0], Loop)
+    assert page.items[1].name == f"loop {IDS[1]}"
+    assert page.items[0].site == "x"
+    assert type(page.items[0].id) is PydanticObjectId
+    assert page.items[0].id == PydanticObjectId(IDS[0])
+    assert [loop.name for loop in client.iter_loops(page_size=2)] == [
+        f"loop {id}" for id in IDS
+    ]
+
+
+def test_lazy_mode_defers_validation():
+    packages = make_client("lazy").get_packages()
+    assert isinstance(packages, LazyList)
+    assert len(packages) == 1
+    with pytest.raises(Exception):
+        packages[0]
+    assert isinstance(make_client("construct").get_packages()[0], Package)
+
+
+def test_construct_mode_parses_ids_only():
+    raw = {"_id": IDS[0], "loop_id": IDS[1], "start": "2024-01-02T00:00:00"}
+    session = validate_response(raw, Session, "construct")
+    assert type(session.id) is type(session.loop_id) is PydanticObjectId
+    assert session.loop_id == PydanticObjectId(IDS[1])
+    # no validation: other fields keep their JSON types
+    assert session.start == "2024-01-02T00:00:00"
+    assert raw["_id"] == IDS[0]
+    user = validate_response({"loops": [IDS[0], "not an id"]}, User, "construct")
+    assert user.loops == [PydanticObjectId(IDS[0]), "not an id"]
@@ -0,0 +1,83 @@
+import io
+
+import httpx
+import pytest
+
+from api_client import APIClient, APIError, TransportProfile
+from api_client.retry import RetryBudget, RetryPolicy, parse_retry_after
+
+
+def flaky(failures: int, status_code: int = 503, headers=None):
+    calls = []
+
+    def handler(request: httpx.Request):
+        calls.append(request.method)
+        if len(calls) <= failures:
+            return httpx.Response(status_code, json={}, headers=headers)
+        return httpx.Response(200, json={"ok": True})
+
+    return handler, calls
+
+
+def make_client(handler, **policy):
+    profile = TransportProfile(transport=httpx.MockTransport(handler))
+    retry = RetryPolicy(backoff_factor=0, **policy)
+    return APIClient(base_url="https://test", profile=profile, retry=retry)
+
+
+def test_retries_idempotent_requests():
+    handler, calls = flaky(2, headers={"Retry-After": "0"})
+    assert make_client(handler).get_loop("a") == {"ok": True}
+    assert len(calls) == 3
+
+
+def test_gives_up_after_max_retries():
+    handler, calls = flaky(5)
+    with pytest.raises(APIError):
+        make_client(handler, max_retries=2).get_loop("a")
+    assert len(calls) == 3
+
+
+def test_does_not_retry_post_by_default():
+    handler, calls = flaky(1, status_code=429)
+    with pytest.raises(APIError):
+        make_client(handler).create_loop({"name": "loop"})
+    assert calls == ["POST"]
+
+
+def test_budget_caps_retries():
+    handler, calls = flaky(10)
+    budget = RetryBudget(ratio=0, min_per_second=0, max_tokens=1)
+    with pytest.raises(APIError):
+        make_client(handler, budget=budget).get_loop("a")
+    assert len(calls) == 2
+
+
+def test_only_replayable_bodies_are_retried(tmp_path):
+    bodies = []
+
+    def handler(request: httpx.Request):
+        bodies.append(request.read())
+        if len(bodies) % 2:
+            return httpx.Response(503, json={})
+        return httpx.Response(200, json={"ok": True})
+
+    client = make_client(handler)
+    path = tmp_path / "artifact.bin"
+    path.write_bytes(b"artifact")
+    assert client.upload("/a", path, method="PUT") == {"ok": True}
+    assert client.put("/a", content=io.BytesIO(b"buffer")) == {"ok": True}
+    assert bodies == [b"artifact"] * 2 + [b"buffer"] * 2
+
+    # a generator is consumed by the first attempt: no retry
+    bodies.clear()
+    with pytest.raises(APIError) as error:
+        client.upload("/a", (chunk for chunk in [b"a", b"b"]), method="PUT")
+    assert error.value.status_code == 503
+    assert bodies == [b"ab"]
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
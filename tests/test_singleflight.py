@@ -0,0 +1,65 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from api_client import APIClient, AsyncAPIClient, TransportProfile
+
+calls = []
+
+
+def handler(request: httpx.Request):
+    calls.append(request.url.path)
+    time.sleep(0.05)
+    return httpx.Response(200, json={"path": request.url.path})
+
+
+async def async_handler(request: httpx.Request):
+    calls.append(request.url.path)
+    await asyncio.sleep(0.05)
+    return httpx.Response(200, json={"path": request.url.path})
+
+
+def test_concurrent_identical_gets_share_one_request():
+    calls.clear()
+    profile = TransportProfile(transport=httpx.MockTransport(handler))
+    client = APIClient(base_url="https://test", profile=profile, coalesce=True)
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(client.get_loop, ["a"] * 8 + ["b"] * 8))
+    assert results == [{"path": "/loops/a"}] * 8 + [{"path": "/loops/b"}] * 8
+    assert sorted(calls) == ["/loops/a", "/loops/b"]
+
+
+def test_async_identical_gets_share_one_request():
+    calls.clear()
+
+    async def run():
+        profile = TransportProfile(transport=httpx.MockTransport(async_handler))
+        client = AsyncAPIClient(base_url="https://test", profile=profile, coalesce=True)
+        return await asyncio.gather(*(client.get_user("a") for _ in range(10)))
+
+    assert asyncio.run(run()) == [{"path": "/users/a"}] * 10
+    assert calls == ["/users/a"]
+
+
+def test_differently_parsed_gets_are_not_shared():
+    calls.clear()
+    id = "5eb7cf5a86d9755df3a6c593"
+
+    async def user_handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"_id": id, "email": "a@b.com"})
+
+    async def run():
+        profile = TransportProfile(transport=httpx.MockTransport(user_handler))
+        client = AsyncAPIClient(
+            base_url="https://test", profile=profile, coalesce=True, validation="full"
+        )
+        return await asyncio.gather(client.get_user(id), client.get(f"/users/{id}"))
+
+    user, raw = asyncio.run(run())
+    assert user.email == "a@b.com"
+    assert raw == {"_id": id, "email": "a@b.com"}
+    assert len(calls) == 2
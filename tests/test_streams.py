@@ -0,0 +1,122 @@
+import asyncio
+
+from websockets.exceptions import ConnectionClosed
+from websockets.server import serve
+
+from api_client import APIClient, StreamManager
+
+
+async def server(ws):
+    # two messages per connection, then drop it to force a reconnect
+    for i in range(2):
+        await ws.send(f"{ws.path}#{i}")
+    await ws.close()
+
+
+def test_fan_in_with_reconnect():
+    async def run():
+        async with serve(server, "127.0.0.1", 0) as ws_server:
+            port = ws_server.sockets[0].getsockname()[1]
+            client = APIClient(base_url=f"http://127.0.0.1:{port}", access_token="t")
+            manager = StreamManager(client, reconnect_delay=0.01, handle_signals=False)
+            manager.subscribe("a")
+            manager.subscribe("b", "data")
+            received = []
+            async with manager:
+                async for message in manager:
+                    received.append(message)
+                    if len(received) == 8:
+                        break
+            return manager, received
+
+    manager, received = asyncio.run(run())
+    assert {(m.loop_id, m.stream, m.type) for m in received} == {
+        ("a", "status", None),
+        ("b", "data", "eeg"),
+    }
+    assert any(m.payload.startswith("/loops/b/data?type=eeg") for m in received)
+    assert sum(s.connects for s in manager.subscriptions.values()) >= 4
+    assert not manager.running
+
+
+def test_gap_detection_resume_and_backfill():
+    connections = []
+
+    async def sequenced(ws):
+        connections.append(ws.path)
+        # first connection: 1, 2 then drop; second: skips 3-4 and repeats 2
+        for seq in [1, 2] if len(connections) == 1 else [2, 5, 6]:
+            await ws.send(f'{{"seq": {seq}}}')
+        await ws.close()
+
+    def backfill(subscription, last_position):
+        return [f'{{"seq": {seq}}}' for seq in range(last_position, 4)]
+
+    async def run():
+        async with serve(sequenced, "127.0.0.1", 0) as ws_server:
+            port = ws_server.sockets[0].getsockname()[1]
+            client = APIClient(base_url=f"http://127.0.0.1:{port}", access_token="t")
+            manager = StreamManager(
+                client,
+                reconnect_delay=0.01,
+                handle_signals=False,
+                resume_param="since",
+                backfill=backfill,
+            )
+            subscription = manager.subscribe("a")
+            received = []
+            async with manager:
+                async for message in manager:
+                    received.append(message)
+                    if message.position == 6:
+                        break
+            return subscription, received
+
+    subscription, received = asyncio.run(run())
+    assert [m.position for m in received] == [1, 2, 3, 5, 6]
+    assert [m.replayed for m in received] == [False, False, True, False, False]
+    assert "since=2" in connections[1]
+    assert subscription.gaps == 1
+    assert subscription.missed == 1
+    assert subscription.duplicates == 2
+    assert subscription.downtime > 0
+
+
+def test_max_connections_queues_subscriptions(caplog):
+    async def endless(ws):
+        try:
+            while True:
+                await ws.send(ws.path)
+                await asyncio.sleep(0.01)
+        except ConnectionClosed:
+            pass
+
+    async def run():
+        async with serve(endless, "127.0.0.1", 0) as ws_server:
+            port = ws_server.sockets[0].getsockname()[1]
+            client = APIClient(base_url=f"http://127.0.0.1:{port}", access_token="t")
+            manager = StreamManager(client, max_connections=2, handle_signals=False)
+            for loop_id in "abcde":
+                manager.subscribe(loop_id)
+            seen, most_connected = set(), 0
+            async with manager:
+                async for message in manager:
+                    connected = [
+                        s for s in manager.subscriptions.values() if s.connected
+                    ]
+                    most_connected = max(most_connected, len(connected))
+                    seen.add(message.loop_id)
+                    if len(seen) == 2 and len(manager.pending) == 3:
+                        pending = {s.loop_id for s in manager.pending}
+                        # freed slots go to waiting subscriptions
+                        for loop_id in list(seen):
+                            manager.unsubscribe(loop_id)
+                    if len(seen) == 4:
+                        break
+            return seen, pending, most_connected
+
+    seen, pending, most_connected = asyncio.run(run())
+    assert most_connected == 2
+    assert len(pending & seen) == 2
+    waiting = [r for r in caplog.records if "waits for a connection slot" in r.message]
+    assert len(waiting) >= 3 and all(r.levelname == "WARNING" for r in waiting)
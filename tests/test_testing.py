@@ -0,0 +1,113 @@
+import asyncio
+
+import httpx
+import pytest
+
+from api_client import APIClient, APIError, AsyncAPIClient, RetryPolicy
+from api_client import StreamManager
+from api_client.testing import FakeZeitAPI
+
+
+def test_routes_against_fake_api():
+    api = FakeZeitAPI().seed(users=3, loops=5, packages=4, sessions=2)
+    client = APIClient(
+        transport=api.transport(), username=api.username, password=api.password
+    )
+    assert client.get_me()["email"] == api.username
+    assert len(client.get_loops_me()) == 5
+    assert len(list(client.iter_loops(page_size=2))) == 5
+
+    loop = client.create_loop({"name": "new", "type": "eeg"})
+    assert client.get_loop(loop["_id"]) == loop
+    assert client.patch_loop(loop["_id"], {"status": "done"})["status"] == "done"
+    done = client.get_loops(status="done")
+    assert done == {"items": [api.loops[loop["_id"]]], "total": 1}
+    client.delete_loop(loop["_id"])
+    with pytest.raises(APIError) as error:
+        client.get_loop(loop["_id"])
+    assert error.value.status_code == 404
+
+    loop_id = next(iter(api.loops))
+    assert len(client.get_sessions(loop_id)) == 2
+    assert len(client.get_packages(loop_id=loop_id)["items"]) == 1
+    client.set_baseline(loop_id, "2024-01-01", "2024-01-02")
+    assert api.baselines[loop_id] == {"start": "2024-01-01", "stop": "2024-01-02"}
+
+    with pytest.raises(APIError) as error:
+        APIClient(transport=api.transport()).get_me()
+    assert error.value.status_code == 401
+
+
+def test_error_injection_and_retries():
+    api = FakeZeitAPI()
+    client = APIClient(
+        transport=api.transport(),
+        username=api.username,
+        password=api.password,
+        retry=RetryPolicy(backoff_factor=0, budget=None),
+    )
+    api.inject_error("/users", count=2)
+    assert client.get_me()["email"] == api.username
+    assert api.calls["GET", "/users/me"] == 3
+
+    api.error_rate = 1.0
+    with pytest.raises(APIError) as error:
+        client.get_me()
+    assert error.value.status_code == 503
+
+
+def test_async_client_with_asgi_app_and_streams():
+    api = FakeZeitAPI(latency=(0, 0.002), stream_messages=3)
+    api.seed(loops=2)
+    loop_ids = list(api.loops)
+
+    async def run():
+        async with api.serve_streams() as base_url:
+            async with AsyncAPIClient(
+                base_url=base_url,
+                transport=api,
+                username=api.username,
+                password=api.password,
+            ) as client:
+                loops = await asyncio.gather(*map(client.get_loop, loop_ids))
+                manager = StreamManager(
+                    client,
+                    reconnect_delay=0.01,
+                    handle_signals=False,
+                    resume_param="after",
+                )
+                for loop_id in loop_ids:
+                    manager.subscribe(loop_id, "data")
+                received = []
+                async with manager:
+                    async for message in manager:
+                        received.append(message)
+                        if len(received) == 10:
+                            break
+        return loops, manager, received
+
+    loops, manager, received = asyncio.run(run())
+    assert [loop["_id"] for loop in loops] == loop_ids
+    assert {message.loop_id for message in received} == set(loop_ids)
+    for subscription in manager.subscriptions.values():
+        # reconnects resume after the last message, so nothing is missed
+        assert subscription.gaps == subscription.duplicates == 0
+
+
+def test_mock_transport_is_pluggable():
+    api = FakeZeitAPI()
+    profile_transport = httpx.MockTransport(api.handler)
+    client = APIClient(transport=profile_transport, access_token="nope")
+    with pytest.raises(APIError):
+        client.get_me()
+    assert client.profile.transport is profile_transport
+
+
+def test_serve_http():
+    api = FakeZeitAPI().seed(loops=1)
+    with api.serve_http() as base_url:
+        client = APIClient(
+            base_url=base_url, username=api.username, password=api.password
+        )
+        assert client.get_loops_me() == list(api.loops.values())
+        client.close()
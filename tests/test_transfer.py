@@ -0,0 +1,197 @@
+import asyncio
+import io
+
+import httpx
+import pytest
+
+from api_client import (
+    APIClient,
+    APIError,
+    AsyncAPIClient,
+    RetryPolicy,
+    TransportProfile,
+)
+from api_client.transfer import FileChunks
+
+PAYLOAD = bytes(range(256)) * 40
+received = []
+
+
+def serve(request: httpx.Request, drop_after=None, ranges=True, stream=True):
+    if request.url.path == "/missing":
+        return httpx.Response(404, json={"detail": "Not Found"})
+    start = 0
+    range_header = request.headers.get("Range")
+    if ranges and range_header:
+        start = int(range_header[len("bytes=") : -1])
+        if start >= len(PAYLOAD):
+            headers = {"Content-Range": f"bytes */{len(PAYLOAD)}"}
+            return httpx.Response(416, headers=headers)
+    body = PAYLOAD[start:]
+
+    def chunks():
+        for offset in range(0, len(body), 1000):
+            if drop_after is not None and start + offset >= drop_after:
+                raise httpx.ReadError("connection dropped")
+            yield body[offset : offset + 1000]
+
+    content = chunks() if stream else body
+    if start:
+        headers = {"Content-Range": f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}"}
+        return httpx.Response(206, headers=headers, content=content)
+    return httpx.Response(200, content=content)
+
+
+def upload_handler(request: httpx.Request):
+    received.append((request, request.read()))
+    return httpx.Response(201, json={"size": len(request.content)})
+
+
+def make_client(handler, cls=APIClient):
+    profile = TransportProfile(transport=httpx.MockTransport(handler))
+    return cls(base_url="https://test", profile=profile)
+
+
+def test_download_resumes_after_dropped_connection(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(request.headers.get("Range"))
+        return serve(request, drop_after=3000 if len(calls) == 1 else None)
+
+    path = tmp_path / "recording.bin"
+    result = make_client(handler).download("/recording", path, chunk_size=512)
+    assert path.read_bytes() == PAYLOAD
+    assert result.size == len(PAYLOAD)
+    assert result.resumes == 1
+    # the second request picks up after the last chunk written to disk
+    assert calls[0] is None and calls[1].startswith("bytes=")
+
+
+def test_download_continues_partial_file(tmp_path):
+    path = tmp_path / "recording.bin"
+    path.write_bytes(PAYLOAD[:5000])
+    client = make_client(serve)
+    result = client.download("/recording", path)
+    assert path.read_bytes() == PAYLOAD
+    assert result.resumed_from == 5000
+    # already complete: the server answers 416
+    assert client.download("/recording", path).size == len(PAYLOAD)
+
+    # servers without range support send the whole file again
+    path.write_bytes(b"stale")
+    make_client(lambda request: serve(request, ranges=False)).download(
+        "/recording", path
+    )
+    assert path.read_bytes() == PAYLOAD
+
+    with pytest.raises(APIError):
+        client.download("/missing", tmp_path / "missing")
+
+
+@pytest.mark.parametrize("cls", [APIClient, AsyncAPIClient])
+def test_download_error_leaves_partial_file_intact(tmp_path, cls):
+    path = tmp_path / "recording.bin"
+    path.write_bytes(PAYLOAD[:5000])
+
+    def handler(request):
+        return httpx.Response(502, text="<html>Bad Gateway</html>")
+
+    client = make_client(handler, cls)
+    with pytest.raises(APIError) as error:
+        result = client.download("/recording", path)
+        if cls is AsyncAPIClient:
+            asyncio.run(result)
+    assert error.value.status_code == 502
+    assert "Bad Gateway" in error.value.message
+    assert path.read_bytes() == PAYLOAD[:5000]
+
+
+@pytest.mark.parametrize("cls", [APIClient, AsyncAPIClient])
+def test_download_retries_and_logs_in_again(tmp_path, cls):
+    path = tmp_path / "recording.bin"
+    path.write_bytes(PAYLOAD[:5000])
+    statuses = []
+
+    def handler(request):
+        if request.url.path == "/auth/login":
+            return httpx.Response(200, json={"access_token": "new"})
+        if not statuses:
+            response = httpx.Response(503, headers={"Retry-After": "0"})
+        elif request.headers["Authorization"] != "Bearer new":
+            response = httpx.Response(401, json={"detail": "Token expired"})
+        else:
+            response = serve(request, stream=False)
+        statuses.append(response.status_code)
+        return response
+
+    client = cls(
+        base_url="https://test",
+        profile=TransportProfile(transport=httpx.MockTransport(handler)),
+        retry=RetryPolicy(budget=None),
+        access_token="old",
+        username="user",
+        password="secret",
+    )
+    result = client.download("/recording", path)
+    if cls is AsyncAPIClient:
+        result = asyncio.run(result)
+    assert statuses == [503, 401, 206]
+    assert path.read_bytes() == PAYLOAD
+    assert result.resumed_from == 5000
+
+
+def test_upload_streams_file(tmp_path):
+    path = tmp_path / "artifact.bin"
+    path.write_bytes(PAYLOAD)
+    client = make_client(upload_handler)
+
+    assert client.upload("/packages/1/artifact", path, chunk_size=100) == {
+        "size": len(PAYLOAD)
+    }
+    request, body = received[-1]
+    assert body == PAYLOAD
+    assert request.headers["Content-Length"] == str(len(PAYLOAD))
+    assert request.headers["Content-Type"] == "application/octet-stream"
+
+    client.upload("/packages/1/artifact", iter([b"a", b"b"]), method="PUT")
+    request, body = received[-1]
+    assert (request.method, body) == ("PUT", b"ab")
+    assert request.headers["Transfer-Encoding"] == "chunked"
+
+    client.upload("/packages/1/artifact", path, field="file", data={"kind": "eeg"})
+    request, body = received[-1]
+    assert b'filename="artifact.bin"' in body
+    assert b'name="kind"' in body
+    assert PAYLOAD in body
+
+
+def test_file_chunks_are_re_iterable():
+    file = io.BytesIO(b"header" + PAYLOAD)
+    file.read(6)
+    chunks = FileChunks(file, chunk_size=1000)
+    assert b"".join(chunks) == PAYLOAD
+    assert b"".join(chunks) == PAYLOAD
+
+
+def test_async_upload_and_download(tmp_path):
+    source = tmp_path / "source.bin"
+    source.write_bytes(PAYLOAD)
+    path = tmp_path / "recording.bin"
+
+    def buffered(request):
+        return serve(request, stream=False)
+
+    async def run():
+        async with make_client(upload_handler, AsyncAPIClient) as client:
+            uploaded = await client.upload("/artifact", source, chunk_size=100)
+            await client.upload("/artifact", source, field="file")
+        async with make_client(buffered, AsyncAPIClient) as client:
+            downloaded = await client.download("/recording", path, chunk_size=512)
+        return uploaded, downloaded
+
+    uploaded, downloaded = asyncio.run(run())
+    assert uploaded == {"size": len(PAYLOAD)}
+    assert PAYLOAD in received[-1][1]
+    assert path.read_bytes() == PAYLOAD
+    assert downloaded.size == len(PAYLOAD)